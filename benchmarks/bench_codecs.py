@@ -0,0 +1,52 @@
+"""Compare the encode time, decode time and file size of the database codecs."""
+# benchmarks/bench_codecs.py
+#
+# Run it from the project's root directory with `python -m benchmarks.bench_codecs`.
+# Every timing is the best of --repeat runs through a DatabaseHandler, so it includes the file I/O.
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from mmmap import database
+
+# defines synthetic_todos(), which returns n to-do dictionaries shaped like the ones in the database.
+def synthetic_todos(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"Description": f"Synthetic to-do #{i}.", "Priority": i % 3 + 1, "Done": i % 2 == 0}
+        for i in range(n)
+    ]
+
+# defines best_ms(), which runs func repeat times and returns the fastest run in milliseconds.
+def best_ms(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=100_000, help="number of to-dos")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    args = parser.parse_args()
+    todo_list = synthetic_todos(args.n)
+    print(f"to-dos: {args.n}")
+    print(f"{'codec':14} {'encode ms':>10} {'load ms':>10} {'stream ms':>10} {'size KiB':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec in database.CODECS:
+            db_path = Path(tmp_dir) / f"todo.{codec}"
+            handler = database.DatabaseHandler(db_path, codec=codec)
+            encode = best_ms(lambda: handler.write_todos(todo_list), args.repeat)
+            load = best_ms(handler.read_todos, args.repeat)
+            stream = best_ms(lambda: sum(1 for _ in handler.iter_todos()), args.repeat)
+            size = db_path.stat().st_size / 1024
+            print(f"{codec:14} {encode:10.1f} {load:10.1f} {stream:10.1f} {size:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measure to-do adds per second with many processes writing at once."""
+# benchmarks/bench_contention.py
+#
+# Run it from the project's root directory with `python -m benchmarks.bench_contention`.
+# It exits with status 1 if any to-do was lost or got a duplicate ID.
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mmmap import database, mmmap
+
+# defines writer(), the body of every writer process. It waits for the start signal,
+# so all the writers compete from the first add, and then adds its to-dos one at a time,
+# like separate `mmmap add` runs would.
+def writer(
+    db_path: Path,
+    backend: str,
+    group_commit: bool,
+    durability: str,
+    number: int,
+    adds: int,
+    start,
+) -> None:
+    todoer = mmmap.Todoer(
+        db_path, backend, group_commit=group_commit, durability=durability
+    )
+    start.wait()
+    for i in range(adds):
+        todo, error = todoer.add([f"Writer {number} to-do #{i}"])
+        if error:
+            raise SystemExit(f"writer {number} failed with error {error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-w", "--writers", type=int, default=16, help="parallel writers")
+    parser.add_argument("-n", "--adds", type=int, default=50, help="adds per writer")
+    parser.add_argument(
+        "-b", "--backend", default=database.DEFAULT_BACKEND, choices=database.BACKENDS
+    )
+    parser.add_argument(
+        "-g", "--group-commit", action="store_true", help="share commits between writers"
+    )
+    parser.add_argument(
+        "-d",
+        "--durability",
+        default=database.DEFAULT_DURABILITY,
+        choices=database.DURABILITY_LEVELS,
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "todo.json"
+        database.init_database(db_path, args.backend)
+        start = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=writer,
+                args=(
+                    db_path,
+                    args.backend,
+                    args.group_commit,
+                    args.durability,
+                    number,
+                    args.adds,
+                    start,
+                ),
+            )
+            for number in range(args.writers)
+        ]
+        for process in processes:
+            process.start()
+        began = time.perf_counter()
+        start.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - began
+        items = list(mmmap.Todoer(db_path, args.backend).iter_todo_items())
+    expected = args.writers * args.adds
+    ids = {todo_id for todo_id, _ in items}
+    print(f"backend:        {args.backend}")
+    print(f"group commit:   {'on' if args.group_commit else 'off'}")
+    print(f"durability:     {args.durability}")
+    print(f"writers:        {args.writers} x {args.adds} adds")
+    print(f"adds per second: {expected / elapsed:8.1f}")
+    print(f"to-dos stored:  {len(items)} of {expected}, {len(ids)} unique IDs")
+    if any(process.exitcode for process in processes) or len(ids) != expected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measure the throughput and latency of adds at every durability level."""
+# benchmarks/bench_durability.py
+#
+# Run it from the project's root directory with `python -m benchmarks.bench_durability`.
+# The numbers depend heavily on the disk, so run it on the host whose level you're picking,
+# with --dir pointing at the file system that will hold the database.
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from mmmap import database, mmmap
+
+# defines percentile(), which returns the p-th percentile of sorted latencies.
+def percentile(latencies: List[float], p: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+# defines measure(), which adds n to-dos one at a time to a fresh database
+# and returns the latency of every add in milliseconds.
+def measure(tmp_dir: Path, backend: str, durability: str, n: int) -> List[float]:
+    db_path = tmp_dir / f"{durability}.{backend}"
+    database.init_database(db_path, backend)
+    todoer = mmmap.Todoer(db_path, backend, durability=durability)
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        todo, error = todoer.add([f"Durable to-do #{i}"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        if error:
+            raise SystemExit(f"add failed with error {error}")
+    return sorted(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=500, help="adds per durability level")
+    parser.add_argument(
+        "-b", "--backend", default=database.DEFAULT_BACKEND, choices=database.BACKENDS
+    )
+    parser.add_argument("--dir", type=Path, default=None, help="where to put the databases")
+    args = parser.parse_args()
+    print(f"backend: {args.backend}, {args.n} adds per level")
+    print(f"{'durability':12} {'adds/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        for durability in database.DURABILITY_LEVELS:
+            latencies = measure(Path(tmp_dir), args.backend, durability, args.n)
+            print(
+                f"{durability:12} {len(latencies) / (sum(latencies) / 1000):9.1f} "
+                f"{statistics.median(latencies):8.2f} {percentile(latencies, 99):8.2f} "
+                f"{latencies[-1]:8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
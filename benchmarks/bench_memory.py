@@ -0,0 +1,47 @@
+"""Measure the memory cost of a to-do in a list of dictionaries and in a TodoTable."""
+# benchmarks/bench_memory.py
+#
+# Run it from the project's root directory with `python -m benchmarks.bench_memory`.
+#
+# Todoer still reads, caches and commits lists of dictionaries. A TodoTable is only built
+# when a caller asks for one with Todoer.get_todo_table(), so this compares the two containers
+# side by side; it doesn't measure a change in what Todoer holds in memory.
+
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator
+
+from mmmap.todo import TodoTable
+
+# defines synthetic_todos(), which yields n to-do dictionaries shaped like the ones in the database.
+def synthetic_todos(n: int) -> Iterator[Dict[str, Any]]:
+    for i in range(n):
+        yield {"Description": f"Synthetic to-do #{i}.", "Priority": i % 3 + 1, "Done": i % 2 == 0}
+
+# defines bytes_per_todo(), which builds a container of n to-dos with build() 
+# and returns how many bytes tracemalloc saw allocated per to-do. 
+# The descriptions are created in both cases, so they're part of the measurement too.
+def bytes_per_todo(build: Callable[[Iterator[Dict[str, Any]]], Any], n: int) -> float:
+    tracemalloc.start()
+    try:
+        container = build(synthetic_todos(n))
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del container
+    return size / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=100_000, help="number of to-dos")
+    args = parser.parse_args()
+    dicts = bytes_per_todo(list, args.n)
+    table = bytes_per_todo(TodoTable.from_dicts, args.n)
+    print(f"to-dos:               {args.n}")
+    print(f"list of dicts:        {dicts:8.1f} bytes per to-do")
+    print(f"TodoTable:            {table:8.1f} bytes per to-do")
+
+
+if __name__ == "__main__":
+    main()
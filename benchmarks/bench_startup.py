@@ -0,0 +1,111 @@
+"""Measure the cold-start cost of the mmmap command line."""
+# benchmarks/bench_startup.py
+#
+# Run it from the project's root directory with `python -m benchmarks.bench_startup`.
+# It exits with status 1 if a command goes over the budget in benchmarks/startup_budget.json.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BUDGET_FILE_PATH = Path(__file__).with_name("startup_budget.json")
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# define the command lines to measure. Each one is run as `python -X importtime -m mmmap ...`.
+COMMANDS = {
+    "version": ["--version"],
+    "list": ["list"],
+}
+
+# defines import_time_ms(), which adds up the self times that -X importtime reports on stderr,
+# so the result is the total time spent importing modules, in milliseconds.
+def import_time_ms(stderr: str) -> float:
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us = line.split(":", 1)[1].split("|")[0].strip()
+        if self_us.isdigit():
+            total += int(self_us)
+    return total / 1000
+
+# defines make_environment(), which points the mmmap config directory at a temporary directory
+# holding a small JSON database, so `list` has something to print and the user's own to-dos aren't touched.
+# Bytecode caching is turned back on, so the numbers match an installed mmmap rather than a fresh compile.
+def make_environment(home: Path, todos: int) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["HOME"] = str(home)
+    env["XDG_CONFIG_HOME"] = str(home / ".config")
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")])
+    )
+    config_dir = home / ".config" / "mmmap"
+    config_dir.mkdir(parents=True)
+    db_path = home / "todo.json"
+    db_path.write_text(
+        json.dumps(
+            [
+                {"Description": f"Start-up to-do #{i}.", "Priority": 2, "Done": False}
+                for i in range(todos)
+            ]
+        )
+    )
+    (config_dir / "config.ini").write_text(
+        f"[General]\ndatabase = {db_path}\nbackend = json\n"
+    )
+    return env
+
+# defines measure(), which runs a command `runs` times and returns the median wall-clock time
+# until the process exits, and the median total import time, both in milliseconds.
+# The first run only warms up the bytecode and file system caches and isn't counted.
+def measure(args: List[str], env: Dict[str, str], runs: int) -> Tuple[float, float]:
+    wall, imports = [], []
+    for run in range(runs + 1):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "mmmap", *args],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode:
+            raise SystemExit(f"mmmap {' '.join(args)} failed:\n{result.stderr}")
+        if not run:
+            continue
+        wall.append(elapsed)
+        imports.append(import_time_ms(result.stderr))
+    return statistics.median(wall), statistics.median(imports)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-r", "--runs", type=int, default=15, help="runs per command")
+    parser.add_argument("-n", type=int, default=20, help="number of to-dos to list")
+    args = parser.parse_args()
+    budget = json.loads(BUDGET_FILE_PATH.read_text())
+    over_budget = False
+    with tempfile.TemporaryDirectory() as home:
+        env = make_environment(Path(home), args.n)
+        print(f"{'command':10} {'wall ms':>9} {'import ms':>10} {'budget ms':>10}")
+        for name, command in COMMANDS.items():
+            wall, imports = measure(command, env, args.runs)
+            limit = budget[name]["import_ms"]
+            status = "ok" if imports <= limit else "OVER"
+            over_budget = over_budget or imports > limit
+            print(f"{name:10} {wall:9.1f} {imports:10.1f} {limit:10.1f}  {status}")
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
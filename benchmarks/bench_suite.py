@@ -0,0 +1,259 @@
+"""Time the Todoer operations and the mmmap command line at scale, and catch regressions."""
+# benchmarks/bench_suite.py
+#
+# Run it from the project's root directory with `python -m benchmarks.bench_suite`.
+# For every database size, it times Todoer.get_todo_list(), .add(), .set_done(), .remove()
+# and .remove_all() on a synthetic database, and `mmmap list` end to end. It also times
+# the cold start of `mmmap --version`. Every measurement runs in a process of its own,
+# so its peak RSS is the memory that operation needed. On Linux, a child process starts
+# with the peak RSS of its parent, so the databases are generated in child processes as well,
+# which keeps this one small.
+#
+# The results are written as JSON with --output. They're compared with the results file given
+# with --baseline, or with benchmarks/baseline.json if it exists, and the script exits with status 1
+# if any median time or peak RSS grew by more than its threshold. --save-baseline stores the results
+# in benchmarks/baseline.json. Baselines only make sense on the host that recorded them, so none is shipped.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.bench_startup import make_environment
+from mmmap import SUCCESS, database
+
+BASELINE_FILE_PATH = Path(__file__).with_name("baseline.json")
+SIZES = (1_000, 100_000, 1_000_000)
+
+# define the Todoer operations to time. Each one gets the Todoer and the number of the run,
+# which picks a different to-do every time. Even IDs are pending in the synthetic databases.
+OPS: Dict[str, Callable[[Any, int], Tuple[Any, int]]] = {
+    "get_todo_list": lambda todoer, run: (todoer.get_todo_list(), SUCCESS),
+    "add": lambda todoer, run: todoer.add([f"Benchmark to-do #{run}"]),
+    "set_done": lambda todoer, run: todoer.set_done(2 * run + 2),
+    "remove": lambda todoer, run: todoer.remove(run + 1),
+    "remove_all": lambda todoer, run: todoer.remove_all(),
+}
+
+# define the default thresholds: how much, as a fraction, a median time or a peak RSS
+# may grow over the baseline before it counts as a regression.
+TIME_THRESHOLD = 0.25
+RSS_THRESHOLD = 0.25
+
+# defines synthetic_todos(), which returns n to-do dictionaries shaped like the ones in the database.
+def synthetic_todos(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"Description": f"Synthetic to-do #{i}.", "Priority": i % 3 + 1, "Done": i % 2 == 0}
+        for i in range(n)
+    ]
+
+# defines peak_rss_kib(), the peak resident set size of the current process in KiB.
+# ru_maxrss is in KiB on Linux but in bytes on macOS.
+def peak_rss_kib() -> int:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def summary(times_ms: List[float], rss_kib: int) -> Dict[str, float]:
+    return {
+        "median_ms": round(statistics.median(times_ms), 3),
+        "best_ms": round(min(times_ms), 3),
+        "peak_rss_kib": rss_kib,
+    }
+
+# defines make_database(), which writes a synthetic database of n to-dos and its ID index to db_path.
+def make_database(db_path: Path, backend: str, n: int) -> None:
+    from mmmap import mmmap
+
+    database.init_database(db_path, backend)
+    database.get_database_handler(db_path, backend).write_todos(synthetic_todos(n))
+    mmmap.Todoer(db_path, backend).get_todos([1])
+
+# defines copy_database(), which copies a database and its companion files, such as the ID index.
+def copy_database(src_path: Path, dst_path: Path) -> None:
+    for path in src_path.parent.glob(src_path.name + "*"):
+        if path.is_file():
+            suffix = path.name[len(src_path.name):]
+            shutil.copyfile(path, dst_path.with_name(dst_path.name + suffix))
+
+# defines worker(), which runs in a fresh process. It times `repeat` runs of a Todoer operation
+# on a copy of the template database and prints the summary as JSON.
+# .remove_all() empties the database, so every run of it starts from a new copy.
+def worker(op: str, template: Path, backend: str, repeat: int) -> None:
+    from mmmap import mmmap
+
+    db_path = template.with_name(f"{op}-{template.name}")
+    copy_database(template, db_path)
+    todoer = mmmap.Todoer(db_path, backend)
+    times = []
+    for run in range(repeat):
+        if op == "remove_all" and run:
+            copy_database(template, db_path)
+        start = time.perf_counter()
+        _, error = OPS[op](todoer, run)
+        times.append((time.perf_counter() - start) * 1000)
+        if error:
+            raise SystemExit(f"{op} failed with error {error}")
+    print(json.dumps(summary(times, peak_rss_kib())))
+
+# defines run_worker(), which runs this script as a worker process and returns what it printed.
+def run_worker(args: List[str]) -> Any:
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_suite", *args],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+# defines run_cli(), which runs `python -m mmmap` with args once and returns its wall-clock time
+# in milliseconds and its peak RSS in KiB, taken from os.wait4().
+def run_cli(args: List[str], env: Dict[str, str]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mmmap", *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = (time.perf_counter() - start) * 1000
+    # the process was reaped by os.wait4(), so Popen is told its exit code instead of waiting for it.
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise SystemExit(f"mmmap {' '.join(args)} failed")
+    rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return elapsed, rss
+
+# defines measure_cli(), which runs a command repeat times after a warm-up run,
+# which builds the ID index and fills the file system cache.
+def measure_cli(args: List[str], env: Dict[str, str], repeat: int) -> Dict[str, float]:
+    run_cli(args, env)
+    runs = [run_cli(args, env) for _ in range(repeat)]
+    return summary([ms for ms, _ in runs], max(rss for _, rss in runs))
+
+# defines compare(), which returns a line for every result that regressed against the baseline.
+# The baseline may hold a "thresholds" object that overrides time_threshold for some operations.
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Any],
+    time_threshold: float,
+    rss_threshold: float,
+) -> List[str]:
+    overrides = baseline.get("thresholds", {})
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        limit = overrides.get(name.split("/")[-1], time_threshold)
+        for key, threshold in (("median_ms", limit), ("peak_rss_kib", rss_threshold)):
+            if base[key] and result[key] > base[key] * (1 + threshold):
+                regressions.append(
+                    f"{name} {key}: {result[key]} vs {base[key]} (+{threshold:.0%} allowed)"
+                )
+    return regressions
+
+def print_result(name: str, result: Dict[str, float], base: Optional[Dict[str, float]]) -> None:
+    change = ""
+    if base and base["median_ms"]:
+        change = f"{result['median_ms'] / base['median_ms'] - 1:+.0%}"
+    print(
+        f"{name:24} {result['median_ms']:11.1f} {result['best_ms']:11.1f} "
+        f"{result['peak_rss_kib'] / 1024:9.1f} {change:>8}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, SIZES)),
+        help="comma-separated numbers of to-dos",
+    )
+    parser.add_argument("--backend", default="json", choices=database.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare with this results file")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help=f"store the results in {BASELINE_FILE_PATH.name}",
+    )
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--rss-threshold", type=float, default=RSS_THRESHOLD)
+    parser.add_argument("--worker", nargs=2, metavar=("OP", "DB"), help=argparse.SUPPRESS)
+    parser.add_argument("--make", nargs=2, metavar=("N", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker[0], Path(args.worker[1]), args.backend, args.repeat)
+        return
+    if args.make:
+        make_database(Path(args.make[1]), args.backend, int(args.make[0]))
+        print("null")
+        return
+
+    baseline_path = args.baseline
+    if baseline_path is None and BASELINE_FILE_PATH.exists():
+        baseline_path = BASELINE_FILE_PATH
+    baseline = {"results": {}}
+    if baseline_path is not None:
+        baseline = json.loads(baseline_path.read_text())
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'measurement':24} {'median ms':>11} {'best ms':>11} {'RSS MiB':>9} {'change':>8}")
+
+    def record(name: str, result: Dict[str, float]) -> None:
+        results[name] = result
+        print_result(name, result, baseline["results"].get(name))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = make_environment(Path(tmp_dir) / "startup", 20)
+        record("cold_start", measure_cli(["--version"], env, args.repeat))
+        for size in map(int, args.sizes.split(",")):
+            template = Path(tmp_dir) / f"{size}.{args.backend}"
+            run_worker(["--make", str(size), str(template), "--backend", args.backend])
+            for op in OPS:
+                result = run_worker(
+                    ["--worker", op, str(template), "--backend", args.backend,
+                     "--repeat", str(args.repeat)]
+                )
+                record(f"{size}/{op}", result)
+            # `mmmap list` reads the JSON database that make_environment() configures,
+            # which is replaced with a synthetic one of the same size.
+            home = Path(tmp_dir) / f"list-{size}"
+            env = make_environment(home, 0)
+            run_worker(["--make", str(size), str(home / "todo.json")])
+            record(f"{size}/list", measure_cli(["list"], env, args.repeat))
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "repeat": args.repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=4))
+    if args.save_baseline:
+        BASELINE_FILE_PATH.write_text(json.dumps(document, indent=4))
+    regressions = compare(results, baseline, args.time_threshold, args.rss_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
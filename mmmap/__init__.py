@@ -19,5 +19,6 @@ ERRORS = {
     FILE_ERROR: "config file error",
     DB_READ_ERROR: "database read error",
     DB_WRITE_ERROR: "database write error",
+    JSON_ERROR: "database format error",
     ID_ERROR: "to-do id error",
 }
\ No newline at end of file
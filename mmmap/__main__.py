@@ -1,14 +1,28 @@
 """mmmap entry point script."""
 # mmmap/__main__.py
 
-from mmmap import cli, __app_name__
+import sys
 
-# In this function, you call the Typer app with cli.app(), 
-# passing the application’s name to the prog_name argument. 
-# Providing a value to prog_name ensures that your users get the correct app name 
+from mmmap import __app_name__, __version__
+
+# define VERSION_FLAGS, the command lines answered without loading the CLI at all.
+# Importing mmmap.cli pulls in Typer and Click, which is most of the start-up time,
+# and printing the version doesn't need any of it.
+VERSION_FLAGS = (["--version"], ["-v"])
+
+# In this function, you call the Typer app with cli.app(),
+# passing the application’s name to the prog_name argument.
+# Providing a value to prog_name ensures that your users get the correct app name
 # when running the --help option on their command line.
+# The CLI is imported here rather than at the top of the module, so mmmap --version skips it.
+# The arguments go through cli.expand_profile_option(), which accepts --profile=FILE.
 def main():
-    cli.app(prog_name=__app_name__)
+    if sys.argv[1:] in VERSION_FLAGS:
+        print(f"{__app_name__} v{__version__}")
+        return
+    from mmmap import cli
+
+    cli.app(args=cli.expand_profile_option(sys.argv[1:]), prog_name=__app_name__)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,165 @@
+"""This module provides the mmmap asyncio API."""
+# mmmap/aio.py
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from mmmap.database import DEFAULT_BACKEND, DEFAULT_CODEC, DEFAULT_DURABILITY
+from mmmap.mmmap import CurrentTodo, CurrentTodos, Todoer
+from mmmap.todo import new_todo
+
+T = TypeVar("T")
+
+# defines AsyncTodoer, the Todoer API for asyncio programs. Every call that touches the database
+# runs on a worker thread of its own, so the event loop never waits on file I/O or on encoding and decoding
+# the to-do list. Todoer isn't thread-safe, so there is exactly one worker thread,
+# and calls from other processes are still kept apart by the database lock.
+#
+# Concurrent callers are coalesced:
+#
+# - Mutations wait for an asyncio lock held by the writer that's committing. Every mutation that arrives
+#   meanwhile joins the next batch, and whoever gets the lock first commits the whole batch through
+#   Todoer.transaction(), with one read, one write and at most one fsync. Each caller still gets its own
+#   result, and a mutation with an unknown ID fails on its own with ID_ERROR.
+# - .get_todo_list() callers share a read that's already running, unless a write finished after
+#   that read started, so a caller always sees the writes it awaited. The to-do dictionaries are shared
+#   between the callers of the same read, so treat them as read-only.
+#
+# The parse cache is on by default, so reads skip decoding while the file doesn't change.
+# Use it as an async context manager, or call .aclose(), to stop the worker thread.
+class AsyncTodoer:
+    def __init__(
+        self,
+        db_path: Path,
+        backend: str = DEFAULT_BACKEND,
+        cache: bool = True,
+        durability: str = DEFAULT_DURABILITY,
+        codec: str = DEFAULT_CODEC,
+    ) -> None:
+        self.todoer = Todoer(db_path, backend, cache=cache, durability=durability, codec=codec)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mmmap")
+        self._write_lock = asyncio.Lock()
+        self._batch: List[Tuple[str, List[Any], "asyncio.Future[CurrentTodos]"]] = []
+        self._generation = 0
+        self._read: Optional["asyncio.Future[List[Dict[str, Any]]]"] = None
+        self._read_generation = 0
+
+    async def __aenter__(self) -> "AsyncTodoer":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Wait for the running calls and stop the worker thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    def _run(self, func: Callable[..., T], *args: Any) -> "asyncio.Future[T]":
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def add(self, description: List[str], priority: int = 2) -> CurrentTodo:
+        """Add a new to-do to the database."""
+        todos, error = await self.add_many([" ".join(description)], priority)
+        return CurrentTodo(todos[0], error)
+
+    async def add_many(self, descriptions: Iterable[str], priority: int = 2) -> CurrentTodos:
+        """Add several new to-dos to the database at once."""
+        todos = [new_todo(description, priority) for description in descriptions]
+        return await self._mutate("add", todos)
+
+    async def set_done(self, todo_id: int) -> CurrentTodo:
+        """Set a to-do as done."""
+        todos, error = await self.set_done_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    async def set_done_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Set several to-dos as done."""
+        return await self._mutate("done", sorted(set(todo_ids)))
+
+    async def remove(self, todo_id: int) -> CurrentTodo:
+        """Remove a to-do from the database using its id."""
+        todos, error = await self.remove_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    async def remove_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Remove several to-dos from the database."""
+        return await self._mutate("remove", sorted(set(todo_ids)))
+
+    # defines .remove_all(). It doesn't join a batch, but it waits for the writer lock like the mutations do.
+    async def remove_all(self) -> CurrentTodo:
+        """Remove all to-dos from the database."""
+        async with self._write_lock:
+            clear = self._run(self.todoer.remove_all)
+            clear.add_done_callback(self._written)
+            return await asyncio.shield(clear)
+
+    # defines ._mutate(), which queues a mutation and waits for the writer lock. If the mutation is still
+    # queued when the lock is free, this caller commits every queued mutation. A caller cancelled
+    # while its mutation is queued takes it out of the batch. Once the batch is being committed,
+    # cancelling only stops the wait: the mutation is written all the same.
+    #
+    # The results are handed out by ._finish() when the commit ends, so cancelling the caller that runs it
+    # doesn't cancel the others. The lock is released then, but the next commit still waits for this one,
+    # since there's a single worker thread.
+    async def _mutate(self, op: str, args: List[Any]) -> CurrentTodos:
+        result: "asyncio.Future[CurrentTodos]" = asyncio.get_running_loop().create_future()
+        self._batch.append((op, args, result))
+        try:
+            async with self._write_lock:
+                if not result.done():
+                    batch = [entry for entry in self._batch if not entry[2].done()]
+                    self._batch = []
+                    commit = self._run(self._commit, [(op, args) for op, args, _ in batch])
+                    commit.add_done_callback(functools.partial(self._finish, batch))
+                    await asyncio.shield(commit)
+        except asyncio.CancelledError:
+            result.cancel()
+            raise
+        return await result
+
+    # defines ._finish(), which hands the results of a commit, or its exception, to the callers of the batch.
+    def _finish(
+        self,
+        batch: List[Tuple[str, List[Any], "asyncio.Future[CurrentTodos]"]],
+        commit: "asyncio.Future[List[CurrentTodos]]",
+    ) -> None:
+        self._written(commit)
+        for index, (_, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if commit.cancelled():
+                future.cancel()
+            elif commit.exception() is not None:
+                future.set_exception(commit.exception())
+            else:
+                future.set_result(commit.result()[index])
+
+    # defines ._written(), which counts every write that ended, so later reads don't share older ones.
+    def _written(self, write: "asyncio.Future[Any]") -> None:
+        self._generation += 1
+
+    # defines ._commit(), which runs on the worker thread. It applies a batch of mutations
+    # through a single transaction and adds the error of the commit, if any, to every result.
+    def _commit(self, batch: List[Tuple[str, List[Any]]]) -> List[CurrentTodos]:
+        with self.todoer.transaction() as tx:
+            results = [tx.apply(op, args) for op, args in batch]
+        return [CurrentTodos(todos, error or tx.error) for todos, error in results]
+
+    # defines .get_todo_list(). Only a read that's still running is shared, so other processes' writes
+    # show up in the next read. The shared read is shielded, so a caller that's cancelled
+    # doesn't cancel it for the others.
+    async def get_todo_list(self) -> List[Dict[str, Any]]:
+        """Return the current to-do list."""
+        if self._read is None or self._read_generation != self._generation:
+            read = self._run(self.todoer.get_todo_list)
+            read.add_done_callback(self._read_done)
+            self._read = read
+            self._read_generation = self._generation
+        return list(await asyncio.shield(self._read))
+
+    def _read_done(self, read: "asyncio.Future[List[Dict[str, Any]]]") -> None:
+        if self._read is read:
+            self._read = None
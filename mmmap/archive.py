@@ -0,0 +1,232 @@
+"""This module provides the mmmap archive of completed to-dos."""
+# mmmap/archive.py
+
+import json
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, JSON_ERROR, SUCCESS
+from mmmap.database import DatabaseError, atomic_write, sync_files
+
+# define ARCHIVE_SUFFIX and DONE_SUFFIX. The archive is a directory next to the database file,
+# so "todo.json" gets a "todo.json.archive" companion, and the completion log is a "todo.json.done" file.
+ARCHIVE_SUFFIX = ".archive"
+DONE_SUFFIX = ".done"
+MANIFEST = "manifest.json"
+
+# define the compressions of the archive segments and the file extension of each one.
+# zlib is fast, while lzma, imported on first use, packs the to-dos tighter.
+COMPRESSIONS = {"zlib": ".zlib", "lzma": ".xz"}
+DEFAULT_COMPRESSION = "zlib"
+
+# define the size of the chunks read from a segment while it's decompressed.
+CHUNK_SIZE = 64 * 1024
+
+_AGE = re.compile(r"(\d+(?:\.\d+)?)([smhdw]?)")
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "": 86400}
+
+Item = Tuple[int, Dict[str, Any]]
+
+# defines parse_age(), which turns an age such as "90m", "12h", "30d" or "2w" into seconds.
+# A bare number counts days. Anything else raises ValueError.
+def parse_age(text: str) -> float:
+    """Return the number of seconds of an age."""
+    match = _AGE.fullmatch(text.strip().lower())
+    if match is None:
+        raise ValueError(f"invalid age: {text!r}")
+    return float(match.group(1)) * _AGE_UNITS[match.group(2)]
+
+# define Segment as a NamedTuple subclass, the manifest entry of a segment file.
+# count is the number of archived to-dos it holds, first_id and last_id the range of their IDs,
+# and created the time it was written, in seconds since the epoch.
+class Segment(NamedTuple):
+    name: str
+    compression: str
+    count: int
+    first_id: int
+    last_id: int
+    created: float
+
+# define _compressor() and _decompressor(). Both kinds share the same interface, so segments are
+# written and read the same way whatever their compression. _decompressor() also returns
+# the exception raised for damaged data.
+def _compressor(compression: str) -> Any:
+    if compression == "lzma":
+        import lzma
+
+        return lzma.LZMACompressor()
+    return zlib.compressobj(9)
+
+def _decompressor(compression: str) -> Tuple[Any, type]:
+    if compression == "lzma":
+        import lzma
+
+        return lzma.LZMADecompressor(), lzma.LZMAError
+    return zlib.decompressobj(), zlib.error
+
+# define SEGMENT_LINES, how many to-dos are encoded and compressed at a time.
+SEGMENT_LINES = 4096
+
+# defines Archive, the cold storage of completed to-dos. Every archive run writes one segment,
+# a compressed file with one JSON line per to-do holding its ID and its dictionary,
+# and then adds the segment to the manifest, a small JSON file replaced with atomic_write().
+# Segments are never changed once written, so readers don't need the database lock:
+# they only ever see the segments listed by the manifest they read.
+class Archive:
+    def __init__(self, db_path: Path) -> None:
+        self._dir = db_path.with_name(db_path.name + ARCHIVE_SUFFIX)
+        self._manifest_path = self._dir / MANIFEST
+
+    # defines .segments(), which returns the segments listed in the manifest, oldest first.
+    # Read errors raise DatabaseError.
+    def segments(self) -> List[Segment]:
+        """Return the archive segments."""
+        try:
+            manifest = json.loads(self._manifest_path.read_text())
+            return [Segment(**segment) for segment in manifest["segments"]]
+        except FileNotFoundError:
+            return []
+        except OSError:
+            raise DatabaseError(DB_READ_ERROR)
+        except (ValueError, KeyError, TypeError):
+            raise DatabaseError(JSON_ERROR)
+
+    def _write_manifest(self, segments: List[Segment]) -> int:
+        try:
+            with atomic_write(self._manifest_path) as manifest:
+                json.dump({"segments": [s._asdict() for s in segments]}, manifest, indent=4)
+        except OSError:
+            return DB_WRITE_ERROR
+        return sync_files(self._manifest_path)
+
+    # defines .append(), which compresses the items into a new segment while it reads them,
+    # so only a chunk of the compressed output is held in memory, and then lists it in the manifest.
+    # Both files are flushed to stable storage whatever the durability level,
+    # since the caller is about to drop the to-dos from the database.
+    # It returns the new segment, or None if there were no items, and an error code.
+    def append(
+        self, items: Iterable[Item], compression: str = DEFAULT_COMPRESSION
+    ) -> Tuple[Optional[Segment], int]:
+        """Archive the items in a new segment."""
+        try:
+            segments = self.segments()
+        except DatabaseError as error:
+            return None, error.error
+        name = f"{len(segments) + 1:06d}{COMPRESSIONS[compression]}"
+        path = self._dir / name
+        count, first_id, last_id = 0, 0, 0
+        try:
+            self._dir.mkdir(exist_ok=True)
+            with atomic_write(path, "wb") as segment:
+                compressor = _compressor(compression)
+                lines = []
+                for todo_id, todo in items:
+                    lines.append(json.dumps([todo_id, todo]) + "\n")
+                    first_id = first_id or todo_id
+                    last_id = todo_id
+                    count += 1
+                    if len(lines) == SEGMENT_LINES:
+                        segment.write(compressor.compress("".join(lines).encode()))
+                        lines = []
+                segment.write(compressor.compress("".join(lines).encode()))
+                segment.write(compressor.flush())
+        except OSError:
+            return None, DB_WRITE_ERROR
+        except DatabaseError as error:
+            return None, error.error
+        if not count:
+            path.unlink(missing_ok=True)
+            return None, SUCCESS
+        new = Segment(name, compression, count, first_id, last_id, time.time())
+        error = sync_files(path) or self._write_manifest(segments + [new])
+        return (None if error else new), error
+
+    # defines .drop(), which takes a segment back out of the manifest and deletes it,
+    # for when its to-dos couldn't be removed from the database after all.
+    def drop(self, segment: Segment) -> int:
+        """Delete a segment written by .append()."""
+        try:
+            segments = [s for s in self.segments() if s != segment]
+        except DatabaseError as error:
+            return error.error
+        error = self._write_manifest(segments)
+        if not error:
+            (self._dir / segment.name).unlink(missing_ok=True)
+        return error
+
+    # defines .iter_items(), which yields the archived (ID, to-do) items, segment by segment.
+    # Every segment is decompressed a chunk at a time, as it's read. Errors raise DatabaseError.
+    def iter_items(self) -> Iterator[Item]:
+        """Yield the ID and to-do of every archived to-do."""
+        for segment in self.segments():
+            yield from self._iter_segment(segment)
+
+    def _iter_segment(self, segment: Segment) -> Iterator[Item]:
+        decompressor, damaged = _decompressor(segment.compression)
+        rest = b""
+        try:
+            with (self._dir / segment.name).open("rb") as file:
+                while True:
+                    chunk = file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    lines = (rest + decompressor.decompress(chunk)).split(b"\n")
+                    rest = lines.pop()
+                    for line in lines:
+                        todo_id, todo = json.loads(line)
+                        yield todo_id, todo
+        except OSError:
+            raise DatabaseError(DB_READ_ERROR)
+        except (ValueError, TypeError, damaged):
+            raise DatabaseError(JSON_ERROR)
+        # a segment cut short ends before its compressed stream does.
+        if rest or not decompressor.eof:
+            raise DatabaseError(JSON_ERROR)
+
+# defines CompletionLog, which remembers when every to-do was completed, since the to-dos themselves
+# don't carry any time. Todoer appends a line holding the ID and time of each completion,
+# and the archive rewrites the log with only the entries of the to-dos that are still done and hot.
+# The times only decide what's old enough to archive, so a write that fails is ignored,
+# and a to-do without a time gets one from the first archive run that sees it.
+class CompletionLog:
+    def __init__(self, db_path: Path) -> None:
+        self._path = db_path.with_name(db_path.name + DONE_SUFFIX)
+
+    def log(self, todo_ids: Iterable[int]) -> None:
+        """Record the completion of to-dos."""
+        stamp = time.time()
+        lines = "".join(f"{todo_id} {stamp}\n" for todo_id in todo_ids)
+        if not lines:
+            return
+        try:
+            with self._path.open("a") as done_log:
+                done_log.write(lines)
+        except OSError:
+            pass
+
+    # defines .load(), which maps IDs to their first recorded completion time. Damaged lines are skipped.
+    def load(self) -> Dict[int, float]:
+        """Return the completion time of every logged to-do."""
+        times: Dict[int, float] = {}
+        try:
+            with self._path.open("r") as done_log:
+                for line in done_log:
+                    try:
+                        todo_id, stamp = line.split()
+                        times.setdefault(int(todo_id), float(stamp))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return times
+
+    def rewrite(self, times: Dict[int, float]) -> None:
+        """Replace the log with the given completion times."""
+        try:
+            with atomic_write(self._path) as done_log:
+                done_log.write("".join(f"{i} {stamp}\n" for i, stamp in times.items()))
+        except OSError:
+            pass
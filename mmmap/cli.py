@@ -1,17 +1,40 @@
 """This module provides the mmmap CLI."""
 # mmmap/cli.py
 
+import itertools
+import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+)
 
 import typer
 
-from mmmap import ERRORS, __app_name__, __version__, config, database, mmmap
+# imports only the modules every command needs. The model-controller in mmmap.mmmap 
+# and the daemon client in mmmap.client are imported by the helpers that use them, 
+# so commands that never touch the database, like --help, don't pay for loading them.
+from mmmap import ERRORS, __app_name__, __version__, config, database, spans
 
-from mmmap import __app_name__, __version__
+if TYPE_CHECKING:
+    from mmmap.client import RemoteTodoer
+    from mmmap.mmmap import Todoer
+    from mmmap.shards import Shard
 
 # creates an explicit Typer application, app
 app = typer.Typer()
+# define state, the global options of the command line. The main() callback fills it in 
+# before any command runs. "list" holds the name of the list picked with --list, or None for the default list.
+state: Dict[str, Any] = {"list": None}
+
+# define _default_db_path(), the database location that init offers. 
+# A named list gets a shard file next to the database of the default list.
+def _default_db_path() -> str:
+    if state["list"] is None:
+        return str(database.DEFAULT_DB_FILE_PATH)
+    db_path = database.DEFAULT_DB_FILE_PATH
+    if config.is_registered(config.CONFIG_FILE_PATH):
+        db_path = database.get_database_path(config.CONFIG_FILE_PATH)
+    return str(config.shard_path(db_path, state["list"]))
 
 
 # define init() as a Typer command using the @app.command() decorator.
@@ -20,17 +43,48 @@ def init(
     # define a Typer Option instance and assign it as a default value to db_path. 
     # To provide a value for this option, your users need to use --db-path or -db followed by a database path. 
     # The prompt argument displays a prompt asking for a database location. 
-    # It also allows you to accept the default path by pressing Enter.
+    # It also allows you to accept the default path by pressing Enter. 
+    # The default comes from _default_db_path(), so it depends on the --list option.
     db_path: str = typer.Option(
-        str(database.DEFAULT_DB_FILE_PATH),
+        _default_db_path,
         "--db-path",
         "-db",
         prompt="to-do database location?",
     ),
+    # defines backend as an option that selects the storage engine. 
+    # The choice is stored in config.ini next to the database path.
+    backend: str = typer.Option(
+        database.DEFAULT_BACKEND,
+        "--backend",
+        "-b",
+        help=f"Storage engine: {' or '.join(database.BACKENDS)}.",
+    ),
+    # defines durability as an option that selects when commits are flushed to stable storage. 
+    # It's stored in config.ini too, and every command that changes the to-dos can override it.
+    durability: str = typer.Option(
+        database.DEFAULT_DURABILITY,
+        "--durability",
+        help=f"When to fsync commits: {' or '.join(database.DURABILITY_LEVELS)}.",
+    ),
+    # defines codec as an option that selects how the json and journal engines encode the database. 
+    # It's stored in config.ini too, and "mmmap convert" changes it later.
+    codec: str = typer.Option(
+        database.DEFAULT_CODEC,
+        "--codec",
+        help=f"Database encoding: {' or '.join(database.CODECS)}.",
+    ),
 ) -> None:
     """Initialize the mmmap database."""
-    # calls init_app() to create the application’s configuration file and to-do database.
-    app_init_error = config.init_app(db_path)
+    if backend not in database.BACKENDS:
+        typer.secho(f'Unknown storage backend "{backend}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    _check_durability(durability)
+    _check_codec(codec)
+    # calls init_app() to create the application’s configuration file and to-do database. 
+    # With --list, the list gets a section of its own and the other lists stay as they are.
+    app_init_error = config.init_app(
+        db_path, backend, database.durability_level(durability), codec, state["list"]
+    )
     # check if the call to init_app() returns an error. 
     # If so, lines 38 to 41 print an error message. 
     # Line 42 exits the app with a typer.Exit exception and an exit code of 1 to signal 
@@ -42,7 +96,7 @@ def init(
         )
         raise typer.Exit(1)
     # calls init_database() to initialize the database with an empty to-do list.
-    db_init_error = database.init_database(Path(db_path))
+    db_init_error = database.init_database(Path(db_path), backend, codec)
     # check if the call to init_database() returns an error. 
     # If so, then lines 49 to 52 display an error message, and line 53 exits the application. 
     # Otherwise, line 55 prints a success message in green text.
@@ -61,13 +115,28 @@ def init(
 # Typer provides several built-in colors in typer.colors. There you’ll find RED, BLUE, GREEN, and more. 
 # You can use those colors with secho() as you did here (above).
 
-# To have an instance of Todoer with a valid database path
-def get_todoer() -> mmmap.Todoer:
+# To have a valid database path and storage engine
+def get_database() -> Tuple[Path, str]:
     # defines a conditional that checks if the application’s configuration file exists. 
     # To do so, it uses Path.exists().
     if config.CONFIG_FILE_PATH.exists():
-        # If the configuration file exists, then gets the path to the database from it.
-        db_path = database.get_database_path(config.CONFIG_FILE_PATH)
+        # checks that the list picked with --list, or the default list, is registered. 
+        # A config file made by "mmmap --list NAME init" alone has no section for the default list.
+        list_name = state["list"]
+        named = _section() != config.DEFAULT_SECTION
+        if not config.is_registered(config.CONFIG_FILE_PATH, list_name):
+            if named:
+                message = (
+                    f'List "{list_name}" not found. Please, run "mmmap --list {list_name} init"'
+                )
+            else:
+                message = 'Config file not found. Please, run "mmmap init"'
+            typer.secho(message, fg=typer.colors.RED)
+            raise typer.Exit(1)
+        # If the configuration file exists, then gets the path to the database 
+        # and the storage engine from it.
+        db_path = database.get_database_path(config.CONFIG_FILE_PATH, _section())
+        backend = database.get_database_backend(config.CONFIG_FILE_PATH, _section())
     # The else clause runs if the file doesn’t exist. 
     else:
         # This clause prints an error message to the screen 
@@ -79,8 +148,8 @@ def get_todoer() -> mmmap.Todoer:
         raise typer.Exit(1)
     # checks if the path to the database exists.
     if db_path.exists():
-        # If so, then creates an instance of Todoer with the path as an argument.
-        return mmmap.Todoer(db_path)
+        # If so, then returns the path and the storage engine.
+        return db_path, backend
     # Otherwise, the else clause that starts typer.secho and prints an error message 
     else:
         typer.secho(
@@ -90,17 +159,85 @@ def get_todoer() -> mmmap.Todoer:
         # and exits the application.
         raise typer.Exit(1)
 
+# define _get_shards(), which returns the shard of every list for the commands that read all of them.
+def _get_shards() -> List["Shard"]:
+    from mmmap import shards
+
+    if not config.CONFIG_FILE_PATH.exists():
+        typer.secho(
+            'Config file not found. Please, run "mmmap init"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    return shards.get_shards(config.CONFIG_FILE_PATH)
+
+# define _section(), the config.ini section of the list picked with --list.
+def _section() -> str:
+    return config.list_section(state["list"])
+
+# define durability_option(), the --durability option of the commands that change the to-dos. 
+# It overrides the durability level stored in config.ini for a single command.
+def durability_option() -> Any:
+    return typer.Option(
+        None,
+        "--durability",
+        help="Override the durability level in config.ini: "
+        f"{' or '.join(database.DURABILITY_LEVELS)}.",
+    )
+
+def _check_durability(durability: Optional[str]) -> None:
+    if durability is None:
+        return
+    if database.durability_level(durability) not in database.DURABILITY_LEVELS:
+        typer.secho(f'Unknown durability level "{durability}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+
+def _check_codec(codec: str) -> None:
+    if codec not in database.CODECS:
+        typer.secho(f'Unknown codec "{codec}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+
+# To have an instance of Todoer with a valid database path. 
+# The whole lookup is timed as the "config" phase of --profile. 
+# If an mmmap daemon is running, you get a RemoteTodoer that forwards every call to it instead, 
+# which skips reading the config file and parsing the database. 
+# Passing remote=False always gets a local Todoer. 
+# The socket file is checked first, so the client module is only imported when a daemon may be listening. 
+# The durability argument overrides the level in config.ini. The daemon always uses its own level. 
+# The daemon only serves the default list, so the other lists always get a local Todoer.
+def get_todoer(
+    remote: bool = True, durability: Optional[str] = None
+) -> Union["Todoer", "RemoteTodoer"]:
+    with spans.span("config"):
+        _check_durability(durability)
+        default_list = _section() == config.DEFAULT_SECTION
+        if remote and default_list and config.SOCKET_PATH.exists():
+            from mmmap import client
+
+            sock = client.connect(config.SOCKET_PATH)
+            if sock is not None:
+                return client.RemoteTodoer(sock)
+        from mmmap import mmmap
+
+        # creates an instance of Todoer with the path and the storage engine as arguments. 
+        # Group commit is on, so mmmap commands running at the same time share their writes and fsyncs.
+        db_path, backend = get_database()
+        if durability is None:
+            durability = database.get_database_durability(config.CONFIG_FILE_PATH, _section())
+        codec = database.get_database_codec(config.CONFIG_FILE_PATH, _section())
+        return mmmap.Todoer(
+            db_path, backend, group_commit=True, durability=durability, codec=codec
+        )
+
 # define add() as a Typer command using the @app.command() Python decorator.
 @app.command()
 def add(
     # defines description as an argument to add(). 
     # This argument holds a list of strings representing a to-do description. 
     # To build the argument, you use typer.Argument. 
-    # When you pass an ellipsis (...) as the first argument to the constructor of Argument, 
-    # you’re telling Typer that description is required. 
-    # The fact that this argument is required means that 
-    # the user must provide a to-do description at the command line
-    description: List[str] = typer.Argument(...),
+    # Passing None as the first argument to the constructor of Argument makes description optional, 
+    # because the descriptions can come from --from-file instead of the command line.
+    description: List[str] = typer.Argument(None),
     # defines priority as a Typer option with a default value of 2. 
     # The option names are --priority and -p. 
     # As you decided earlier, priority only accepts three possible values: 1, 2, or 3. 
@@ -108,10 +245,36 @@ def add(
     # This way, Typer automatically validates the user’s input 
     # and only accepts numbers within the specified interval.
     priority: int = typer.Option(2, "--priority", "-p", min=1, max=3),
+    # defines from_file as an option that reads one to-do description per line from a file. 
+    # Passing "-" reads the descriptions from standard input. 
+    # All the to-dos are added with a single read-modify-write cycle.
+    from_file: Optional[typer.FileText] = typer.Option(
+        None,
+        "--from-file",
+        help='Add one to-do per line of a file, or of standard input with "-".',
+    ),
+    durability: Optional[str] = durability_option(),
 ) -> None:
-    """Add a new to-do with a DESCRIPTION."""
+    """Add a new to-do with a DESCRIPTION, or many with --from-file."""
+    if from_file is None and not description:
+        typer.secho("Missing a DESCRIPTION or --from-file", fg=typer.colors.RED)
+        raise typer.Exit(1)
     # gets a Todoer instance to use.
-    todoer = get_todoer()
+    todoer = get_todoer(durability=durability)
+    if from_file is not None:
+        # collects the non-empty lines of the file and adds them in one go with .add_many().
+        descriptions = [line.strip() for line in from_file if line.strip()]
+        todos, error = todoer.add_many(descriptions, priority)
+        if error:
+            typer.secho(
+                f'Adding to-dos failed with "{ERRORS[error]}"', fg=typer.colors.RED
+            )
+            raise typer.Exit(1)
+        typer.secho(
+            f"{len(todos)} to-dos were added with priority: {priority}",
+            fg=typer.colors.GREEN,
+        )
+        return
     # calls .add() on todoer and unpacks the result into todo and error.
     todo, error = todoer.add(description, priority)
     # define a conditional statement that prints an error message and exits the application 
@@ -132,87 +295,246 @@ def add(
 
 # define list_all() as a Typer command using the @app.command() decorator. 
 # The name argument to this decorator sets a custom name for the command, which is list here. 
-# Note that list_all() doesn’t take any argument or option. It just lists the to-dos 
-# when the user runs list from the command line.
+# The to-dos are streamed through render.render(), which formats and writes them in large chunks 
+# and only adds colour when standard output is a terminal.
 @app.command(name="list")
-def list_all() -> None:
+def list_all(
+    # defines output_format as an option that picks the human-readable table 
+    # or one of the machine-readable formats, which are easier to pipe into other tools.
+    output_format: str = typer.Option(
+        "table",
+        "--format",
+        help="Output format: table, json, jsonl, csv or tsv.",
+    ),
+    # define limit and offset, which page through the list without reading the to-dos after the page.
+    limit: Optional[int] = typer.Option(
+        None, "--limit", min=0, help="Show at most this many to-dos."
+    ),
+    offset: int = typer.Option(0, "--offset", min=0, help="Skip this many to-dos first."),
+    # define the query options. They filter the to-dos while they're read, 
+    # and sort keeps only the best `top` to-dos when top is given, instead of sorting the whole list.
+    priority: Optional[int] = typer.Option(
+        None, "--priority", "-p", min=1, max=3, help="Only show to-dos with this priority."
+    ),
+    pending: bool = typer.Option(False, "--pending", help="Only show pending to-dos."),
+    done: bool = typer.Option(False, "--done", help="Only show completed to-dos."),
+    match: Optional[str] = typer.Option(
+        None, "--match", "-m", help="Only show to-dos whose description contains TEXT."
+    ),
+    sort: Optional[str] = typer.Option(
+        None, "--sort", help="Sort by id, priority, description or done."
+    ),
+    top: Optional[int] = typer.Option(
+        None, "--top", min=0, help="Show only the first N to-dos of the result."
+    ),
+    # defines archived, which lists the to-dos moved to the archive by "mmmap archive" instead.
+    archived: bool = typer.Option(
+        False, "--archived", help="List the archived to-dos instead."
+    ),
+    # defines all_lists, which runs the query over every list at once and adds a List column.
+    all_lists: bool = typer.Option(
+        False, "--all-lists", help="List the to-dos of every list."
+    ),
+) -> None:
     """List all to-dos."""
-    # gets the Todoer instance that you’ll use.
-    todoer = get_todoer()
-    # gets the to-do list from the database by calling .get_todo_list() on todoer.
-    todo_list = todoer.get_todo_list()
-    # define a conditional statement to check if there’s at least one to-do in the list. 
-    # If not, then the if code block prints an error message to the screen and exits the application.
-    if len(todo_list) == 0:
-        typer.secho(
-            "There are no tasks in the to-do list yet", fg=typer.colors.RED
-        )
-        raise typer.Exit()
-    # prints a top-level header to present the to-do list. In this case, secho() takes an additional 
-    # Boolean argument called bold, which enables you to display text in a bolded font format.
-    typer.secho("\nto-do list:\n", fg=typer.colors.BLUE, bold=True)
-    # define and print the required columns to display the to-do list in a tabular format.
-    columns = (
-        "ID.  ",
-        "| Priority  ",
-        "| Done  ",
-        "| Description  ",
+    from mmmap import query, render
+
+    if output_format not in render.FORMATS:
+        typer.secho(f'Unknown output format "{output_format}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    if sort is not None and sort not in query.SORT_KEYS:
+        typer.secho(f'Unknown sort key "{sort}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    if all_lists and archived:
+        typer.secho("--all-lists doesn't list archived to-dos", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    # --pending and --done together ask for both kinds of to-dos, which is the same as neither.
+    todo_query = query.Query(
+        priority=priority,
+        done=None if pending == done else done,
+        match=match,
+        sort=sort,
+        top=top,
+    )
+    # gets a lazy iterator over the to-dos and their stable IDs that satisfy the query 
+    # by calling .query() on todoer, and cuts the requested page out of it.
+    # The archived to-dos go through the same query, decompressed segment by segment as they're read.
+    stop = None if limit is None else offset + limit
+    filtered = priority is not None or pending or done or match
+    # With --all-lists, the shards of every list are queried in parallel by mmmap.shards instead.
+    if all_lists:
+        from mmmap import shards
+
+        all_shards = _get_shards()
+    else:
+        # gets the Todoer instance that you’ll use.
+        todoer = get_todoer()
+
+    def get_items() -> Iterator[Tuple[int, Dict[str, Any]]]:
+        if all_lists:
+            return shards.query_shards(all_shards, todo_query)
+        if archived:
+            return query.run_query(todo_query, todoer.iter_archived_items())
+        return todoer.query(todo_query)
+
+    if filtered:
+        empty_message = "No to-dos match the query"
+    elif archived:
+        empty_message = "There are no archived to-dos yet"
+    elif all_lists:
+        empty_message = "There are no tasks in any list yet"
+    else:
+        empty_message = "There are no tasks in the to-do list yet"
+    _print_items(
+        lambda: itertools.islice(get_items(), offset, stop),
+        output_format,
+        empty_message,
+        with_list=all_lists,
     )
-    headers = "".join(columns)
-    typer.secho(headers, fg=typer.colors.BLUE, bold=True)
-    typer.secho("-" * len(headers), fg=typer.colors.BLUE)
-    # run a for loop to print every single to-do on its own row with appropriate padding and separators.
-    for id, todo in enumerate(todo_list, 1):
-        desc, priority, done = todo.values()
+    # Then run the application with the command `python -m mmmap list`
+
+# define _print_items(). This helper renders the (ID, to-do) items returned by get_items() 
+# in the given output format. get_items() is called inside the error handling, 
+# because a sorted query or a search reads the database up front. 
+# With with_list=True, the to-dos come from several lists and the output gets a List column.
+def _print_items(
+    get_items: Callable[[], Iterator[Tuple[int, Dict[str, Any]]]],
+    output_format: str,
+    empty_message: str,
+    with_list: bool = False,
+) -> None:
+    from mmmap import render
+
+    try:
+        todo_iter = iter(get_items())
+        # peeks at the first to-do to check if there’s at least one to-do in the list. 
+        # If not, then the table format prints an error message to the screen and exits the application, 
+        # while the other formats write an empty document.
+        first = next(todo_iter, None)
+        if first is None and output_format == "table":
+            typer.secho(empty_message, fg=typer.colors.RED)
+            raise typer.Exit()
+        items = todo_iter if first is None else itertools.chain([first], todo_iter)
+        # The chunks already hold their ANSI codes, if any, so typer.echo() mustn't strip them. 
+        with spans.span("render"):
+            render.render(
+                items,
+                output_format,
+                lambda chunk: typer.echo(chunk, nl=False, color=True),
+                color=sys.stdout.isatty(),
+                with_list=with_list,
+            )
+    # If reading the database fails, even halfway through the list, prints an error message and exits.
+    except database.DatabaseError as error:
         typer.secho(
-            f"{id}{(len(columns[0]) - len(str(id))) * ' '}"
-            f"| ({priority}){(len(columns[1]) - len(str(priority)) - 4) * ' '}"
-            f"| {done}{(len(columns[2]) - len(str(done)) - 2) * ' '}"
-            f"| {desc}",
-            fg=typer.colors.BLUE,
+            f'Reading to-dos failed with "{ERRORS[error.error]}"',
+            fg=typer.colors.RED,
         )
-    # prints a line of dashes with a final line feed character (\n) to visually separate the to-do list 
-    # from the next command-line prompt.
-    typer.secho("-" * len(headers) + "\n", fg=typer.colors.BLUE)
-    # Then run the application with the command `python -m mmmap list`
+        raise typer.Exit(1)
+
+# define search() as a Typer command. It looks the words up in the search index, 
+# so it doesn't read the to-do database, except to build the index the first time.
+@app.command()
+def search(
+    words: List[str] = typer.Argument(
+        ..., help="Words to look for. End a word with * to match a prefix."
+    ),
+    any_term: bool = typer.Option(
+        False, "--any", "-o", help="Match to-dos holding any of the words, not all of them."
+    ),
+    output_format: str = typer.Option(
+        "table",
+        "--format",
+        help="Output format: table, json, jsonl, csv or tsv.",
+    ),
+    limit: Optional[int] = typer.Option(
+        None, "--limit", min=0, help="Show at most this many to-dos."
+    ),
+) -> None:
+    """Search the to-do descriptions."""
+    from mmmap import render
+
+    if output_format not in render.FORMATS:
+        typer.secho(f'Unknown output format "{output_format}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    # Without --list, once there are named lists, the search covers all of them, 
+    # each one searched by a thread of mmmap.shards, and the output gets a List column.
+    if state["list"] is None and config.get_list_names(config.CONFIG_FILE_PATH):
+        from mmmap import shards
+
+        all_shards = _get_shards()
+        _print_items(
+            lambda: shards.search_shards(all_shards, words, any_term, limit),
+            output_format,
+            "No to-dos match the search",
+            with_list=True,
+        )
+        return
+    todoer = get_todoer()
+    _print_items(
+        lambda: iter(todoer.search(words, any_term, limit)),
+        output_format,
+        "No to-dos match the search",
+    )
+
+# define _parse_ids(). This helper turns the TODO_IDS arguments into a sorted list of unique IDs. 
+# Every argument is either a single ID, like 7, or an inclusive range, like 10-250.
+def _parse_ids(values: List[str]) -> List[int]:
+    todo_ids = set()
+    for value in values:
+        start, _, end = value.partition("-")
+        try:
+            first = int(start)
+            last = int(end) if end else first
+        except ValueError:
+            raise typer.BadParameter(f'"{value}" is not a to-do ID or a range of IDs')
+        if first < 1 or last < first:
+            raise typer.BadParameter(f'"{value}" is not a valid range of IDs')
+        todo_ids.update(range(first, last + 1))
+    return sorted(todo_ids)
 
 # define set_done() as a Typer command with the usual @app.command() decorator. 
 # In this case, you use complete for the command name. 
 @app.command(name="complete")
-# The set_done() function takes an argument called todo_id, 
-# which defaults to an instance of typer.Argument. 
+# The set_done() function takes an argument called todo_ids, which collects one or more IDs or ranges of IDs. 
 # This instance will work as a required command-line argument.
-def set_done(todo_id: int = typer.Argument(...)) -> None:
-    """Complete a to-do by setting it as done using its TODO_ID."""
+def set_done(
+    todo_ids: List[str] = typer.Argument(...),
+    durability: Optional[str] = durability_option(),
+) -> None:
+    """Complete to-dos by setting them as done using their TODO_IDS (like 3 7 10-250)."""
+    ids = _parse_ids(todo_ids)
     # gets the usual Todoer instance.
-    todoer = get_todoer()
-    # sets the to-do with the specific todo_id as done by calling .set_done() on todoer.
-    todo, error = todoer.set_done(todo_id)
+    todoer = get_todoer(durability=durability)
+    # sets every to-do in ids as done by calling .set_done_many() on todoer. 
+    # This reads and writes the database once, however many IDs there are.
+    todos, error = todoer.set_done_many(ids)
     # checks if any error occurs during the process. 
     if error:
         # If so, then print an appropriate error message 
         typer.secho(
-            f'Completing to-do # "{todo_id}" failed with "{ERRORS[error]}"',
+            f'Completing to-do # "{" ".join(todo_ids)}" failed with "{ERRORS[error]}"',
             fg=typer.colors.RED,
         )
         # and exit the application with an exit code of 1.
         raise typer.Exit(1)
     # If no error occurs, 
     else:
-        # then print a success message in green font.
-        typer.secho(
-            f"""to-do # {todo_id} "{todo['Description']}" completed!""",
-            fg=typer.colors.GREEN,
-        )
+        # then print a success message in green font for every completed to-do.
+        for todo_id, todo in zip(ids, todos):
+            typer.secho(
+                f"""to-do # {todo_id} "{todo['Description']}" completed!""",
+                fg=typer.colors.GREEN,
+            )
 
 # define remove() as a Typer CLI command.
 @app.command()
 def remove(
-    # defines todo_id as an argument of type int. 
-    # In this case, todo_id is a required instance of typer.Argument.
-    todo_id: int = typer.Argument(...),
+    # defines todo_ids as an argument that collects one or more IDs or ranges of IDs. 
+    # In this case, todo_ids is a required instance of typer.Argument.
+    todo_ids: List[str] = typer.Argument(...),
     # defines force as an option for the remove command. 
-    # It’s a Boolean option that allows you to delete a to-do without confirmation.
+    # It’s a Boolean option that allows you to delete to-dos without confirmation.
     force: bool = typer.Option(
         # This option defaults to False
         False,
@@ -222,52 +544,56 @@ def remove(
         # defines a help message for the force option.
         help="Force deletion without confirmation.",
     ),
+    durability: Optional[str] = durability_option(),
 ) -> None:
-    """Remove a to-do using its TODO_ID."""
+    """Remove to-dos using their TODO_IDS (like 5 or 5-40)."""
+    ids = _parse_ids(todo_ids)
     # creates the required Todoer instance.
-    todoer = get_todoer()
+    todoer = get_todoer(durability=durability)
 
     # define an inner function called _remove(). 
     # It’s a helper function that allows you to reuse the remove functionality.
     def _remove():
-        # The function removes a to-do using its ID. To do that, it calls .remove() on todoer.
-        todo, error = todoer.remove(todo_id)
+        # The function removes the to-dos using their IDs. To do that, it calls .remove_many() on todoer, 
+        # which takes care of the IDs that shift as items are popped.
+        todos, error = todoer.remove_many(ids)
         if error:
             typer.secho(
-                f'Removing to-do # {todo_id} failed with "{ERRORS[error]}"',
+                f'Removing to-do # {" ".join(todo_ids)} failed with "{ERRORS[error]}"',
                 fg=typer.colors.RED,
             )
             raise typer.Exit(1)
         else:
-            typer.secho(
-                f"""to-do # {todo_id}: '{todo["Description"]}' was removed""",
-                fg=typer.colors.GREEN,
-            )
+            for todo_id, todo in zip(ids, todos):
+                typer.secho(
+                    f"""to-do # {todo_id}: '{todo["Description"]}' was removed""",
+                    fg=typer.colors.GREEN,
+                )
 
-    # checks the value of force. A True value means that the user wants to remove the to-do 
+    # checks the value of force. A True value means that the user wants to remove the to-dos 
     # without confirmation.
     if force:
         # In this situation, calls _remove() to run the remove operation.
         _remove()
     # starts an else clause that runs if force is False.
     else:
-        # gets the entire to-do list from the database.
-        todo_list = todoer.get_todo_list()
-        # define a try … except statement that retrieves the desired to-do from the list.
-        try:
-            todo = todo_list[todo_id - 1]
-        # If an IndexError occurs,
-        except IndexError:
-            # then prints an error message,
+        # gets the to-dos to remove from the database.
+        todos, error = todoer.get_todos(ids)
+        # checks that every ID points at a to-do in the list.
+        if error:
+            # If not, then prints an error message,
             typer.secho("Invalid TODO_ID", fg=typer.colors.RED)
             # and exits the application.
             raise typer.Exit(1)
         # call Typer’s confirm() and store the result in delete. 
         # This function provides an alternative way to ask for confirmation. 
-        delete = typer.confirm(
-            # It allows you to use a dynamically created confirmation prompt like the following line.
-            f"Delete to-do # {todo_id}: {todo['Description']}?"
-        )
+        # It allows you to use a dynamically created confirmation prompt: 
+        # a single to-do is shown by description, several to-dos by count.
+        if len(ids) == 1:
+            prompt = f"Delete to-do # {ids[0]}: {todos[0]['Description']}?"
+        else:
+            prompt = f"Delete {len(ids)} to-dos?"
+        delete = typer.confirm(prompt)
         # checks if delete is True,
         if delete:
             # in which case calls _remove().
@@ -289,10 +615,11 @@ def remove_all(
         # provides a help message for the force option.
         help="Force deletion without confirmation.",
     ),
+    durability: Optional[str] = durability_option(),
 ) -> None:
     """Remove all to-dos."""
     # gets the usual Todoer instance.
-    todoer = get_todoer()
+    todoer = get_todoer(durability=durability)
     # checks if force is True. 
     if force:
         # If so, then the if code block removes all the to-dos from the database using .remove_all().
@@ -315,6 +642,319 @@ def remove_all(
         # indicating no, to force.
         typer.echo("Operation canceled")
 
+# define migrate() as a Typer command. It copies the current database into a new one 
+# that uses the storage engine given with --backend, and then points config.ini at the new database.
+@app.command()
+def migrate(
+    backend: str = typer.Option(
+        ...,
+        "--backend",
+        "-b",
+        help=f"Target storage engine: {' or '.join(database.BACKENDS)}.",
+    ),
+    # defines db_path as the location of the new database. 
+    # It defaults to the current path with a suffix that matches the target engine.
+    db_path: Optional[str] = typer.Option(
+        None,
+        "--db-path",
+        "-db",
+        help="Location of the new database.",
+    ),
+) -> None:
+    """Copy the to-do database into a new storage BACKEND."""
+    from mmmap import client, mmmap
+
+    if backend not in database.BACKENDS:
+        typer.secho(f'Unknown storage backend "{backend}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    # refuses to move the database from under a running daemon.
+    if client.is_running(config.SOCKET_PATH):
+        typer.secho(
+            'Stop "mmmap serve" before migrating the database', fg=typer.colors.RED
+        )
+        raise typer.Exit(1)
+    # makes sure the current database exists before reading its location and engine.
+    src_path, src_backend = get_database()
+    # keeps the durability level and the codec of the current database.
+    durability = database.get_database_durability(config.CONFIG_FILE_PATH, _section())
+    codec = database.get_database_codec(config.CONFIG_FILE_PATH, _section())
+    todoer = mmmap.Todoer(src_path, src_backend, durability=durability, codec=codec)
+    if db_path is None:
+        suffix = {"sqlite": ".db", "records": ".todo"}.get(backend, ".json")
+        db_path = str(src_path.with_suffix(suffix))
+    if Path(db_path).resolve() == src_path.resolve():
+        typer.secho(
+            "The new database must not overwrite the current one",
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    error = todoer.migrate(Path(db_path), backend)
+    if not error:
+        error = config.init_app(db_path, backend, durability, codec, state["list"])
+    if error:
+        typer.secho(
+            f'Migrating the database failed with "{ERRORS[error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    else:
+        typer.secho(
+            f"The to-do database is {db_path} ({backend})", fg=typer.colors.GREEN
+        )
+
+# define convert() as a Typer command. It rewrites the current database with the codec given with --codec, 
+# in place, and then records the codec in config.ini. Reads detect the codec from the file, 
+# so the database stays readable even if the command is interrupted between the two steps.
+@app.command()
+def convert(
+    codec: str = typer.Option(
+        ...,
+        "--codec",
+        help=f"Target encoding: {' or '.join(database.CODECS)}.",
+    ),
+    durability: Optional[str] = durability_option(),
+) -> None:
+    """Rewrite the to-do database with another CODEC."""
+    from mmmap import client, mmmap
+
+    _check_codec(codec)
+    _check_durability(durability)
+    # refuses to rewrite the database under a running daemon, which would keep writing the old codec.
+    if client.is_running(config.SOCKET_PATH):
+        typer.secho(
+            'Stop "mmmap serve" before converting the database', fg=typer.colors.RED
+        )
+        raise typer.Exit(1)
+    db_path, backend = get_database()
+    if backend not in database.CODEC_BACKENDS:
+        typer.secho(
+            f'The {backend} storage backend has its own format', fg=typer.colors.RED
+        )
+        raise typer.Exit(1)
+    stored_durability = database.get_database_durability(config.CONFIG_FILE_PATH, _section())
+    todoer = mmmap.Todoer(
+        db_path,
+        backend,
+        durability=durability or stored_durability,
+        codec=database.get_database_codec(config.CONFIG_FILE_PATH, _section()),
+    )
+    error = todoer.convert(codec)
+    if not error:
+        error = config.init_app(
+            str(db_path), backend, stored_durability, codec, state["list"]
+        )
+    if error:
+        typer.secho(
+            f'Converting the database failed with "{ERRORS[error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    else:
+        typer.secho(f"The to-do database is now {codec}", fg=typer.colors.GREEN)
+
+# define compact() as a Typer command. It folds the journal into a new database file 
+# when the journal storage engine is in use, vacuums an SQLite database, 
+# and simply rewrites the file otherwise.
+@app.command()
+def compact(durability: Optional[str] = durability_option()) -> None:
+    """Compact the to-do database."""
+    todoer = get_todoer(durability=durability)
+    error = todoer.compact().error
+    if error:
+        typer.secho(
+            f'Compacting the database failed with "{ERRORS[error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    else:
+        typer.secho("The to-do database was compacted", fg=typer.colors.GREEN)
+
+# define archive() as a Typer command. It moves the completed to-dos into a new compressed segment 
+# of the archive, next to the database, and drops them from the database, 
+# so the other commands don't keep parsing them. "mmmap list --archived" shows them again.
+@app.command()
+def archive(
+    older_than: Optional[str] = typer.Option(
+        None,
+        "--older-than",
+        help="Only archive to-dos completed at least this long ago, such as 90m, 12h, 30d or 2w.",
+    ),
+    compression: str = typer.Option(
+        "zlib", "--compression", help="Segment compression: zlib or lzma."
+    ),
+    durability: Optional[str] = durability_option(),
+) -> None:
+    """Move completed to-dos to the archive."""
+    from mmmap.archive import COMPRESSIONS, parse_age
+
+    if compression not in COMPRESSIONS:
+        typer.secho(f'Unknown compression "{compression}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    try:
+        age = None if older_than is None else parse_age(older_than)
+    except ValueError:
+        typer.secho(f'Invalid age "{older_than}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    todoer = get_todoer(durability=durability)
+    count, error = todoer.archive(age, compression)
+    if error:
+        typer.secho(
+            f'Archiving to-dos failed with "{ERRORS[error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    elif count:
+        typer.secho(f"{count} completed to-do(s) moved to the archive", fg=typer.colors.GREEN)
+    else:
+        typer.secho("There are no completed to-dos to archive", fg=typer.colors.GREEN)
+
+# define import_file() as a Typer command named import, a Python keyword. It appends the to-dos of a file
+# to the database in a single pass. The file is read, validated and written a chunk at a time
+# by mmmap.transfer, so it can be larger than memory. If any record is invalid,
+# nothing is imported and the error names its line.
+@app.command(name="import")
+def import_file(
+    path: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, metavar="FILE", help="File to import."
+    ),
+    # defines file_format, which is guessed from the extension of the file when it's not given.
+    file_format: Optional[str] = typer.Option(
+        None, "--format", help="Input format: csv, jsonl or txt."
+    ),
+    priority: int = typer.Option(
+        2, "--priority", "-p", min=1, max=3, help="Priority of to-dos that don't have one."
+    ),
+    durability: Optional[str] = durability_option(),
+) -> None:
+    """Import to-dos from a CSV, JSON Lines or text FILE."""
+    from mmmap import client, transfer
+
+    file_format = file_format or transfer.guess_format(path)
+    if file_format not in transfer.FORMATS:
+        typer.secho(
+            f'Unknown input format "{file_format or path.suffix}"', fg=typer.colors.RED
+        )
+        raise typer.Exit(1)
+    # refuses to rewrite the database under a running daemon, which holds its own copy of the list.
+    default_list = _section() == config.DEFAULT_SECTION
+    if default_list and client.is_running(config.SOCKET_PATH):
+        typer.secho(
+            'Stop "mmmap serve" before importing to-dos', fg=typer.colors.RED
+        )
+        raise typer.Exit(1)
+    todoer = get_todoer(remote=False, durability=durability)
+    try:
+        count, error = todoer.import_todos(
+            transfer.iter_import(path, file_format, priority)
+        )
+    except transfer.RecordError as record_error:
+        typer.secho(
+            f"Importing to-dos failed at {record_error}", fg=typer.colors.RED
+        )
+        raise typer.Exit(1)
+    except OSError:
+        typer.secho(f"Reading {path} failed", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    if error:
+        typer.secho(
+            f'Importing to-dos failed with "{ERRORS[error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    else:
+        typer.secho(f"Imported {count} to-do(s) from {path}", fg=typer.colors.GREEN)
+
+# define export() as a Typer command. It streams every to-do to standard output, or to a file,
+# in a format that "mmmap import" reads back.
+@app.command()
+def export(
+    file_format: str = typer.Option(
+        "csv", "--format", help="Output format: csv, jsonl or txt."
+    ),
+    output: Optional[Path] = typer.Option(
+        None, "--output", "-o", dir_okay=False, help="Write to this file instead."
+    ),
+) -> None:
+    """Export all to-dos as CSV, JSON Lines or text."""
+    from mmmap import transfer
+
+    if file_format not in transfer.FORMATS:
+        typer.secho(f'Unknown output format "{file_format}"', fg=typer.colors.RED)
+        raise typer.Exit(1)
+    todoer = get_todoer()
+    try:
+        if output is None:
+            transfer.export_items(
+                todoer.iter_todo_items(),
+                file_format,
+                lambda chunk: typer.echo(chunk, nl=False),
+            )
+        else:
+            with output.open("w", encoding="utf-8", newline="") as file:
+                transfer.export_items(todoer.iter_todo_items(), file_format, file.write)
+    except database.DatabaseError as error:
+        typer.secho(
+            f'Reading to-dos failed with "{ERRORS[error.error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    except OSError:
+        typer.secho(f"Writing {output} failed", fg=typer.colors.RED)
+        raise typer.Exit(1)
+
+# define serve() as a Typer command. It runs the mmmap daemon in the foreground until you press Ctrl+C 
+# or send it SIGTERM. While it runs, the other commands send their requests to it 
+# over a Unix domain socket instead of reading and writing the database themselves. 
+# Restart the daemon after running "mmmap init", "mmmap migrate" or "mmmap convert", 
+# since it keeps serving the database it started with.
+@app.command()
+def serve(
+    # defines flush_interval as an option. With the default of 0, every change is written 
+    # to the database right away. With a positive value, changes stay in memory 
+    # and are written at most that many seconds later, and when the daemon stops.
+    flush_interval: float = typer.Option(
+        0.0,
+        "--flush-interval",
+        min=0.0,
+        help="Seconds between writes to disk, 0 to write every change right away.",
+    ),
+) -> None:
+    """Run the mmmap daemon on a Unix domain socket."""
+    import asyncio
+
+    from mmmap import server
+
+    if _section() != config.DEFAULT_SECTION:
+        typer.secho("The daemon only serves the default list", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    db_path, backend = get_database()
+    if not hasattr(asyncio, "start_unix_server"):
+        typer.secho("The daemon needs Unix domain sockets", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    if not server.claim_socket(config.SOCKET_PATH):
+        typer.secho("An mmmap daemon is already running", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    typer.secho(
+        f"Serving {db_path} on {config.SOCKET_PATH}", fg=typer.colors.GREEN
+    )
+    durability = database.get_database_durability(config.CONFIG_FILE_PATH)
+    codec = database.get_database_codec(config.CONFIG_FILE_PATH)
+    todo_server = server.TodoServer(
+        db_path, backend, flush_interval, durability, codec
+    )
+    try:
+        asyncio.run(todo_server.serve(config.SOCKET_PATH))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    # The daemon flushes the pending changes on the way out. If that fails, they're lost, which is reported.
+    if todo_server.flush_error:
+        typer.secho(
+            f'Writing pending changes failed with "{ERRORS[todo_server.flush_error]}"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    typer.secho("The mmmap daemon stopped", fg=typer.colors.GREEN)
+
 # define _version_callback(). This function takes a Boolean argument called value. 
 # If value is True, then the function prints the application’s name and version using echo(). 
 # After that, it raises a typer.Exit exception to exit the application cleanly.
@@ -323,9 +963,82 @@ def _version_callback(value: bool) -> None:
         typer.echo(f"{__app_name__} v{__version__}")
         raise typer.Exit()
 
+# define PROFILE_TRACE_PREFIX and expand_profile_option(). Click can't give a flag an optional value, 
+# so --profile is a flag and the trace file goes to --profile-trace. expand_profile_option() 
+# rewrites a --profile=FILE among the global options into --profile-trace FILE, 
+# so mmmap --profile=trace.json list works from the entry point too.
+PROFILE_TRACE_PREFIX = "--profile="
+
+def expand_profile_option(args: List[str]) -> List[str]:
+    """Rewrite --profile=FILE as --profile-trace FILE."""
+    for i, arg in enumerate(args):
+        if not arg.startswith("-"):
+            break
+        if arg.startswith(PROFILE_TRACE_PREFIX):
+            trace_path = arg[len(PROFILE_TRACE_PREFIX):]
+            return [*args[:i], "--profile-trace", trace_path, *args[i + 1:]]
+    return args
+
+# define CPROFILE_LINES, how many functions --cprofile prints.
+CPROFILE_LINES = 30
+
+# define _start_profile(). It records the spans of the command with a spans.Recorder 
+# and, with use_cprofile, runs cProfile as well. The report is left to ctx.call_on_close(), 
+# so it runs once the command is over, even if the command exits with an error: 
+# the per-phase breakdown goes to standard error, or the spans go to trace_path as a Chrome trace, 
+# and cProfile prints the functions that took the most cumulative time.
+def _start_profile(
+    ctx: typer.Context, breakdown: bool, trace_path: Optional[Path], use_cprofile: bool
+) -> None:
+    recorder = None
+    if breakdown or trace_path is not None:
+        recorder = spans.Recorder().__enter__()
+    profiler = None
+    if use_cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def report() -> None:
+        if profiler is not None:
+            profiler.disable()
+        if recorder is not None:
+            recorder.__exit__(None, None, None)
+            if trace_path is None:
+                _print_breakdown(recorder)
+            else:
+                import json
+
+                trace_path.write_text(json.dumps(recorder.chrome_trace()))
+                typer.echo(
+                    f"Wrote {len(recorder.spans)} spans to {trace_path}", err=True
+                )
+        if profiler is not None:
+            import pstats
+
+            stats = pstats.Stats(profiler, stream=sys.stderr)
+            stats.sort_stats("cumulative").print_stats(CPROFILE_LINES)
+
+    ctx.call_on_close(report)
+
+# define _print_breakdown(), which prints the self time of every phase and its share 
+# of the whole command. "other" is the time outside every span, such as Typer and the imports.
+def _print_breakdown(recorder: spans.Recorder) -> None:
+    wall = max((recorder.end - recorder.start) / 1e6, 1e-6)
+    typer.echo(f"{'phase':10} {'calls':>7} {'ms':>10} {'share':>7}", err=True)
+    accounted = 0.0
+    for name, (calls, ms) in recorder.breakdown().items():
+        typer.echo(f"{name:10} {calls:7d} {ms:10.2f} {ms / wall:7.1%}", err=True)
+        accounted += ms
+    other = wall - accounted
+    typer.echo(f"{'other':10} {'':7} {other:10.2f} {other / wall:7.1%}", err=True)
+    typer.echo(f"{'total':10} {'':7} {wall:10.2f}", err=True)
+
 # define main() as a Typer callback using the @app.callback() decorator.
 @app.callback()
 def main(
+    ctx: typer.Context,
     # defines version, which is of type Optional[bool]. 
     # This means it can be either of bool or None type. 
     # The version argument defaults to a typer.Option object, 
@@ -345,9 +1058,36 @@ def main(
         # sets the is_eager argument to True. This argument tells Typer that 
         # the version command-line option has precedence over other commands in the current application.
         is_eager=True,
-    )
+    ),
+    # defines list_name, the named list that the command works on. Every list has its own database, 
+    # so a command only reads the to-dos of its list. Leaving it out picks the default list.
+    list_name: Optional[str] = typer.Option(
+        None, "--list", "-l", help="Work on this named list instead of the default one."
+    ),
+    # define the profiling options, which apply to whatever command follows them.
+    profile: bool = typer.Option(
+        False, "--profile", help="Print the time spent in every phase of the command."
+    ),
+    profile_trace: Optional[Path] = typer.Option(
+        None,
+        "--profile-trace",
+        help="Write the phases as a Chrome trace to this file. Also --profile=FILE.",
+    ),
+    use_cprofile: bool = typer.Option(
+        False,
+        "--cprofile",
+        help="Run the command under cProfile and print the hottest functions.",
+    ),
 ) -> None:
-    return
+    if list_name is not None and not config.is_list_name(list_name):
+        typer.secho(
+            f'Invalid list name "{list_name}": use letters, digits, "-" and "_"',
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(1)
+    state["list"] = list_name
+    if profile or profile_trace is not None or use_cprofile:
+        _start_profile(ctx, profile, profile_trace, use_cprofile)
 
 # Nice! With all this code in place, you can now give the init command a try. 
 # Go back to your terminal and run the following: `python -m mmmap init`
\ No newline at end of file
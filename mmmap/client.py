@@ -0,0 +1,167 @@
+"""This module provides the mmmap daemon client."""
+# mmmap/client.py
+
+import json
+import socket
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR
+from mmmap.archive import DEFAULT_COMPRESSION
+from mmmap.database import DatabaseError
+from mmmap.mmmap import ArchiveResult, CurrentTodo, CurrentTodos
+from mmmap.query import Query
+
+# define the timeout, in seconds, for connecting to the daemon and waiting for its answers.
+TIMEOUT = 30.0
+
+# define the wire protocol shared by the client and the daemon. Every request is a single line of JSON
+# holding the name of a Todoer method and its arguments, and every response is a single line of JSON
+# holding the result and an error code.
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """Encode a protocol message as a line of JSON."""
+    return json.dumps(message).encode() + b"\n"
+
+# defines connect(). It returns a socket connected to the daemon listening on socket_path,
+# or None if no daemon is running there, so callers can fall back to direct file access.
+def connect(socket_path: Path) -> Optional[socket.socket]:
+    """Connect to a running mmmap daemon."""
+    if not hasattr(socket, "AF_UNIX") or not socket_path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(TIMEOUT)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+# defines is_running(), which tells whether a daemon answers on socket_path, without keeping the connection.
+def is_running(socket_path: Path) -> bool:
+    """Check whether an mmmap daemon is running."""
+    sock = connect(socket_path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+# defines RemoteTodoer, which offers the Todoer methods used by the CLI
+# but forwards every call to the daemon over its Unix domain socket.
+# The daemon already holds the parsed database, so a call costs a round trip instead of a full read.
+class RemoteTodoer:
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def close(self) -> None:
+        """Close the connection to the daemon."""
+        self._reader.close()
+        self._sock.close()
+
+    # defines ._call(), which sends one request and waits for its response.
+    # It raises OSError if the daemon goes away in the middle of the call.
+    def _call(self, op: str, *args: Any) -> Dict[str, Any]:
+        self._sock.sendall(encode_message({"op": op, "args": list(args)}))
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("the mmmap daemon closed the connection")
+        return json.loads(line)
+
+    def _todos(self, op: str, *args: Any) -> CurrentTodos:
+        try:
+            response = self._call(op, *args)
+        except (OSError, ValueError):
+            return CurrentTodos([], DB_WRITE_ERROR)
+        return CurrentTodos(response["result"], response["error"])
+
+    def add(self, description: List[str], priority: int = 2) -> CurrentTodo:
+        """Add a new to-do to the database."""
+        todos, error = self.add_many([" ".join(description)], priority)
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    def add_many(self, descriptions: Iterable[str], priority: int = 2) -> CurrentTodos:
+        """Add several new to-dos to the database at once."""
+        return self._todos("add_many", list(descriptions), priority)
+
+    def get_todos(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Return the to-dos with the given IDs."""
+        return self._todos("get_todos", list(todo_ids))
+
+    def set_done_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Set several to-dos as done."""
+        return self._todos("set_done_many", list(todo_ids))
+
+    def remove_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Remove several to-dos from the database."""
+        return self._todos("remove_many", list(todo_ids))
+
+    def set_done(self, todo_id: int) -> CurrentTodo:
+        """Set a to-do as done."""
+        todos, error = self.set_done_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    def remove(self, todo_id: int) -> CurrentTodo:
+        """Remove a to-do from the database using its id."""
+        todos, error = self.remove_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    def remove_all(self) -> CurrentTodo:
+        """Remove all to-dos from the database."""
+        return CurrentTodo({}, self._todos("remove_all").error)
+
+    def compact(self) -> CurrentTodo:
+        """Compact the to-do database."""
+        return CurrentTodo({}, self._todos("compact").error)
+
+    def archive(
+        self, older_than: Optional[float] = None, compression: str = DEFAULT_COMPRESSION
+    ) -> ArchiveResult:
+        """Move completed to-dos to the archive."""
+        try:
+            response = self._call("archive", older_than, compression)
+        except (OSError, ValueError):
+            return ArchiveResult(0, DB_WRITE_ERROR)
+        return ArchiveResult(response["result"], response["error"])
+
+    # defines .iter_todo_items(), .query(), .search() and .iter_archived_items(). 
+    # Read errors are raised as database.DatabaseError, like Todoer does.
+    def iter_todo_items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the ID and to-do of every current to-do."""
+        return self._items("iter_todo_items")
+
+    # defines .query(). The daemon runs the query, so only the matching to-dos cross the socket.
+    def query(self, query: Query) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the ID and to-do of every current to-do that satisfies the query."""
+        return self._items("query", *query)
+
+    def search(
+        self, words: List[str], any_term: bool = False, limit: Optional[int] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Return the ID and to-do of every current to-do that matches the search."""
+        return self._items("search", words, any_term, limit)
+
+    def iter_archived_items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the ID and to-do of every archived to-do."""
+        return self._items("iter_archived_items")
+
+    def _items(self, op: str, *args: Any) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        try:
+            response = self._call(op, *args)
+        except (OSError, ValueError):
+            raise DatabaseError(DB_READ_ERROR)
+        if response["error"]:
+            raise DatabaseError(response["error"])
+        for todo_id, todo in response["result"]:
+            yield todo_id, todo
+
+    def iter_todo_list(self) -> Iterator[Dict[str, Any]]:
+        """Yield the current to-dos one at a time."""
+        return (todo for _, todo in self.iter_todo_items())
+
+    def get_todo_list(self) -> List[Dict[str, Any]]:
+        """Return the current to-do list."""
+        try:
+            return list(self.iter_todo_list())
+        except DatabaseError:
+            return []
@@ -0,0 +1,257 @@
+"""This module provides the mmmap database codecs."""
+# mmmap/codec.py
+
+import io
+import json
+import re
+import struct
+from typing import IO, Any, Dict, Iterable, Iterator, List
+
+from mmmap.spans import span
+from mmmap.todo import chunks
+
+# define the names of the available codecs, which decide how the JSON and journal storage engines
+# encode the to-do list. "json-pretty" is the original indented JSON, "json-compact" is JSON
+# without any whitespace, and "binary" is a length-prefixed binary format built on struct.
+CODECS = ("json-pretty", "json-compact", "binary")
+DEFAULT_CODEC = "json-pretty"
+
+# define the layout of the binary format. It starts with a header holding a magic number,
+# the format version, a reserved field and the number of to-dos. Every to-do follows as a record
+# holding the length of its UTF-8 description, its priority and its done flag, followed by the description.
+HEADER = struct.Struct("<4sHHQ")
+MAGIC = b"MMTB"
+VERSION = 1
+RECORD = struct.Struct("<IBB")
+
+# define the size of the chunks read by iter_json_array() and the pattern used to skip whitespace.
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# define how many to-dos .dump_iter() encodes and writes at a time.
+CHUNK_TODOS = 4096
+
+# defines CodecError, raised when a file doesn't hold what its codec expects.
+# It's a ValueError, like json.JSONDecodeError, so handlers report both as JSON_ERROR.
+class CodecError(ValueError):
+    pass
+
+# define iter_json_array(). This generator reads a JSON array from a file in chunks
+# and yields its elements one at a time, so memory stays bounded by the chunk size
+# plus the largest element instead of growing with the whole file.
+# It uses JSONDecoder.raw_decode() to decode each element straight from the buffer,
+# reading another chunk whenever an element runs past the end of it.
+def iter_json_array(file: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the elements of a JSON array read from a file in chunks."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+
+    def fill() -> bool:
+        # drops the part of the buffer that was already decoded and appends a new chunk.
+        nonlocal buffer, pos
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        # skips whitespace and returns the next significant character, or "" at the end of the file.
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return ""
+
+    if next_char() != "[":
+        raise ValueError("the database is not a JSON array")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        if not next_char():
+            raise ValueError("unterminated JSON array in the database")
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the element may just be cut off at the end of the chunk.
+                if fill():
+                    continue
+                raise
+            # a value that ends exactly at the end of the buffer might continue in the next chunk.
+            if end == len(buffer) and fill():
+                continue
+            break
+        pos = end
+        yield item
+        separator = next_char()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("expected ',' or ']' in the database")
+        pos += 1
+
+# defines Codec, the interface of every codec. Codecs work on files opened in binary mode:
+# .dump() writes a whole to-do list, .load() reads one back,
+# and .iter_load() yields the to-dos one at a time without holding the whole list.
+# .dump_iter() writes the to-dos of an iterable a chunk at a time, with the same result as .dump(),
+# so a list can be rewritten while it's being read from another file.
+class Codec:
+    name = ""
+
+    def dump(self, todo_list: List[Dict[str, Any]], file: IO[bytes]) -> None:
+        """Write a to-do list to a file."""
+        self.dump_iter(todo_list, file)
+
+    def dump_iter(self, todos: Iterable[Dict[str, Any]], file: IO[bytes]) -> None:
+        """Write the to-dos of an iterable to a file, a chunk at a time."""
+        raise NotImplementedError
+
+    def load(self, file: IO[bytes]) -> List[Dict[str, Any]]:
+        """Read a to-do list from a file."""
+        with span("decode"):
+            return list(self.iter_load(file))
+
+    def iter_load(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        """Yield the to-dos of a file one at a time."""
+        raise NotImplementedError
+
+# defines JSONCodec. With indent=None it encodes with json.dumps(), which uses the C encoder,
+# while the indented form goes through the pure-Python one.
+class JSONCodec(Codec):
+    def __init__(self, name: str, indent: Any = None) -> None:
+        self.name = name
+        self._indent = indent
+        self._separators = None if indent is not None else (",", ":")
+
+    def dump(self, todo_list: List[Dict[str, Any]], file: IO[bytes]) -> None:
+        with span("encode"):
+            data = json.dumps(
+                todo_list, indent=self._indent, separators=self._separators
+            ).encode()
+        file.write(data)
+
+    # writes the array one chunk of elements at a time. Every chunk is encoded as a list of its own 
+    # and written without its brackets, which lays the elements out exactly as json.dumps() of the whole list.
+    def dump_iter(self, todos: Iterable[Dict[str, Any]], file: IO[bytes]) -> None:
+        start, separator, end = ("[", ",", "]") if self._indent is None else ("[\n", ",\n", "\n]")
+        prefix = start
+        for chunk in chunks(todos, CHUNK_TODOS):
+            with span("encode"):
+                text = json.dumps(chunk, indent=self._indent, separators=self._separators)
+                data = (prefix + text[len(start):-len(end)]).encode()
+            file.write(data)
+            prefix = separator
+        file.write(b"[]" if prefix == start else end.encode())
+
+    def load(self, file: IO[bytes]) -> List[Dict[str, Any]]:
+        with span("read"):
+            data = file.read()
+        with span("decode"):
+            return json.loads(data)
+
+    def iter_load(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        yield from iter_json_array(io.TextIOWrapper(file, encoding="utf-8"))
+
+# defines BinaryCodec, the length-prefixed binary format. Decoding is a struct.unpack_from()
+# and a slice per to-do, with no parsing of the text at all.
+class BinaryCodec(Codec):
+    name = "binary"
+
+    # writes the header with a count of zero first, and then goes back to store
+    # the real count once every record was written.
+    def dump_iter(self, todos: Iterable[Dict[str, Any]], file: IO[bytes]) -> None:
+        header_at = file.tell()
+        file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        count = 0
+        for chunk in chunks(todos, CHUNK_TODOS):
+            with span("encode"):
+                parts = []
+                for todo in chunk:
+                    description = todo["Description"].encode()
+                    parts.append(
+                        RECORD.pack(len(description), todo["Priority"], bool(todo["Done"]))
+                    )
+                    parts.append(description)
+                data = b"".join(parts)
+            file.write(data)
+            count += len(chunk)
+        end = file.tell()
+        file.seek(header_at)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, count))
+        file.seek(end)
+
+    @staticmethod
+    def _count(header: bytes) -> int:
+        if len(header) < HEADER.size:
+            raise CodecError("truncated header")
+        magic, version, _, count = HEADER.unpack_from(header, 0)
+        if magic != MAGIC or version != VERSION:
+            raise CodecError("unsupported binary database")
+        return count
+
+    def load(self, file: IO[bytes]) -> List[Dict[str, Any]]:
+        with span("read"):
+            data = file.read()
+        with span("decode"):
+            return self._decode(data)
+
+    def _decode(self, data: bytes) -> List[Dict[str, Any]]:
+        count = self._count(data)
+        todo_list = []
+        unpack_from = RECORD.unpack_from
+        pos = HEADER.size
+        for _ in range(count):
+            if pos + RECORD.size > len(data):
+                raise CodecError("truncated record")
+            length, priority, done = unpack_from(data, pos)
+            pos += RECORD.size
+            if pos + length > len(data):
+                raise CodecError("truncated description")
+            todo_list.append({
+                "Description": data[pos:pos + length].decode(),
+                "Priority": priority,
+                "Done": bool(done),
+            })
+            pos += length
+        return todo_list
+
+    def iter_load(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        count = self._count(file.read(HEADER.size))
+        for _ in range(count):
+            record = file.read(RECORD.size)
+            if len(record) < RECORD.size:
+                raise CodecError("truncated record")
+            length, priority, done = RECORD.unpack(record)
+            description = file.read(length)
+            if len(description) < length:
+                raise CodecError("truncated description")
+            yield {
+                "Description": description.decode(),
+                "Priority": priority,
+                "Done": bool(done),
+            }
+
+# defines get_codec(), which maps a codec name to its codec.
+def get_codec(name: str = DEFAULT_CODEC) -> Codec:
+    """Return the codec with the given name."""
+    if name == "json-pretty":
+        return JSONCodec(name, indent=4)
+    if name == "json-compact":
+        return JSONCodec(name)
+    if name == "binary":
+        return BinaryCodec()
+    raise ValueError(f"unknown codec: {name!r}")
+
+# defines detect_codec(), which picks the codec that can read a file opened in binary mode
+# by peeking at its first bytes, without consuming them. Binary files start with MAGIC,
+# and both JSON codecs read any JSON, so reads work whatever codec wrote the file.
+def detect_codec(file: IO[bytes]) -> Codec:
+    """Return a codec that can decode the given file."""
+    if file.peek(len(MAGIC))[:len(MAGIC)] == MAGIC:
+        return BinaryCodec()
+    return JSONCodec("json-compact")
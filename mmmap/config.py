@@ -4,24 +4,95 @@
 # imports configparser. This module provides the ConfigParser class, 
 # which allows you to handle config files with a structure similar to INI files.
 import configparser
+import re
 # imports Path from pathlib. This class provides a cross-platform way to handle system paths.
 from pathlib import Path
-# imports typer.
-import typer
+from typing import List, Optional
 #  import a bunch of required objects from mmmap.
 from mmmap import (
     DB_WRITE_ERROR, DIR_ERROR, FILE_ERROR, SUCCESS, __app_name__
 )
 
-# creates CONFIG_DIR_PATH to hold the path to the app’s directory. 
-# To get this path, you call get_app_dir() with the application’s name as an argument. 
-# This function returns a string representing the path to a directory where you can store configurations.
-CONFIG_DIR_PATH = Path(typer.get_app_dir(__app_name__))
-# defines CONFIG_FILE_PATH to hold the path to the configuration file itself.
-CONFIG_FILE_PATH = CONFIG_DIR_PATH / "config.ini"
+# define the files in the app’s directory: CONFIG_FILE_PATH holds the path to the configuration file itself, 
+# and SOCKET_PATH holds the path to the Unix domain socket of the mmmap daemon.
+_CONFIG_DIR_FILES = {"CONFIG_FILE_PATH": "config.ini", "SOCKET_PATH": "mmmap.sock"}
+
+# defines __getattr__(), which creates CONFIG_DIR_PATH, CONFIG_FILE_PATH and SOCKET_PATH the first time 
+# they're used, so importing this module doesn't import Typer. 
+# CONFIG_DIR_PATH holds the path to the app’s directory. To get this path, you call get_app_dir() 
+# with the application’s name as an argument. This function returns a string representing the path 
+# to a directory where you can store configurations.
+def __getattr__(name: str) -> Path:
+    if name == "CONFIG_DIR_PATH":
+        import typer
+
+        value = Path(typer.get_app_dir(__app_name__))
+    elif name in _CONFIG_DIR_FILES:
+        value = _config_path("CONFIG_DIR_PATH") / _CONFIG_DIR_FILES[name]
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+# defines _config_path(), which the functions of this module use to get the paths, 
+# since a plain name in the module doesn't go through __getattr__().
+def _config_path(name: str) -> Path:
+    return globals()[name] if name in globals() else __getattr__(name)
+
+# define the sections of config.ini. The default list lives in the "General" section, 
+# and every named list gets a "list:NAME" section with the same keys, 
+# pointing to a shard file of its own. The name "default" always refers to the default list.
+DEFAULT_SECTION = "General"
+DEFAULT_LIST = "default"
+LIST_SECTION_PREFIX = "list:"
+_LIST_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+# defines is_list_name(), which tells if a list name can be used as a section and in a file name.
+def is_list_name(name: str) -> bool:
+    """Return True if name is a valid list name."""
+    return _LIST_NAME.fullmatch(name) is not None
+
+# defines list_section(), which maps a list name, or None for the default list, to its section.
+def list_section(list_name: Optional[str] = None) -> str:
+    """Return the config.ini section of a list."""
+    if list_name is None or list_name == DEFAULT_LIST:
+        return DEFAULT_SECTION
+    return LIST_SECTION_PREFIX + list_name
+
+# defines get_list_names(), which returns the names of the named lists registered in a config file.
+def get_list_names(config_file: Path) -> List[str]:
+    """Return the names of the named lists."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_file)
+    return sorted(
+        section[len(LIST_SECTION_PREFIX):]
+        for section in config_parser.sections()
+        if section.startswith(LIST_SECTION_PREFIX)
+    )
+
+# defines is_registered(), which tells if a list, or the default list for None, has a section in a config file. 
+# Setting up a named list first leaves the default list unregistered until "mmmap init" runs.
+def is_registered(config_file: Path, list_name: Optional[str] = None) -> bool:
+    """Return True if the list has a section in the config file."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_file)
+    return config_parser.has_section(list_section(list_name))
+
+# defines shard_path(), the default shard file of a named list, next to the database of the default list, 
+# so "todo.json" gets a "todo.infra.json" shard for the "infra" list.
+def shard_path(db_path: Path, list_name: str) -> Path:
+    """Return the default database path of a named list."""
+    return db_path.with_name(f"{db_path.stem}.{list_name}{db_path.suffix}")
 
 # defines init_app(). This function initializes the application’s configuration file and database.
-def init_app(db_path: str) -> int:
+# With list_name, it registers that list in its own section instead of setting up the default list.
+def init_app(
+    db_path: str,
+    backend: str = "json",
+    durability: str = "none",
+    codec: str = "json-pretty",
+    list_name: Optional[str] = None,
+) -> int:
     """Initialize the application."""
     # calls the _init_config_file() helper function, which you define in lines 47 to 56. 
     # Calling this function creates the configuration directory using Path.mkdir(). 
@@ -36,7 +107,7 @@ def init_app(db_path: str) -> int:
     # calls the _create_database() helper function, which creates the database. 
     # This function returns the appropriate error codes if something happens while creating the database. 
     # It returns SUCCESS if the process succeeds.
-    database_code = _create_database(db_path)
+    database_code = _create_database(db_path, backend, durability, codec, list_name)
     # checks if an error occurs during the creation of the database. 
     # If so, then line 23 returns the corresponding error code.
     if database_code != SUCCESS:
@@ -46,20 +117,30 @@ def init_app(db_path: str) -> int:
 
 def _init_config_file() -> int:
     try:
-        CONFIG_DIR_PATH.mkdir(exist_ok=True)
+        _config_path("CONFIG_DIR_PATH").mkdir(exist_ok=True)
     except OSError:
         return DIR_ERROR
     try:
-        CONFIG_FILE_PATH.touch(exist_ok=True)
+        _config_path("CONFIG_FILE_PATH").touch(exist_ok=True)
     except OSError:
         return FILE_ERROR
     return SUCCESS
 
-def _create_database(db_path: str) -> int:
+# The other sections of config.ini are kept, so setting up one list leaves the others registered.
+def _create_database(
+    db_path: str, backend: str, durability: str, codec: str, list_name: Optional[str]
+) -> int:
+    config_file = _config_path("CONFIG_FILE_PATH")
     config_parser = configparser.ConfigParser()
-    config_parser["General"] = {"database": db_path}
+    config_parser.read(config_file)
+    config_parser[list_section(list_name)] = {
+        "database": db_path,
+        "backend": backend,
+        "durability": durability,
+        "codec": codec,
+    }
     try:
-        with CONFIG_FILE_PATH.open("w") as file:
+        with config_file.open("w") as file:
             config_parser.write(file)
     except OSError:
         return DB_WRITE_ERROR
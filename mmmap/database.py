@@ -2,11 +2,15 @@
 # mmmap/database.py
 
 import configparser
-import json
+import contextlib
+import itertools
+import os
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple
+from typing import IO, Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, JSON_ERROR, SUCCESS
+from mmmap.codec import CODECS, DEFAULT_CODEC, detect_codec, get_codec, iter_json_array
+from mmmap.spans import span
 
 # define DEFAULT_DB_FILE_PATH to hold the default database file path. 
 # The application will use this path if the user doesn’t provide a custom one.
@@ -18,25 +22,119 @@ DEFAULT_DB_FILE_PATH = Path.home().joinpath(
 # reads the input file using ConfigParser.read(), 
 # and returns a Path object representing the path to the to-do database on your file system. 
 # The ConfigParser instance stores the data in a dictionary. 
-# The "General" key represents the file section that stores the required information. 
+# The "General" key represents the file section that stores the required information, 
+# and section picks the section of a named list instead. 
 # The "database" key retrieves the database path.
-def get_database_path(config_file: Path) -> Path:
+def get_database_path(config_file: Path, section: str = "General") -> Path:
     """Return the current path to the to-do database."""
     config_parser = configparser.ConfigParser()
     config_parser.read(config_file)
-    return Path(config_parser["General"]["database"])
+    return Path(config_parser[section]["database"])
+
+# define the names of the available storage engines. "json" is the original engine 
+# that keeps the whole to-do list in a single JSON file. "journal" keeps the same JSON file 
+# as a checkpoint and appends every mutation to a small journal file next to it. 
+# "sqlite" keeps the to-dos as rows in an SQLite database, and "records" keeps them 
+# in a memory-mapped file of fixed-width binary records.
+BACKENDS = ("json", "journal", "sqlite", "records")
+DEFAULT_BACKEND = "json"
+
+# define get_database_backend(). It works like get_database_path() but returns 
+# the name of the storage engine stored under the "backend" key. 
+# Config files created before this key existed fall back to the JSON engine.
+def get_database_backend(config_file: Path, section: str = "General") -> str:
+    """Return the name of the storage engine for the to-do database."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_file)
+    return config_parser[section].get("backend", DEFAULT_BACKEND)
+
+# define the durability levels, which decide when committed changes are flushed to stable storage with fsync. 
+# "none" leaves it to the operating system, "lazy" flushes now and then, with no bound on how long
+# the last commits stay unflushed, and "full" flushes the database files and their directory after every commit.
+DURABILITY_LEVELS = ("none", "lazy", "full")
+DEFAULT_DURABILITY = "none"
+# "batch" is the former name of "lazy". Config files and command lines that still use it keep working.
+DURABILITY_ALIASES = {"batch": "lazy"}
+
+# defines durability_level(), which maps a durability level or one of its aliases to the level.
+def durability_level(level: str) -> str:
+    """Return the durability level an alias stands for."""
+    return DURABILITY_ALIASES.get(level, level)
+
+# define get_database_durability(). It works like get_database_backend() but returns the durability level 
+# stored under the "durability" key. Config files created before this key existed fall back to "none".
+def get_database_durability(config_file: Path, section: str = "General") -> str:
+    """Return the durability level for the to-do database."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_file)
+    return durability_level(config_parser[section].get("durability", DEFAULT_DURABILITY))
+
+# define the storage engines that encode the to-do list with a codec from mmmap.codec. 
+# The SQLite and record engines have formats of their own.
+CODEC_BACKENDS = ("json", "journal")
+
+# define get_database_codec(). It works like get_database_backend() but returns the codec 
+# stored under the "codec" key. Config files created before this key existed fall back to "json-pretty".
+def get_database_codec(config_file: Path, section: str = "General") -> str:
+    """Return the name of the codec for the to-do database."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_file)
+    return config_parser[section].get("codec", DEFAULT_CODEC)
+
+# define get_database_handler(). This function maps a backend name to the handler class 
+# that implements it. The modules of the other engines are imported lazily so the default engine 
+# doesn't pay for them. The codec only matters to the engines in CODEC_BACKENDS,
+# and streaming only to the engines that rewrite the whole file.
+def get_database_handler(
+    db_path: Path,
+    backend: str = DEFAULT_BACKEND,
+    cache: bool = False,
+    codec: str = DEFAULT_CODEC,
+    streaming: bool = False,
+) -> "DatabaseHandler":
+    """Return a database handler for the given storage engine."""
+    handler_class: type
+    if backend == "journal":
+        from mmmap.journal import JournalDatabaseHandler as handler_class
+    elif backend == "sqlite":
+        from mmmap.sqlite import SQLiteDatabaseHandler as handler_class
+    elif backend == "records":
+        from mmmap.records import RecordDatabaseHandler as handler_class
+    elif backend == "json":
+        handler_class = DatabaseHandler
+    else:
+        raise ValueError(f"unknown storage backend: {backend!r}")
+    return handler_class(db_path, cache=cache, codec=codec, streaming=streaming)
 
 # define init_database(). This function takes a database path and writes a string representing an empty list. 
 # You call .write_text() on the database path, and the list initializes the JSON database with an empty to-do list. 
 # If the process runs successfully, then init_database() returns SUCCESS. 
 # Otherwise, it returns the appropriate error code.
-def init_database(db_path: Path) -> int:
+def init_database(
+    db_path: Path, backend: str = DEFAULT_BACKEND, codec: str = DEFAULT_CODEC
+) -> int:
     """Create the to-do database."""
-    try:
-        db_path.write_text("[]")  # Empty to-do list
-        return SUCCESS
-    except OSError:
-        return DB_WRITE_ERROR
+    return get_database_handler(db_path, backend, codec=codec).init_database()
+
+# define migrate_database(). This function copies every to-do from one database to another, 
+# possibly using a different storage engine. The target database is created from scratch 
+# and written with the given codec.
+def migrate_database(
+    src_path: Path,
+    src_backend: str,
+    dst_path: Path,
+    dst_backend: str,
+    codec: str = DEFAULT_CODEC,
+) -> int:
+    """Copy the to-do list from one database to another."""
+    read = get_database_handler(src_path, src_backend).read_todos()
+    if read.error:
+        return read.error
+    dst_handler = get_database_handler(dst_path, dst_backend, codec=codec)
+    init_error = dst_handler.init_database()
+    if init_error:
+        return init_error
+    return dst_handler.write_todos(read.todo_list).error
 
 # define DBResponse as a NamedTuple subclass. 
 # The todo_list field is a list of dictionaries representing individual to-dos, 
@@ -45,39 +143,246 @@ class DBResponse(NamedTuple):
     todo_list: List[Dict[str, Any]]
     error: int
 
+# define Change as a NamedTuple subclass. A Change describes a single mutation of the to-do list: 
+# the op field is one of "add", "done", "remove" or "clear", the index field holds 
+# the zero-based position of the target to-do, and the todo field holds the new to-do for "add". 
+# Passing changes to the database handler, instead of a rewritten list, lets storage engines 
+# like the journal persist just the mutation.
+class Change(NamedTuple):
+    op: str
+    index: int = -1
+    todo: Optional[Dict[str, Any]] = None
+
+# define apply_changes(). This function applies a sequence of changes to a to-do list in place, 
+# in order, and returns the same list. Every storage engine uses it, 
+# so all of them agree on what a change means. The to-do dictionaries themselves are never changed: 
+# "done" replaces the to-do with a completed copy, so other lists holding the same to-dos, 
+# like the parse cache of a DatabaseHandler, keep seeing the old one.
+def apply_changes(
+    todo_list: List[Dict[str, Any]], changes: List[Change]
+) -> List[Dict[str, Any]]:
+    """Apply changes to a to-do list in place."""
+    for change in changes:
+        if change.op == "add":
+            todo_list.append(change.todo)
+        elif change.op == "done":
+            todo_list[change.index] = {**todo_list[change.index], "Done": True}
+        elif change.op == "remove":
+            todo_list.pop(change.index)
+        elif change.op == "clear":
+            todo_list.clear()
+        else:
+            raise ValueError(f"unknown change: {change.op!r}")
+    return todo_list
+
+# define stream_changes(). This generator is the streaming counterpart of apply_changes(): 
+# it applies changes to a stream of to-dos and yields the result, holding only the changes in memory. 
+# It supports "add", "done" and "clear", but not "remove", which shifts the position of every later to-do 
+# and is never needed by Todoer, since it removes to-dos with tombstones in the ID index. 
+# A "done" change past the end of the list raises IndexError once the stream is exhausted.
+def stream_changes(
+    todos: Iterable[Dict[str, Any]], changes: List[Change]
+) -> Iterator[Dict[str, Any]]:
+    """Apply changes to a stream of to-dos and yield the result."""
+    # drops everything before the last "clear", along with the to-dos it clears.
+    for position in range(len(changes) - 1, -1, -1):
+        if changes[position].op == "clear":
+            todos, changes = (), changes[position + 1:]
+            break
+    done = set()
+    added = []
+    for change in changes:
+        if change.op == "add":
+            added.append(change.todo)
+        elif change.op == "done":
+            done.add(change.index)
+        else:
+            raise ValueError(f"can't stream change: {change.op!r}")
+    size = 0
+    for todo in itertools.chain(todos, added):
+        if size in done:
+            todo = {**todo, "Done": True}
+            done.discard(size)
+        size += 1
+        yield todo
+    if done:
+        raise IndexError(f"to-do index out of range: {min(done)}")
+
+# define CacheInfo, the hit and miss counters of the parse cache of a DatabaseHandler.
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+
+# define file_key(). It returns the identity of a file as seen by os.stat(): 
+# its inode, size and modification time in nanoseconds. If any of them changes, 
+# the file may have changed too.
+def file_key(stat_result: os.stat_result) -> Tuple[int, int, int]:
+    """Return the identity of a file from its stat result."""
+    return (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+# define atomic_write(). This context manager opens a temporary file next to path and, 
+# if the with block finishes without errors, moves it over path with os.replace(). 
+# Readers see either the old file or the new one, never a truncated one, and a crash 
+# halfway through a write leaves the old file in place. The new file keeps the permissions of the old one.
+@contextlib.contextmanager
+def atomic_write(path: Path, mode: str = "w") -> Iterator[IO[Any]]:
+    """Write a file through a temporary file that replaces it atomically."""
+    # imports shutil and tempfile here, so commands that only read the database don't load them.
+    import shutil
+    import tempfile
+
+    tmp_file = tempfile.NamedTemporaryFile(
+        mode, dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    )
+    tmp_path = Path(tmp_file.name)
+    try:
+        with tmp_file:
+            yield tmp_file
+        with contextlib.suppress(OSError):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp_path.unlink()
+        raise
+
+# define sync_files(). It flushes files to stable storage with os.fsync(), 
+# and then the directory that holds them, so files moved into place by atomic_write() survive a crash too. 
+# Windows can't open directories, so there only the files are flushed.
+def sync_files(*paths: Path) -> int:
+    """Flush files and their directory to stable storage."""
+    if os.name != "nt":
+        paths += (paths[0].parent,)
+    try:
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    except OSError:
+        return DB_WRITE_ERROR
+    return SUCCESS
+
+# define DatabaseError. Streaming readers can't return a DBResponse, 
+# so they raise this exception instead. Its error attribute holds the usual return code.
+class DatabaseError(Exception):
+    def __init__(self, error: int) -> None:
+        super().__init__(error)
+        self.error = error
+
 # defines DatabaseHandler, which allows you to read and write data to the to-do database 
-# using the json module from the standard library.
+# using a codec from mmmap.codec, indented JSON by default.
 class DatabaseHandler:
-    # define the class initializer, which takes a single argument 
-    # representing the path to the database on your file system.
-    def __init__(self, db_path: Path) -> None:
+    # define the class initializer, which takes an argument 
+    # representing the path to the database on your file system. 
+    # Passing cache=True turns on the parse cache: the handler keeps the last list it read or wrote, 
+    # together with the file_key() of the database at that moment, and reuses it for as long as 
+    # os.stat() reports the same key. This pays off in long-lived processes that read the same file often. 
+    # The codec argument names the codec used to write the database. Reads detect the codec from the file, 
+    # so a database written with any codec can be read. 
+    # Passing streaming=True is the large-database mode: commits and compaction that would load 
+    # the whole list stream the database into a temporary file instead, so memory stays constant.
+    def __init__(
+        self,
+        db_path: Path,
+        cache: bool = False,
+        codec: str = DEFAULT_CODEC,
+        streaming: bool = False,
+    ) -> None:
         self._db_path = db_path
+        self._codec = get_codec(codec)
+        self._streaming = streaming
+        self._cache = cache
+        self._cache_key: Optional[Tuple[int, int, int]] = None
+        self._cache_list: List[Dict[str, Any]] = []
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        """Return the hit and miss counters of the parse cache."""
+        return CacheInfo(self._cache_hits, self._cache_misses)
+
+    # defines ._cached(), which returns the cached list if the database still has the cached key, 
+    # or None otherwise. Callers get a list of their own, because they add and remove to-dos in place, 
+    # but the to-dos in it are shared with the cache: nothing changes a to-do in place, see apply_changes(), 
+    # so a hit costs one list copy instead of a copy of every to-do.
+    def _cached(self) -> Optional[List[Dict[str, Any]]]:
+        if not self._cache:
+            return None
+        try:
+            key = file_key(os.stat(self._db_path))
+        except OSError:
+            key = None
+        if key is not None and key == self._cache_key:
+            self._cache_hits += 1
+            return list(self._cache_list)
+        self._cache_misses += 1
+        return None
+
+    # defines ._remember(), which stores a copy of a list that was just read from or written to the file 
+    # whose os.fstat() result is given. Like ._cached(), it copies the list but not the to-dos.
+    def _remember(
+        self, stat_result: os.stat_result, todo_list: List[Dict[str, Any]]
+    ) -> None:
+        if self._cache:
+            self._cache_key = file_key(stat_result)
+            self._cache_list = list(todo_list)
+
+    # defines ._replacing(), a hook that runs once a new database file is fully written, 
+    # right before it replaces the old one. Engines that keep other files in step with the database 
+    # use it to record what they need to recover if the process dies halfway. OSError aborts the write.
+    def _replacing(self, db: IO[bytes]) -> None:
+        pass
+
+    # defines .init_database(), which writes an empty list to the database file.
+    def init_database(self) -> int:
+        """Create an empty to-do database."""
+        return self.write_todos([]).error  # Empty to-do list
 
     # defines .read_todos(). This method reads the to-do list from the database and deserializes it.
     def read_todos(self) -> DBResponse:
+        # returns the cached list if the parse cache is on and the file hasn't changed since it was filled.
+        cached = self._cached()
+        if cached is not None:
+            return DBResponse(cached, SUCCESS)
         # starts a try … except statement to catch any errors that occur while you’re opening the database. 
         # If an error occurs, then line 79 returns a DBResponse instance with an empty to-do list 
         # and a DB_READ_ERROR.
         try:
-            # opens the database for reading using a with statement.
-            with self._db_path.open("r") as db:
+            # opens the database for reading in binary mode using a with statement.
+            with self._db_path.open("rb") as db:
                 # starts another try … except statement to catch any errors that occur 
-                # while you’re loading and deserializing the JSON content from the to-do database.
+                # while you’re loading and deserializing the content of the to-do database.
                 try:
-                    # returns a DBResponse instance holding the result of calling json.load() 
-                    # with the to-do database object as an argument. 
+                    # returns a DBResponse instance holding the list decoded by the codec 
+                    # that detect_codec() picks from the first bytes of the file. 
                     # This result consists of a list of dictionaries. Every dictionary represents a to-do. 
                     # The error field of DBResponse holds SUCCESS to signal that the operation was successful.
-                    return DBResponse(json.load(db), SUCCESS)
-                # catches any JSONDecodeError while loading the JSON content from the database, 
-                # and line 75 returns with an empty list and a JSON_ERROR.
-                except json.JSONDecodeError:  # Catch wrong JSON format
+                    todo_list = detect_codec(db).load(db)
+                    self._remember(os.fstat(db.fileno()), todo_list)
+                    return DBResponse(todo_list, SUCCESS)
+                # catches any ValueError while decoding the database, which includes JSONDecodeError, 
+                # and returns with an empty list and a JSON_ERROR.
+                except ValueError:  # Catch wrong JSON or binary format
                     return DBResponse([], JSON_ERROR)
         # catches any file IO problems while loading the JSON file, 
         # and line 79 returns a DBResponse instance with an empty to-do list and a DB_READ_ERROR.
         except OSError:  # Catch file IO problems
             return DBResponse([], DB_READ_ERROR)
 
+    # defines .iter_todos(), which yields the to-dos one at a time with the .iter_load() method 
+    # of the detected codec instead of loading the whole list. Errors are raised as DatabaseError.
+    def iter_todos(self) -> Iterator[Dict[str, Any]]:
+        """Yield the to-dos one at a time."""
+        try:
+            with self._db_path.open("rb") as db:
+                yield from detect_codec(db).iter_load(db)
+        except OSError:
+            raise DatabaseError(DB_READ_ERROR)
+        except ValueError:  # Catch wrong JSON or binary format, including JSONDecodeError
+            raise DatabaseError(JSON_ERROR)
+
     # defines .write_todos(), which takes a list of to-do dictionaries and writes it to the database.
     def write_todos(self, todo_list: List[Dict[str, Any]]) -> DBResponse:
         # starts a try … except statement to catch any errors that occur 
@@ -85,11 +390,78 @@ class DatabaseHandler:
         # If an error occurs, then line 95 returns a DBResponse instance with the original to-do list 
         # and a DB_READ_ERROR.
         try:
-            # uses a with statement to open the database for writing.
-            with self._db_path.open("w") as db:
-                # dumps the to-do list as a JSON payload into the database.
-                json.dump(todo_list, db, indent=4)
+            # uses a with statement to open a temporary file that replaces the database 
+            # once the whole list is written, so the database is never left truncated.
+            with span("write"), atomic_write(self._db_path, "wb") as db:
+                # dumps the to-do list into the database with the codec of the handler.
+                self._codec.dump(todo_list, db)
+                # flushes the data, so os.fstat() sees the final size and modification time, 
+                # and refreshes the parse cache with the list that was just written.
+                db.flush()
+                self._remember(os.fstat(db.fileno()), todo_list)
+                self._replacing(db)
             # returns a DBResponse instance holding the to-do list and the SUCCESS code.
             return DBResponse(todo_list, SUCCESS)
         except OSError:  # Catch file IO problems
-            return DBResponse(todo_list, DB_WRITE_ERROR)
\ No newline at end of file
+            return DBResponse(todo_list, DB_WRITE_ERROR)
+
+    # defines .write_todos_iter(), the streaming counterpart of .write_todos(). The to-dos are encoded 
+    # a chunk at a time with .dump_iter() into the temporary file of atomic_write(), so the iterable 
+    # can read them from the database that's being replaced. The returned DBResponse holds an empty list, 
+    # and if the iterable raises DatabaseError, the database is left untouched and its error is returned.
+    def write_todos_iter(self, todos: Iterable[Dict[str, Any]]) -> DBResponse:
+        """Write the to-dos of an iterable to the database, a chunk at a time."""
+        try:
+            with span("write"), atomic_write(self._db_path, "wb") as db:
+                self._codec.dump_iter(todos, db)
+                db.flush()
+                self._replacing(db)
+        except OSError:
+            return DBResponse([], DB_WRITE_ERROR)
+        except DatabaseError as error:
+            return DBResponse([], error.error)
+        return DBResponse([], SUCCESS)
+
+    # defines .commit(), which persists a batch of changes. If the caller already read 
+    # the to-do list, it passes it as todo_list and the changes are applied to it. 
+    # Otherwise, .commit() reads the list itself. This engine then rewrites the whole file. 
+    # In streaming mode, a commit without a list streams the database through stream_changes() instead.
+    def commit(
+        self,
+        changes: List[Change],
+        todo_list: Optional[List[Dict[str, Any]]] = None,
+    ) -> DBResponse:
+        """Apply changes to the to-do list and persist them."""
+        if todo_list is None and self._streaming:
+            if all(change.op != "remove" for change in changes):
+                try:
+                    return self.write_todos_iter(stream_changes(self.iter_todos(), changes))
+                except IndexError:
+                    return DBResponse([], DB_WRITE_ERROR)
+        if todo_list is None:
+            # returns on any read error, so a corrupt database is never overwritten with the changes alone.
+            read = self.read_todos()
+            if read.error:
+                return read
+            todo_list = read.todo_list
+        with span("mutate"):
+            apply_changes(todo_list, changes)
+        return self.write_todos(todo_list)
+
+    # defines .sync(), which makes everything written so far durable. 
+    # Engines that keep more than one file flush all of them.
+    def sync(self) -> int:
+        """Flush the database to stable storage."""
+        return sync_files(self._db_path)
+
+    # defines .compact(). For the JSON engine there is nothing to fold, 
+    # so compacting just rewrites the file with the current to-do list. 
+    # In streaming mode, that rewrite would only copy the file, so it's skipped.
+    def compact(self) -> DBResponse:
+        """Rewrite the database in its most compact form."""
+        if self._streaming:
+            return DBResponse([], SUCCESS)
+        read = self.read_todos()
+        if read.error:
+            return read
+        return self.write_todos(read.todo_list)
@@ -0,0 +1,89 @@
+"""This module provides the mmmap durability policy."""
+# mmmap/durability.py
+
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+
+from mmmap import SUCCESS
+from mmmap.database import DEFAULT_DURABILITY, DURABILITY_LEVELS, durability_level
+
+# define SYNC_SUFFIX. The "lazy" level keeps its state in a small file next to the database,
+# so "todo.json" gets a "todo.json.sync" companion shared by every process.
+SYNC_SUFFIX = ".sync"
+# define the limits of the "lazy" level: a commit is flushed if BATCH_INTERVAL_MS milliseconds have passed
+# since the last flush, or if BATCH_WRITES commits are waiting to be flushed.
+BATCH_INTERVAL_MS = 1000
+BATCH_WRITES = 100
+
+# defines strongest(), which returns the durability level that flushes the most often among levels, 
+# so a commit shared by callers with different levels satisfies all of them.
+def strongest(levels: Iterable[str]) -> str:
+    """Return the strongest of several durability levels."""
+    return max(
+        (durability_level(level) for level in levels),
+        key=DURABILITY_LEVELS.index,
+        default=DEFAULT_DURABILITY,
+    )
+
+# defines SyncPolicy, which decides after every commit whether to flush it to stable storage.
+#
+# - "none" never flushes. A crash of the machine can lose recent commits, but never tears
+#   the database, since whole files are replaced atomically.
+# - "lazy" flushes only while committing: the first commit after a quiet period is flushed right away,
+#   and then one commit every interval_ms milliseconds or every `writes` commits. There's no timer
+#   and nothing is flushed at exit, so there's no bound on how long the commits at the end of a burst
+#   stay unflushed: until the next commit or until the operating system writes them out.
+#   "batch", its former name, is still accepted.
+# - "full" flushes the database files and their directory after every commit.
+#
+# The "lazy" state is the time of the last flush and the number of commits since then.
+# It's read and written while the caller holds the exclusive database lock.
+class SyncPolicy:
+    def __init__(
+        self,
+        db_path: Path,
+        level: str = DEFAULT_DURABILITY,
+        interval_ms: int = BATCH_INTERVAL_MS,
+        writes: int = BATCH_WRITES,
+    ) -> None:
+        self._path = db_path.with_name(db_path.name + SYNC_SUFFIX)
+        self.level = durability_level(level)
+        self.interval_ms = interval_ms
+        self.writes = writes
+
+    # defines .committed(), which the caller runs after every commit. The sync argument
+    # is the function that flushes the database, returning an error code. 
+    # The level argument overrides the level of the policy for this commit.
+    def committed(self, sync: Callable[[], int], level: Optional[str] = None) -> int:
+        """Record a commit and flush it if the durability level asks for it."""
+        level = durability_level(level or self.level)
+        if level == "full":
+            return sync()
+        if level != "lazy":
+            return SUCCESS
+        synced_at, pending = self._load()
+        pending += 1
+        now = time.time_ns()
+        if pending >= self.writes or now - synced_at >= self.interval_ms * 1_000_000:
+            error = sync()
+            if error:
+                return error
+            synced_at, pending = now, 0
+        self._save(synced_at, pending)
+        return SUCCESS
+
+    # defines ._load() and ._save(). A missing or damaged state file just means
+    # that nothing is known to be flushed, which makes the next commit flush.
+    def _load(self) -> Tuple[int, int]:
+        try:
+            synced_at, pending = self._path.read_text().split()
+            return int(synced_at), int(pending)
+        except (OSError, ValueError):
+            return 0, 0
+
+    def _save(self, synced_at: int, pending: int) -> None:
+        try:
+            self._path.write_text(f"{synced_at} {pending}\n")
+        except OSError:
+            pass
@@ -0,0 +1,255 @@
+"""This module provides the mmmap stable to-do ID index."""
+# mmmap/ids.py
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, JSON_ERROR, SUCCESS
+from mmmap.database import atomic_write, file_key, sync_files
+
+# define IDS_SUFFIX. The ID index lives next to the database file,
+# so "todo.json" gets a "todo.json.ids" companion.
+IDS_SUFFIX = ".ids"
+# define TOMBSTONE, the value stored in the slot of a removed to-do.
+TOMBSTONE = 0
+# define COMPACT_SUFFIX. While compaction rewrites the database, an intent file next to the index,
+# "todo.json.ids.compact", holds the compacted index and the file_key() of the database before the rewrite.
+# The database is rewritten first and the index afterwards, so if the process dies in between,
+# the next .load() tells from the key whether the database was rewritten, and installs the compacted index
+# if it was, or drops it if it wasn't.
+COMPACT_SUFFIX = ".compact"
+
+# defines IDIndex, which maps stable to-do IDs to slots, the positions of the to-dos in the database.
+# IDs are assigned in increasing order and never reused. Removing a to-do doesn't shift the other slots;
+# the slot just becomes a tombstone until compaction drops it from the database.
+#
+# The index file is append-only like the journal. Its first line is a checkpoint holding
+# the next ID and the ID of every slot, and every following line records one event:
+# {"add": id} appends a slot and {"tombstone": id} clears one.
+#
+# With cache=True, the index remembers the file_key() of the file it last read or wrote
+# and skips reading it again while os.stat() reports the same key.
+class IDIndex:
+    def __init__(self, db_path: Path, cache: bool = False) -> None:
+        self._db_path = db_path
+        self._path = db_path.with_name(db_path.name + IDS_SUFFIX)
+        self._intent_path = self._path.with_name(self._path.name + COMPACT_SUFFIX)
+        self._cache = cache
+        self._key: Optional[Tuple[int, int, int]] = None
+        self.next_id = 1
+        self.slots: List[int] = []
+        self._slot_of: Dict[int, int] = {}
+
+    def exists(self) -> bool:
+        """Return True if the index file exists."""
+        return self._path.exists()
+
+    # defines .load(), which reads the checkpoint and replays the events over it.
+    # If size, the number of slots in the database, is given, the index is reconciled with it:
+    # databases created before the index existed get IDs 1 to size,
+    # and a crash between writing the database and the index is repaired and checkpointed.
+    def load(self, size: Optional[int] = None) -> int:
+        """Load the index from disk."""
+        error = self._recover() or self._read()
+        if error:
+            return error
+        if size is None or size == len(self.slots):
+            return SUCCESS
+        if size < len(self.slots):
+            for todo_id in self.slots[size:]:
+                self._slot_of.pop(todo_id, None)
+            del self.slots[size:]
+        while len(self.slots) < size:
+            self.append()
+        return self.checkpoint()
+
+    def _read(self) -> int:
+        try:
+            key = file_key(os.stat(self._path))
+        except FileNotFoundError:
+            key = None
+        except OSError:
+            return DB_READ_ERROR
+        if self._cache and key is not None and key == self._key:
+            return SUCCESS
+        try:
+            with self._path.open("r") as index:
+                lines = index.readlines()
+                key = file_key(os.fstat(index.fileno()))
+        except FileNotFoundError:
+            lines = []
+        except OSError:
+            return DB_READ_ERROR
+        try:
+            self._replay(lines)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError, IndexError):
+            self._key = None
+            return JSON_ERROR
+        self._key = key
+        return SUCCESS
+
+    # defines ._written(), which refreshes the cached key after the index file was written,
+    # or forgets it if the write failed and the file no longer matches the index in memory.
+    def _written(self, error: int) -> int:
+        try:
+            self._key = None if error else file_key(os.stat(self._path))
+        except OSError:
+            self._key = None
+        return error
+
+    def _replay(self, lines: List[str]) -> None:
+        self.next_id = 1
+        self.clear()
+        for number, line in enumerate(lines):
+            if number == 0:
+                checkpoint = json.loads(line)
+                self.next_id = checkpoint["next_id"]
+                self.slots = list(checkpoint["slots"])
+                self._slot_of = {
+                    todo_id: slot for slot, todo_id in enumerate(self.slots) if todo_id
+                }
+                continue
+            if not line.endswith("\n"):
+                break  # Skip a torn last event
+            event = json.loads(line)
+            if "add" in event:
+                self._slot_of[event["add"]] = len(self.slots)
+                self.slots.append(event["add"])
+                self.next_id = max(self.next_id, event["add"] + 1)
+            else:
+                self.tombstone(event["tombstone"])
+
+    # defines .slot(), the O(1) lookup from a stable ID to its slot. It returns None for unknown IDs.
+    def slot(self, todo_id: int) -> Optional[int]:
+        """Return the slot of a to-do ID."""
+        return self._slot_of.get(todo_id)
+
+    def append(self) -> int:
+        """Assign an ID to a new slot at the end and return it."""
+        todo_id = self.next_id
+        self.next_id += 1
+        self._slot_of[todo_id] = len(self.slots)
+        self.slots.append(todo_id)
+        return todo_id
+
+    def tombstone(self, todo_id: int) -> int:
+        """Turn the slot of a to-do ID into a tombstone and return the slot."""
+        slot = self._slot_of.pop(todo_id)
+        self.slots[slot] = TOMBSTONE
+        return slot
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Yield the slot and ID of every live to-do."""
+        for slot, todo_id in enumerate(self.slots):
+            if todo_id:
+                yield slot, todo_id
+
+    # defines .compact() and .clear(), which drop the tombstones or every slot.
+    # Both keep next_id, so IDs are never reused.
+    def compact(self) -> None:
+        """Drop the tombstones from the index."""
+        self.slots = [todo_id for todo_id in self.slots if todo_id]
+        self._slot_of = {todo_id: slot for slot, todo_id in enumerate(self.slots)}
+
+    # defines .begin_compact(), .finish_compact() and .abort_compact(), which wrap the rewrite
+    # of the database by compaction. .begin_compact() writes the intent file,
+    # .finish_compact() drops the tombstones and checkpoints the index once the database is rewritten,
+    # and .abort_compact() drops the intent file if the rewrite failed and left the database as it was.
+    def begin_compact(self) -> int:
+        """Record the compacted index before the database is rewritten."""
+        slots = [todo_id for todo_id in self.slots if todo_id]
+        try:
+            key = file_key(os.stat(self._db_path))
+            with atomic_write(self._intent_path) as intent:
+                intent.write(json.dumps(
+                    {"db": key, "checkpoint": {"next_id": self.next_id, "slots": slots}}
+                ))
+        except OSError:
+            return DB_WRITE_ERROR
+        return SUCCESS
+
+    def finish_compact(self) -> int:
+        """Checkpoint the compacted index once the database is rewritten."""
+        self.compact()
+        error = self.checkpoint()
+        if error:
+            return error
+        return self.abort_compact()
+
+    def abort_compact(self) -> int:
+        """Drop the intent file of a compaction."""
+        try:
+            self._intent_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return DB_WRITE_ERROR
+        return SUCCESS
+
+    # defines ._recover(), which finishes a compaction that was interrupted, as described for COMPACT_SUFFIX.
+    # The database is rewritten under the exclusive lock, and every writer loads the index before
+    # it writes the database, so a key that changed means the compaction rewrote it.
+    def _recover(self) -> int:
+        try:
+            intent = json.loads(self._intent_path.read_text())
+        except FileNotFoundError:
+            return SUCCESS
+        except OSError:
+            return DB_READ_ERROR
+        except ValueError:
+            return JSON_ERROR
+        try:
+            rewritten = list(file_key(os.stat(self._db_path))) != intent["db"]
+            if rewritten:
+                with atomic_write(self._path) as index:
+                    index.write(json.dumps(intent["checkpoint"]) + "\n")
+        except (KeyError, TypeError):
+            return JSON_ERROR
+        except OSError:
+            return DB_WRITE_ERROR
+        self._key = None
+        return self.abort_compact()
+
+    def clear(self) -> None:
+        """Drop every slot from the index."""
+        self.slots = []
+        self._slot_of = {}
+
+    # defines .log(), which appends events to the index file, and .checkpoint(),
+    # which replaces it with a single checkpoint line through atomic_write().
+    def log(self, added: List[int] = (), tombstoned: List[int] = ()) -> int:
+        """Append add and tombstone events to the index file."""
+        if not self._path.exists():
+            return self.checkpoint()
+        events = [{"add": todo_id} for todo_id in added]
+        events += [{"tombstone": todo_id} for todo_id in tombstoned]
+        try:
+            with self._path.open("a") as index:
+                index.write("".join(json.dumps(event) + "\n" for event in events))
+        except OSError:
+            return self._written(DB_WRITE_ERROR)
+        return self._written(SUCCESS)
+
+    def sync(self) -> int:
+        """Flush the index file to stable storage."""
+        if not self._path.exists():
+            return SUCCESS
+        return sync_files(self._path)
+
+    # defines .invalidate(), which forgets the cached key,
+    # so the next .load() reads the file again even with cache=True.
+    def invalidate(self) -> None:
+        """Drop the cached state of the index."""
+        self._key = None
+
+    def checkpoint(self) -> int:
+        """Rewrite the index file as a single checkpoint."""
+        checkpoint = {"next_id": self.next_id, "slots": self.slots}
+        try:
+            with atomic_write(self._path) as index:
+                index.write(json.dumps(checkpoint) + "\n")
+        except OSError:
+            return self._written(DB_WRITE_ERROR)
+        return self._written(SUCCESS)
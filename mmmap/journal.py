@@ -0,0 +1,215 @@
+"""This module provides the mmmap journal storage engine."""
+# mmmap/journal.py
+
+import json
+import os
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, JSON_ERROR, SUCCESS
+from mmmap.database import (
+    DEFAULT_CODEC,
+    Change,
+    DatabaseError,
+    DatabaseHandler,
+    DBResponse,
+    apply_changes,
+    atomic_write,
+    sync_files,
+)
+from mmmap.spans import span
+
+# define JOURNAL_SUFFIX. The journal lives next to the database file,
+# so "todo.json" gets a "todo.json.journal" companion.
+JOURNAL_SUFFIX = ".journal"
+# define CHECKPOINT_SUFFIX. While a checkpoint replaces the database file, an intent file next to the journal,
+# "todo.json.journal.checkpoint", holds the inode of the new database file. The database is replaced first
+# and the journal emptied afterwards, so if the process dies in between, the intent file tells
+# whether the journal was already folded into the database, and must be ignored, or not.
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+# define _encode_change() and _decode_change(), which turn a Change into a single line
+# of JSON and back. Each line is a small, self-contained record,
+# so appending a mutation costs a few bytes regardless of the size of the list.
+def _encode_change(change: Change) -> str:
+    record: Dict[str, Any] = {"op": change.op}
+    if change.op in ("done", "remove"):
+        record["index"] = change.index
+    if change.op == "add":
+        record["todo"] = change.todo
+    return json.dumps(record) + "\n"
+
+
+def _decode_change(line: str) -> Change:
+    record = json.loads(line)
+    return Change(record["op"], record.get("index", -1), record.get("todo"))
+
+# defines JournalDatabaseHandler. It keeps the original database file, written with its codec,
+# as a checkpoint and appends every add, complete and remove to the journal.
+# Reads load the checkpoint and replay the journal over it,
+# and .compact() folds the journal back into a new checkpoint.
+class JournalDatabaseHandler(DatabaseHandler):
+    def __init__(
+        self,
+        db_path: Path,
+        cache: bool = False,
+        codec: str = DEFAULT_CODEC,
+        streaming: bool = False,
+    ) -> None:
+        super().__init__(db_path, cache, codec, streaming)
+        self._journal_path = db_path.with_name(db_path.name + JOURNAL_SUFFIX)
+        self._intent_path = db_path.with_name(db_path.name + JOURNAL_SUFFIX + CHECKPOINT_SUFFIX)
+
+    def init_database(self) -> int:
+        """Create an empty to-do database and journal."""
+        error = super().init_database()
+        if error:
+            return error
+        try:
+            self._journal_path.write_text("")
+            return SUCCESS
+        except OSError:
+            return DB_WRITE_ERROR
+
+    # defines .read_journal(), which returns the changes recorded since the last checkpoint.
+    # A process that crashes mid-append can leave a torn last line without a line feed.
+    # That record was never acknowledged, so it's skipped instead of failing the whole read.
+    # A journal already folded into the database by an interrupted checkpoint holds no changes.
+    def read_journal(self) -> List[Change]:
+        """Return the changes recorded in the journal."""
+        if self._folded():
+            return []
+        try:
+            with self._journal_path.open("r") as journal:
+                lines = journal.readlines()
+        except FileNotFoundError:
+            return []
+        changes = []
+        for line in lines:
+            try:
+                changes.append(_decode_change(line))
+            except (json.JSONDecodeError, KeyError):
+                if line.endswith("\n"):
+                    raise
+        return changes
+
+    def read_todos(self) -> DBResponse:
+        # reads the checkpoint with the regular handler.
+        read = super().read_todos()
+        if read.error:
+            return read
+        # replays the journal over the checkpoint.
+        try:
+            changes = self.read_journal()
+        except OSError:
+            return DBResponse([], DB_READ_ERROR)
+        except (json.JSONDecodeError, KeyError):
+            return DBResponse([], JSON_ERROR)
+        except DatabaseError as error:
+            return DBResponse([], error.error)
+        try:
+            return DBResponse(apply_changes(read.todo_list, changes), SUCCESS)
+        except (IndexError, ValueError):
+            return DBResponse([], JSON_ERROR)
+
+    # defines .iter_todos(). Only "add" records can be replayed while streaming, 
+    # because they just append to the end of the list. 
+    # Any other record falls back to a full read.
+    def iter_todos(self) -> Iterator[Dict[str, Any]]:
+        try:
+            changes = self.read_journal()
+        except OSError:
+            raise DatabaseError(DB_READ_ERROR)
+        except (json.JSONDecodeError, KeyError):
+            raise DatabaseError(JSON_ERROR)
+        if all(change.op == "add" for change in changes):
+            yield from super().iter_todos()
+            for change in changes:
+                yield change.todo
+            return
+        read = self.read_todos()
+        if read.error:
+            raise DatabaseError(read.error)
+        yield from read.todo_list
+
+    # defines ._folded(), which tells if an interrupted checkpoint already replaced the database,
+    # so the journal holds changes that are in the database too. The inode only has to tell the new file
+    # from the old one, which both exist when the intent file is written, so they never share it.
+    def _folded(self) -> bool:
+        try:
+            inode = json.loads(self._intent_path.read_text())["inode"]
+            return os.stat(self._db_path).st_ino == inode
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError):
+            raise DatabaseError(JSON_ERROR)
+
+    # defines ._replacing(), which writes the intent file before a new checkpoint replaces the database.
+    def _replacing(self, db: IO[bytes]) -> None:
+        inode = os.fstat(db.fileno()).st_ino
+        with atomic_write(self._intent_path) as intent:
+            intent.write(json.dumps({"inode": inode}))
+
+    # defines ._finish_checkpoint(), which empties the journal if the database already holds its changes
+    # and then drops the intent file. Checkpoints call it once the database is replaced,
+    # and commits call it first, to finish a checkpoint that was interrupted.
+    def _finish_checkpoint(self) -> int:
+        try:
+            if self._folded():
+                self._journal_path.write_text("")
+            self._intent_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return DB_WRITE_ERROR
+        except DatabaseError as error:
+            return error.error
+        return SUCCESS
+
+    # writing a whole list is a checkpoint: the new list goes into the database file
+    # and the journal starts over empty.
+    def write_todos(self, todo_list: List[Dict[str, Any]]) -> DBResponse:
+        write = super().write_todos(todo_list)
+        if write.error:
+            return write
+        return DBResponse(todo_list, self._finish_checkpoint())
+
+    def write_todos_iter(self, todos: Iterable[Dict[str, Any]]) -> DBResponse:
+        write = super().write_todos_iter(todos)
+        if write.error:
+            return write
+        return DBResponse([], self._finish_checkpoint())
+
+    # defines .commit(), which appends the changes to the journal instead of rewriting the file.
+    # If the caller passes the to-do list it already read, the changes are applied to it as well,
+    # so the caller sees the same result as with the JSON engine.
+    def commit(
+        self,
+        changes: List[Change],
+        todo_list: Optional[List[Dict[str, Any]]] = None,
+    ) -> DBResponse:
+        error = self._finish_checkpoint()
+        if error:
+            return DBResponse(todo_list or [], error)
+        if todo_list is not None:
+            with span("mutate"):
+                apply_changes(todo_list, changes)
+        try:
+            with span("write"), self._journal_path.open("a") as journal:
+                journal.write("".join(_encode_change(c) for c in changes))
+        except OSError:
+            return DBResponse(todo_list or [], DB_WRITE_ERROR)
+        return DBResponse(todo_list or [], SUCCESS)
+
+    def sync(self) -> int:
+        """Flush the checkpoint and the journal to stable storage."""
+        return sync_files(self._db_path, self._journal_path)
+
+    # defines .compact(), which folds the journal into a new checkpoint. The inherited version reads
+    # the checkpoint plus the journal and writes the result back through .write_todos(), which empties
+    # the journal. In streaming mode, the result is streamed through .write_todos_iter() instead.
+    def compact(self) -> DBResponse:
+        """Fold the journal into the checkpoint."""
+        if self._streaming:
+            return self.write_todos_iter(self.iter_todos())
+        return super().compact()
@@ -0,0 +1,78 @@
+"""This module provides the mmmap database lock."""
+# mmmap/lock.py
+
+import contextlib
+import os
+from pathlib import Path
+from typing import ContextManager, Iterator, Optional
+
+from mmmap.spans import span
+
+# imports fcntl, which is only available on Unix. Elsewhere the lock does nothing.
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# define LOCK_SUFFIX. The lock lives next to the database file,
+# so "todo.json" gets a "todo.json.lock" companion.
+LOCK_SUFFIX = ".lock"
+
+# defines DatabaseLock, an advisory fcntl.flock() lock shared by every process that uses the same database.
+# Readers hold it shared and writers hold it exclusive, so a read-modify-write cycle
+# in one process never interleaves with a write in another one.
+#
+# The lock is reentrant within a DatabaseLock: a method that already holds it can call
+# other locked methods without blocking on itself. A shared lock can't be upgraded to an exclusive one.
+class DatabaseLock:
+    def __init__(self, db_path: Path) -> None:
+        self._path = db_path.with_name(db_path.name + LOCK_SUFFIX)
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._exclusive = False
+
+    def shared(self) -> ContextManager[None]:
+        """Hold the lock for reading."""
+        return self._hold(exclusive=False)
+
+    def exclusive(self) -> ContextManager[None]:
+        """Hold the lock for writing."""
+        return self._hold(exclusive=True)
+
+    @contextlib.contextmanager
+    def _hold(self, exclusive: bool) -> Iterator[None]:
+        if self._depth:
+            if exclusive and not self._exclusive:
+                raise RuntimeError("a shared database lock can't be upgraded")
+        else:
+            self._acquire(exclusive)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self._release()
+
+    # defines ._acquire(). If the lock file can't be opened, as on a read-only file system,
+    # the lock is skipped: every write would fail there anyway, and reads still work.
+    def _acquire(self, exclusive: bool) -> None:
+        self._exclusive = exclusive
+        if fcntl is None:
+            return
+        try:
+            self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError:
+            return
+        try:
+            with span("lock"):
+                fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self) -> None:
+        if self._fd is not None:
+            # closing the file descriptor releases the flock() lock.
+            os.close(self._fd)
+            self._fd = None
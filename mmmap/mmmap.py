@@ -1,10 +1,31 @@
 """This module provides the RP To-Do model-controller."""
 # mmmap/mmmap.py
+import contextlib
+import time
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
-from mmmap import DB_READ_ERROR, ID_ERROR
-from mmmap.database import DatabaseHandler
+from mmmap import DB_WRITE_ERROR, ID_ERROR, SUCCESS
+from mmmap.archive import DEFAULT_COMPRESSION, Archive, CompletionLog
+from mmmap.database import (
+    DEFAULT_BACKEND,
+    DEFAULT_CODEC,
+    DEFAULT_DURABILITY,
+    CacheInfo,
+    Change,
+    DatabaseError,
+    DBResponse,
+    get_database_handler,
+    migrate_database,
+)
+from mmmap.durability import SyncPolicy, strongest
+from mmmap.ids import IDIndex
+from mmmap.lock import DatabaseLock
+from mmmap.query import Query, run_query
+from mmmap.search import SearchIndex, parse_terms
+from mmmap.spans import span
+from mmmap.spool import Spool
+from mmmap.todo import TodoTable, new_todo
 
 # create a subclass of typing.NamedTuple called CurrentTodo with two fields todo and error
 # Subclassing NamedTuple allows you to create named tuples with type hints for their named fields. 
@@ -14,109 +35,733 @@ class CurrentTodo(NamedTuple):
     todo: Dict[str, Any]
     error: int
 
+# create CurrentTodos, the bulk counterpart of CurrentTodo. The todos field holds 
+# every to-do affected by a bulk operation, in ID order.
+class CurrentTodos(NamedTuple):
+    todos: List[Dict[str, Any]]
+    error: int
+
+# create ArchiveResult, the outcome of Todoer.archive(). The count field holds 
+# the number of to-dos moved to the archive.
+class ArchiveResult(NamedTuple):
+    count: int
+    error: int
+
+# create ImportResult, the outcome of Todoer.import_todos(). The count field holds
+# the number of to-dos added to the database.
+class ImportResult(NamedTuple):
+    count: int
+    error: int
+
+# define STREAMING_SIZE, the database size in bytes from which Todoer switches to its large-database mode 
+# when it isn't told which mode to use.
+STREAMING_SIZE = 64 * 1024 * 1024
+
 # This class uses composition, so it has a DatabaseHandler component 
 # to facilitate direct communication with the to-do database.
+# The backend argument selects the storage engine, "json" by default.
+# It also has an IDIndex component that gives every to-do a stable ID. 
+# The database handlers only know about slots, the positions of the to-dos in the database, 
+# and the ID index maps the IDs users see to those slots.
+# Every method holds a DatabaseLock while it runs: shared to read and exclusive to write, 
+# so several processes can use the same database without losing each other's changes.
 class Todoer:
-    def __init__(self, db_path: Path) -> None:
-        self._db_handler = DatabaseHandler(db_path)
-    
+    # Passing cache=True turns on the parse caches of the database handler and the ID index, 
+    # which helps long-lived processes that call the same Todoer many times. 
+    # Passing group_commit=True makes many processes that add, complete or remove to-dos at the same time 
+    # share commits through a Spool, as described in ._mutate(). 
+    # The durability argument picks when commits are flushed to stable storage, as described in SyncPolicy. 
+    # The codec argument picks how the JSON and journal engines encode the database, as described in mmmap.codec. 
+    # Passing streaming=True turns on the large-database mode: completing, removing and compacting 
+    # never load the whole to-do list, and rewrites stream the database through a temporary file, 
+    # so memory stays constant however big the database grows. By default, streaming is None, 
+    # which turns the mode on for databases of at least STREAMING_SIZE bytes.
+    def __init__(
+        self,
+        db_path: Path,
+        backend: str = DEFAULT_BACKEND,
+        cache: bool = False,
+        group_commit: bool = False,
+        durability: str = DEFAULT_DURABILITY,
+        codec: str = DEFAULT_CODEC,
+        streaming: Optional[bool] = None,
+    ) -> None:
+        if streaming is None:
+            try:
+                streaming = db_path.stat().st_size >= STREAMING_SIZE
+            except OSError:
+                streaming = False
+        self._db_path = db_path
+        self._backend = backend
+        self._cache = cache
+        self._codec = codec
+        self._streaming = streaming
+        self._db_handler = get_database_handler(db_path, backend, cache, codec, streaming)
+        self._id_index = IDIndex(db_path, cache)
+        self._lock = DatabaseLock(db_path)
+        self._spool = Spool(db_path) if group_commit else None
+        self._sync_policy = SyncPolicy(db_path, durability)
+        self._search = SearchIndex(db_path)
+        self._archive = Archive(db_path)
+        self._completions = CompletionLog(db_path)
+
+    def cache_info(self) -> CacheInfo:
+        """Return the hit and miss counters of the database parse cache."""
+        return self._db_handler.cache_info()
+
+    # defines ._read(), which reads the to-do list and loads the ID index reconciled with it. 
+    # The returned list holds every slot, including the tombstones of removed to-dos.
+    def _read(self) -> DBResponse:
+        read = self._db_handler.read_todos()
+        if read.error:
+            return read
+        with span("index"):
+            return DBResponse(read.todo_list, self._id_index.load(len(read.todo_list)))
+
+    # define ._slots(). This helper turns to-do IDs into slots in ID order, dropping duplicates. 
+    # It returns None if any ID is unknown or was removed, 
+    # so a bulk operation either applies to every ID or to none of them.
+    def _slots(self, todo_ids: Iterable[int]) -> Optional[List[int]]:
+        slots = [self._id_index.slot(todo_id) for todo_id in sorted(set(todo_ids))]
+        if None in slots:
+            return None
+        return slots
+
     # defines .add(), which takes description and priority as arguments. The description is a list of strings. 
     # Typer builds this list from the words you enter at the command line to describe the current to-do. 
     # In the case of priority, it’s an integer value representing the to-do’s priority. 
     # The default is 2, indicating a medium priority.
     def add(self, description: List[str], priority: int = 2) -> CurrentTodo:
         """Add a new to-do to the database."""
-        # concatenates the description components into a single string using .join().
-        description_text = " ".join(description)
-        # add a period (".") to the end of the description if the user doesn’t add it.
-        if not description_text.endswith("."):
-            description_text += "."
-        # build a new to-do from the user’s input.
-        todo = {
-            "Description": description_text,
-            "Priority": priority,
-            "Done": False,
-        }
-        # reads the to-do list from the database by calling .read_todos() on the database handler.
-        read = self._db_handler.read_todos()
-        # checks if .read_todos() returned a DB_READ_ERROR. 
-        if read.error == DB_READ_ERROR:
-            # If so, then returns a named tuple, CurrentTodo, containing the current to-do and the error code.
-            return CurrentTodo(todo, read.error)
-        # appends the new to-do to the list.
-        read.todo_list.append(todo)
-        # writes the updated to-do list back to the database by calling .write_todos() on the database handler.
-        write = self._db_handler.write_todos(read.todo_list)
+        # concatenates the description components into a single string using .join() 
+        # and adds the to-do with .add_many().
+        todos, error = self.add_many([" ".join(description)], priority)
         # returns an instance of CurrentTodo with the current to-do and an appropriate return code.
-        return CurrentTodo(todo, write.error)
+        return CurrentTodo(todos[0], error)
+
+    # defines .add_many(), which adds one to-do per description with a single commit, 
+    # so adding a whole file of to-dos costs one read-modify-write cycle instead of one per line.
+    def add_many(self, descriptions: Iterable[str], priority: int = 2) -> CurrentTodos:
+        """Add several new to-dos to the database at once."""
+        # builds the new to-dos, adding a period (".") to the end of any description that lacks one.
+        todos = [new_todo(description, priority) for description in descriptions]
+        return self._mutate("add", todos)
+
+    # defines ._mutate(), which runs a single mutation. Without group commit, it applies the mutation 
+    # right away under the exclusive lock. With group commit, it queues the mutation in the spool first 
+    # and then waits for the lock. Whoever gets the lock while its request is still queued becomes the leader: 
+    # it applies every queued request with one commit, and at most one fsync, and hands the results back. 
+    # Every request carries the durability level of its process, and the commit is flushed 
+    # at the strongest level of the batch, so no process gets a weaker guarantee than it asked for. 
+    # The other processes find their results waiting when they get the lock in turn.
+    def _mutate(self, op: str, args: List[Any]) -> CurrentTodos:
+        if self._spool is None:
+            with self._lock.exclusive():
+                return self._commit([(op, args)])[0]
+        try:
+            name = self._spool.submit(op, args, self._sync_policy.level)
+        except OSError:
+            return CurrentTodos(args if op == "add" else [], DB_WRITE_ERROR)
+        with self._lock.exclusive():
+            result = self._spool.result(name)
+            if result is None:
+                # the request is still queued, so this process leads the next group commit.
+                batch = self._spool.claim()
+                level = strongest(
+                    [self._sync_policy.level] + [durability for *_, durability in batch]
+                )
+                results = self._commit([(op, args) for _, op, args, _ in batch], level)
+                for (batch_name, *_), batch_result in zip(batch, results):
+                    self._spool.finish(batch_name, batch_result)
+                result = self._spool.result(name) or ([], DB_WRITE_ERROR)
+        return CurrentTodos(*result)
+
+    # defines ._sync(), which flushes the database and the ID index to stable storage, 
+    # and ._commit(), which applies a batch of mutations with ._apply() and then lets the durability policy 
+    # decide whether to flush them.
+    def _sync(self) -> int:
+        with span("sync"):
+            return self._db_handler.sync() or self._id_index.sync()
+
+    def _commit(
+        self, batch: List[Tuple[str, List[Any]]], level: Optional[str] = None
+    ) -> List[CurrentTodos]:
+        results = self._apply(batch)
+        if all(result.error for result in results):
+            return results
+        error = self._sync_policy.committed(self._sync, level)
+        return [
+            CurrentTodos(todos, result_error or error) for todos, result_error in results
+        ]
+
+    # defines ._apply(), which applies a batch of mutations with a single commit through a Transaction. 
+    # Each mutation is an op, "add", "done" or "remove", with its arguments: the new to-dos for "add" 
+    # and the to-do IDs otherwise. It returns one CurrentTodos per mutation. 
+    # A mutation with an unknown ID fails on its own with ID_ERROR.
+    def _apply(self, batch: List[Tuple[str, List[Any]]]) -> List[CurrentTodos]:
+        # loads the ID index. Adding to-dos doesn't need the to-do list, 
+        # so a batch of adds only reads the database if it doesn't have an ID index yet, 
+        # to number its existing to-dos before the new ones. In the large-database mode, 
+        # no batch reads the to-do list, as described in Transaction.
+        todo_list, error = self._load(all(op == "add" for op, _ in batch))
+        if error:
+            return [CurrentTodos(args if op == "add" else [], error) for op, args in batch]
+        tx = Transaction(self, todo_list)
+        results = [tx.apply(op, args) for op, args in batch]
+        error = tx.commit()
+        if error:
+            results = [
+                CurrentTodos(todos, result_error or error)
+                for todos, result_error in results
+            ]
+        return results
+
+    # defines ._load(), which loads what a transaction needs: the ID index alone if it exists 
+    # and the to-do list isn't needed, or else the to-do list as well, through ._read().
+    def _load(self, adds_only: bool) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        if self._id_index.exists() and (adds_only or self._streaming):
+            with span("index"):
+                return None, self._id_index.load()
+        return self._read()
+
+    # defines .transaction(), a context manager that loads the database once, under the exclusive lock, 
+    # and yields a Transaction. Every add, completion and removal made through the transaction 
+    # is applied in memory, and the whole batch is committed once when the with block ends, 
+    # and flushed according to the durability level. If the block raises an exception, 
+    # nothing is written and the exception propagates. The outcome is left in the error attribute 
+    # of the transaction, which is also set right away if loading the database failed.
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["Transaction"]:
+        """Group several mutations into a single read and a single commit."""
+        with self._lock.exclusive():
+            todo_list, error = self._load(adds_only=False)
+            tx = Transaction(self, todo_list, error)
+            try:
+                yield tx
+            except BaseException:
+                tx.rollback()
+                raise
+            tx.error = tx.commit()
+            if tx.changed and not tx.error:
+                tx.error = self._sync_policy.committed(self._sync)
 
     def get_todo_list(self) -> List[Dict[str, Any]]:
         """Return the current to-do list."""
-        # first get the entire to-do list from the database by calling .read_todos() on the database handler.
-        # The call to .read_todos() returns a named tuple, DBResponse, containing the to-do list and a return code.
-        read = self._db_handler.read_todos()
-        # However, you just need the to-do list, so .get_todo_list() returns the .todo_list field only.
-        return read.todo_list
+        with self._lock.shared():
+            # first get the entire to-do list from the database by calling ._read(), 
+            # which returns a named tuple, DBResponse, containing every slot and a return code.
+            read = self._read()
+            if read.error:
+                return []
+            # However, you just need the live to-dos, so .get_todo_list() skips the tombstones.
+            return [read.todo_list[slot] for slot, _ in self._id_index.items()]
+
+    # defines .get_todos(), which looks up to-dos by ID without changing anything. 
+    # It fails with ID_ERROR if any ID is unknown.
+    def get_todos(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Return the to-dos with the given IDs."""
+        with self._lock.shared():
+            read = self._read()
+            if read.error:
+                return CurrentTodos([], read.error)
+            slots = self._slots(todo_ids)
+            if slots is None:
+                return CurrentTodos([], ID_ERROR)
+            return CurrentTodos([read.todo_list[slot] for slot in slots], SUCCESS)
+
+    # defines .get_todo_table(). It returns the to-do list as a compact, columnar TodoTable. 
+    # The table is filled from .iter_todo_list(), so only one to-do dictionary is alive at a time, 
+    # which keeps memory low for large lists. Like .get_todo_list(), it returns an empty table on read errors. 
+    # Todoer itself keeps working with dictionaries, which every backend, the read cache and the daemon speak, 
+    # so the table is only built for callers that ask for it.
+    def get_todo_table(self) -> TodoTable:
+        """Return the current to-do list as a TodoTable."""
+        try:
+            return TodoTable.from_dicts(self.iter_todo_list())
+        except DatabaseError:
+            return TodoTable()
+
+    # defines .iter_todo_items(). It returns a generator that reads the to-dos lazily from the database 
+    # and yields each live to-do together with its stable ID, skipping tombstones. 
+    # Slots the index doesn't know about yet, as in a database created before the index existed, 
+    # get the IDs the next write would assign them. Read errors are raised as database.DatabaseError.
+    def iter_todo_items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the ID and to-do of every current to-do."""
+        with self._lock.shared():
+            error = self._id_index.load()
+            if error:
+                raise DatabaseError(error)
+            slots = self._id_index.slots
+            next_id = self._id_index.next_id
+            for slot, todo in enumerate(self._db_handler.iter_todos()):
+                if slot < len(slots):
+                    todo_id = slots[slot]
+                else:
+                    todo_id, next_id = next_id, next_id + 1
+                if todo_id:
+                    yield todo_id, todo
+
+    # defines .iter_todo_list(). Unlike .get_todo_list(), it returns a generator that reads 
+    # the to-dos lazily from the database, so callers can start using them before the whole list is parsed. 
+    # Read errors are raised as database.DatabaseError.
+    def iter_todo_list(self) -> Iterator[Dict[str, Any]]:
+        """Yield the current to-dos one at a time."""
+        return (todo for _, todo in self.iter_todo_items())
+
+    # defines .query(). It evaluates the query while the to-dos stream out of storage,
+    # so only the matching to-dos, or only the best `top` ones, are ever kept in memory.
+    # Read errors are raised as database.DatabaseError.
+    def query(self, query: Query) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the ID and to-do of every current to-do that satisfies the query."""
+        return run_query(query, self.iter_todo_items())
+
+    # defines .search(), which finds the to-dos whose descriptions hold every word of the search, 
+    # or any of them with any_term=True. A word ending in "*" matches as a prefix. 
+    # The search runs against the SearchIndex, which the first search builds 
+    # and every later add, completion and removal keeps up to date. 
+    # Read errors are raised as database.DatabaseError.
+    def search(
+        self, words: List[str], any_term: bool = False, limit: Optional[int] = None
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return the ID and to-do of every current to-do that matches the search."""
+        terms = parse_terms(words)
+        with span("search"):
+            with self._lock.shared():
+                if self._search.ready():
+                    return self._search.search(terms, any_term, limit)
+            with self._lock.exclusive():
+                if not self._search.ready():
+                    with span("index"):
+                        error = self._search.rebuild(self.iter_todo_items())
+                    if error:
+                        raise DatabaseError(error)
+                return self._search.search(terms, any_term, limit)
 
     # defines .set_done(). The method takes an argument called todo_id, which holds an integer 
     # representing the ID of the to-do you want to mark as done. The to-do ID is the number associated with 
     # a given to-do when you list your to-dos using the list command. 
-    # Since you’re using a Python list to store the to-dos, you can turn this ID into a zero-based index 
-    # and use it to retrieve the required to-do from the list.
+    # It completes the to-do with .set_done_many() and unpacks the single result.
     def set_done(self, todo_id: int) -> CurrentTodo:
         """Set a to-do as done."""
-        # reads all the to-dos by calling .read_todos() on the database handler.
-        read = self._db_handler.read_todos()
-        # checks if any error occurs during the reading. 
-        if read.error:
-            # If so, then returns a named tuple, CurrentTodo, with an empty to-do and the error.
-            return CurrentTodo({}, read.error)
-        # starts a try … except statement to catch invalid to-do IDs that translate to invalid indices 
-        # in the underlying to-do list. 
-        try:
-            todo = read.todo_list[todo_id - 1]
-        # If an IndexError occurs, 
-        except IndexError:
-            # then returns a CurrentTodo instance with an empty to-do and the corresponding error code.
-            return CurrentTodo({}, ID_ERROR)
-        # assigns True to the "Done" key in the target to-do dictionary. 
-        # This way, you’re setting the to-do as done.
-        todo["Done"] = True
-        # writes the update back to the database by calling .write_todos() on the database handler.
-        write = self._db_handler.write_todos(read.todo_list)
-        # returns a CurrentTodo instance with the target to-do and a return code indicating how the operation went.
-        return CurrentTodo(todo, write.error)
+        todos, error = self.set_done_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
 
     # defines .remove(). This method takes a to-do ID as an argument 
-    # and removes the corresponding to-do from the database.
+    # and removes the corresponding to-do with .remove_many().
     def remove(self, todo_id: int) -> CurrentTodo:
-        """Remove a to-do from the database using its id or index."""
-        # reads the to-do list from the database by calling .read_todos() on the database handler.
-        read = self._db_handler.read_todos()
-        # checks if any error occurs during the reading process. 
-        if read.error:
-            # If so, then returns a named tuple, CurrentTodo, holding an empty to-do 
-            # and the corresponding error code.
-            return CurrentTodo({}, read.error)
-        # starts a try … except statement to catch any invalid ID coming from the user’s input.
-        try:
-            # removes the to-do at index todo_id - 1 from the to-do list.
-            todo = read.todo_list.pop(todo_id - 1)
-        # If an IndexError occurs during this operation, 
-        except IndexError:
-            # then returns a CurrentTodo instance with an empty to-do and the corresponding error code.
-            return CurrentTodo({}, ID_ERROR)
-        # writes the updated to-do list back to the database.
-        write = self._db_handler.write_todos(read.todo_list)
-        # returns a CurrentTodo tuple holding the removed to-do 
-        # and a return code indicating a successful operation.
-        return CurrentTodo(todo, write.error)
+        """Remove a to-do from the database using its id."""
+        todos, error = self.remove_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    # defines .set_done_many(), which completes every to-do in todo_ids with a single read and a single commit.
+    def set_done_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Set several to-dos as done."""
+        return self._mutate("done", sorted(set(todo_ids)))
+
+    # defines .remove_many(), which removes every to-do in todo_ids. 
+    # Removed to-dos become tombstones in the ID index, and .compact() reclaims their space later.
+    def remove_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Remove several to-dos from the database."""
+        return self._mutate("remove", sorted(set(todo_ids)))
 
     # Inside .remove_all(), you remove all the to-dos from the database
     def remove_all(self) -> CurrentTodo:
         """Remove all to-dos from the database."""
-        # by replacing the current to-do list with an empty list.
-        write = self._db_handler.write_todos([])
-        # For consistency, the method returns a CurrentTodo tuple with an empty dictionary 
-        # and an appropriate return or error code.
-        return CurrentTodo({}, write.error)
\ No newline at end of file
+        with self._lock.exclusive():
+            # leaves the search index dirty, so the next search rebuilds it from the empty list.
+            self._search.begin()
+            # by replacing the current to-do list with an empty list.
+            write = self._db_handler.write_todos([])
+            if not write.error:
+                # empties the ID index too. The next ID is kept, so IDs are never reused.
+                error = self._id_index.load()
+                self._id_index.clear()
+                write = DBResponse([], error or self._id_index.checkpoint())
+            if not write.error:
+                write = DBResponse([], self._sync_policy.committed(self._sync))
+            # For consistency, the method returns a CurrentTodo tuple with an empty dictionary 
+            # and an appropriate return or error code.
+            return CurrentTodo({}, write.error)
+
+    # defines .compact(). It drops the tombstones of removed to-dos from the database 
+    # and the ID index, and then asks the database handler to fold any pending journal records 
+    # into a new database file.
+    def compact(self) -> CurrentTodo:
+        """Compact the to-do database."""
+        with self._lock.exclusive():
+            if self._streaming and self._id_index.exists():
+                error = self._compact_streaming()
+            else:
+                error = self._compact_list()
+            if error:
+                return CurrentTodo({}, error)
+            write = self._db_handler.compact()
+            if write.error:
+                return CurrentTodo({}, write.error)
+            return CurrentTodo({}, self._sync_policy.committed(self._sync))
+
+    # defines ._compact_list(), which drops the tombstoned slots from the loaded to-do list 
+    # and rewrites the database and the ID index if there were any. The ID index records the compaction 
+    # before the database is rewritten, so a crash between the two rewrites is recovered on the next load.
+    def _compact_list(self) -> int:
+        read = self._read()
+        if read.error:
+            return read.error
+        live = [read.todo_list[slot] for slot, _ in self._id_index.items()]
+        if len(live) < len(read.todo_list):
+            error = self._id_index.begin_compact()
+            if error:
+                return error
+            write = self._db_handler.write_todos(live)
+            if write.error:
+                self._id_index.abort_compact()
+                return write.error
+            return self._id_index.finish_compact()
+        return SUCCESS
+
+    # defines ._compact_streaming(), the large-database version of ._compact_list(). 
+    # It streams the database into a new one, skipping the tombstoned slots, 
+    # so only the ID index is held in memory. Slots past the end of the index are kept, 
+    # since the next ._read() gives them IDs.
+    def _compact_streaming(self) -> int:
+        error = self._id_index.load()
+        if error:
+            return error
+        slots = self._id_index.slots
+        if all(slots):
+            return SUCCESS
+        error = self._id_index.begin_compact()
+        if error:
+            return error
+        write = self._db_handler.write_todos_iter(
+            todo
+            for slot, todo in enumerate(self._db_handler.iter_todos())
+            if slot >= len(slots) or slots[slot]
+        )
+        if write.error:
+            self._id_index.abort_compact()
+            return write.error
+        return self._id_index.finish_compact()
+
+    # defines .archive(), which moves completed to-dos into a new segment of the archive 
+    # and drops them from the database, so the database only holds the active to-dos. 
+    # With older_than, in seconds, only the to-dos completed at least that long ago are moved. 
+    # The to-dos are picked, encoded and compressed in a single streaming pass. They're archived, 
+    # and flushed to stable storage, before they're removed, so a failure never loses any of them: 
+    # at worst, the new segment is dropped again.
+    def archive(
+        self, older_than: Optional[float] = None, compression: str = DEFAULT_COMPRESSION
+    ) -> ArchiveResult:
+        """Move completed to-dos to the archive."""
+        with self._lock.exclusive():
+            now = time.time()
+            completed = self._completions.load()
+            archived: List[int] = []
+            kept: Dict[int, float] = {}
+
+            def pick() -> Iterator[Tuple[int, Dict[str, Any]]]:
+                for todo_id, todo in self.iter_todo_items():
+                    if not todo["Done"]:
+                        continue
+                    completed_at = completed.get(todo_id, now)
+                    if older_than is None or now - completed_at >= older_than:
+                        archived.append(todo_id)
+                        yield todo_id, todo
+                    else:
+                        kept[todo_id] = completed_at
+
+            segment, error = self._archive.append(pick(), compression)
+            if error:
+                return ArchiveResult(0, error)
+            if segment is not None:
+                with self.transaction() as tx:
+                    error = tx.discard(archived)
+                error = error or tx.error
+                if error:
+                    self._archive.drop(segment)
+                    return ArchiveResult(0, error)
+            self._completions.rewrite(kept)
+            if segment is None:
+                return ArchiveResult(0, SUCCESS)
+            return ArchiveResult(len(archived), self.compact().error)
+
+    # defines .import_todos(), which appends the to-dos of an iterable, like the ones yielded by
+    # transfer.iter_import(), to the database in a single streaming pass: the existing to-dos are copied
+    # into a new database file and the new ones follow them, so neither is ever held in memory as a list.
+    # The ID index gets a single checkpoint rather than one event per to-do, and the search index
+    # is left dirty, so the next search rebuilds it. If the iterable raises an exception,
+    # it propagates and the database is left as it was.
+    def import_todos(self, todos: Iterable[Dict[str, Any]]) -> ImportResult:
+        """Append the to-dos of an iterable to the database."""
+        with self._lock.exclusive():
+            existing = 0
+            count = 0
+
+            def chain() -> Iterator[Dict[str, Any]]:
+                nonlocal existing, count
+                for existing, todo in enumerate(self._db_handler.iter_todos(), 1):
+                    yield todo
+                for count, todo in enumerate(todos, 1):
+                    yield todo
+
+            # loads the ID index first, so it finishes an interrupted compaction before the database changes.
+            error = self._id_index.load()
+            if error:
+                return ImportResult(0, error)
+            self._search.begin()
+            write = self._db_handler.write_todos_iter(chain())
+            if write.error:
+                return ImportResult(0, write.error)
+            with span("index"):
+                error = self._id_index.load(existing)
+                if error:
+                    return ImportResult(0, error)
+                for _ in range(count):
+                    self._id_index.append()
+                error = self._id_index.checkpoint()
+            if error:
+                self._id_index.invalidate()
+                return ImportResult(0, error)
+            return ImportResult(count, self._sync_policy.committed(self._sync))
+
+    # defines .iter_archived_items(), which yields the archived to-dos and their IDs, 
+    # decompressing one segment at a time. Segments never change once they're listed in the manifest, 
+    # so reading them doesn't take the database lock. Read errors are raised as database.DatabaseError.
+    def iter_archived_items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the ID and to-do of every archived to-do."""
+        return self._archive.iter_items()
+
+    # defines .migrate(), which copies the to-do database into a new one that may use another storage engine. 
+    # The database is compacted first, so tombstones aren't copied, 
+    # and the ID index is copied along with it, so every to-do keeps its ID.
+    def migrate(self, db_path: Path, backend: str) -> int:
+        """Copy the to-do database to db_path using the given storage engine."""
+        with self._lock.exclusive():
+            error = self.compact().error
+            if error:
+                return error
+            error = migrate_database(
+                self._db_path, self._backend, db_path, backend, self._codec
+            )
+            if error:
+                return error
+            id_index = IDIndex(db_path)
+            id_index.next_id = self._id_index.next_id
+            id_index.slots = self._id_index.slots
+            error = id_index.checkpoint()
+            if error:
+                return error
+            handler = get_database_handler(db_path, backend)
+            return self._sync_policy.committed(lambda: handler.sync() or id_index.sync())
+
+    # defines .convert(), which rewrites the database with another codec. Every slot, 
+    # tombstones included, is written back in place, so the ID index stays valid and every to-do keeps its ID. 
+    # With the journal engine, the rewrite is a checkpoint that also empties the journal. 
+    # Later writes by this Todoer use the new codec. In the large-database mode, the database is streamed 
+    # from the old codec to the new one.
+    def convert(self, codec: str) -> int:
+        """Rewrite the to-do database with the given codec."""
+        with self._lock.exclusive():
+            handler = get_database_handler(
+                self._db_path, self._backend, self._cache, codec, self._streaming
+            )
+            if self._streaming:
+                write = handler.write_todos_iter(self._db_handler.iter_todos())
+            else:
+                read = self._db_handler.read_todos()
+                if read.error:
+                    return read.error
+                write = handler.write_todos(read.todo_list)
+            if write.error:
+                return write.error
+            self._db_handler = handler
+            self._codec = codec
+            return self._sync_policy.committed(self._sync)
+
+# defines Transaction, the mutations of a Todoer that are applied in memory and committed together. 
+# Transactions come from Todoer.transaction(), and Todoer runs its own mutations through one too. 
+# Its methods mirror the Todoer ones and return the same results. 
+# IDs are assigned as to-dos are added, so a transaction can complete or remove the to-dos it added. 
+# A transaction whose list wasn't loaded, as in the large-database mode, works from the ID index alone. 
+# The to-dos it returns for completions and removals are filled in once it commits, 
+# with a single streaming read of the database.
+class Transaction:
+    def __init__(
+        self,
+        todoer: Todoer,
+        todo_list: Optional[List[Dict[str, Any]]],
+        error: int = SUCCESS,
+    ) -> None:
+        self._todoer = todoer
+        self._todo_list = todo_list
+        self._size = len(todoer._id_index.slots)
+        self._unread: Dict[int, Dict[str, Any]] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._changes: List[Change] = []
+        self._added: List[int] = []
+        self._completed: List[int] = []
+        self._tombstoned: List[int] = []
+        self._closed = False
+        self.error = error
+
+    @property
+    def changed(self) -> bool:
+        """Return True if the transaction holds any mutation."""
+        return bool(self._changes or self._tombstoned)
+
+    def add(self, description: List[str], priority: int = 2) -> CurrentTodo:
+        """Add a new to-do."""
+        todos, error = self.add_many([" ".join(description)], priority)
+        return CurrentTodo(todos[0], error)
+
+    def add_many(self, descriptions: Iterable[str], priority: int = 2) -> CurrentTodos:
+        """Add several new to-dos."""
+        todos = [new_todo(description, priority) for description in descriptions]
+        return self.apply("add", todos)
+
+    def set_done(self, todo_id: int) -> CurrentTodo:
+        """Set a to-do as done."""
+        todos, error = self.set_done_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    def set_done_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Set several to-dos as done."""
+        return self.apply("done", sorted(set(todo_ids)))
+
+    def remove(self, todo_id: int) -> CurrentTodo:
+        """Remove a to-do using its id."""
+        todos, error = self.remove_many([todo_id])
+        return CurrentTodo(todos[0] if todos else {}, error)
+
+    def remove_many(self, todo_ids: Iterable[int]) -> CurrentTodos:
+        """Remove several to-dos."""
+        return self.apply("remove", sorted(set(todo_ids)))
+
+    # defines .discard(), which removes to-dos like .remove_many() but doesn't return them, 
+    # for bulk removals whose to-dos the caller already has. It returns an error code.
+    def discard(self, todo_ids: Iterable[int]) -> int:
+        """Remove several to-dos without returning them."""
+        if self._closed:
+            raise RuntimeError("the transaction is closed")
+        if self.error:
+            return self.error
+        todo_ids = sorted(set(todo_ids))
+        if self._todoer._slots(todo_ids) is None:
+            return ID_ERROR
+        self._tombstone(todo_ids)
+        return SUCCESS
+
+    def _tombstone(self, todo_ids: List[int]) -> None:
+        for todo_id in todo_ids:
+            self._todoer._id_index.tombstone(todo_id)
+        self._tombstoned += todo_ids
+
+    # defines ._todo(), which returns the to-do in a slot, looking past the end of the database 
+    # for the to-dos added by this transaction. Without a loaded list, it returns an empty dictionary 
+    # that .commit() fills in.
+    def _todo(self, slot: int) -> Dict[str, Any]:
+        if slot >= self._size:
+            return self._pending[slot - self._size]
+        if self._todo_list is None:
+            return self._unread.setdefault(slot, {})
+        return self._todo_list[slot]
+
+    # defines ._done(), which marks the to-do in a slot as completed and returns it. A to-do that was read 
+    # from the database may be shared with the parse cache, so its slot gets a completed copy instead, 
+    # the same way apply_changes() treats it when the change is committed.
+    def _done(self, slot: int) -> Dict[str, Any]:
+        todo = self._todo(slot)
+        if slot < self._size and self._todo_list is not None:
+            todo = self._todo_list[slot] = {**todo, "Done": True}
+        else:
+            todo["Done"] = True
+        return todo
+
+    # defines .apply(), which applies a single mutation in memory. Adding to-dos assigns the next IDs 
+    # to new slots and records one "add" change per to-do. Completing records one "done" change per slot 
+    # and hands out the completed to-dos right away. 
+    # Removing a to-do turns its slot into a tombstone in the ID index, 
+    # so no other to-do changes its ID and the database itself isn't rewritten. 
+    # If any ID is unknown, the mutation changes nothing and gets ID_ERROR.
+    def apply(self, op: str, args: List[Any]) -> CurrentTodos:
+        """Apply a mutation to the transaction."""
+        if self._closed:
+            raise RuntimeError("the transaction is closed")
+        if self.error:
+            return CurrentTodos(args if op == "add" else [], self.error)
+        with span("mutate"):
+            return self._apply(op, args)
+
+    def _apply(self, op: str, args: List[Any]) -> CurrentTodos:
+        id_index = self._todoer._id_index
+        if op == "add":
+            self._changes += [Change("add", todo=todo) for todo in args]
+            self._added += [id_index.append() for _ in args]
+            self._pending += args
+            return CurrentTodos(args, SUCCESS)
+        slots = self._todoer._slots(args)
+        if slots is None:
+            return CurrentTodos([], ID_ERROR)
+        if op == "done":
+            self._changes += [Change("done", slot) for slot in slots]
+            self._completed += args
+            return CurrentTodos([self._done(slot) for slot in slots], SUCCESS)
+        if op == "remove":
+            self._tombstone(args)
+        else:
+            raise ValueError(f"unknown mutation: {op!r}")
+        return CurrentTodos([self._todo(slot) for slot in slots], SUCCESS)
+
+    # defines .commit(). It commits the changes through the database handler, which decides 
+    # how to persist them: the JSON engine applies them to the loaded list and rewrites it, 
+    # while the journal engine just appends small records. Then the new IDs and tombstones 
+    # are recorded in the ID index. The search index, if there's one, is marked dirty around the commit 
+    # and then gets the same changes, and the completed IDs go to the completion log of the archive.
+    def commit(self) -> int:
+        """Write every mutation of the transaction with a single commit."""
+        self._closed = True
+        if self.error or not self.changed:
+            return self.error
+        todoer = self._todoer
+        indexed = todoer._search.begin()
+        error = SUCCESS
+        if self._changes:
+            error = todoer._db_handler.commit(self._changes, self._todo_list).error
+        with span("index"):
+            if not error and (self._added or self._tombstoned):
+                error = todoer._id_index.log(added=self._added, tombstoned=self._tombstoned)
+            if not error and indexed:
+                todoer._search.update(
+                    zip(self._added, self._pending), self._completed, self._tombstoned
+                )
+        if error:
+            # the ID index in memory is ahead of the file now, so it has to be read again.
+            todoer._id_index.invalidate()
+            return error
+        todoer._completions.log(self._completed)
+        if self._unread:
+            self._fill()
+        return error
+
+    # defines ._fill(), which copies the committed to-dos into the dictionaries handed out by ._todo(), 
+    # stopping after the last one. The commit already succeeded, so a failed read leaves them empty 
+    # rather than turning it into an error.
+    def _fill(self) -> None:
+        last = max(self._unread)
+        try:
+            for slot, todo in enumerate(self._todoer._db_handler.iter_todos()):
+                if slot in self._unread:
+                    self._unread[slot].update(todo)
+                if slot == last:
+                    break
+        except DatabaseError:
+            pass
+
+    # defines .rollback(), which drops every mutation. The ID index in memory already holds 
+    # the new IDs and tombstones, so it's read again from the file next time.
+    def rollback(self) -> None:
+        """Discard every mutation of the transaction."""
+        self._closed = True
+        self._changes.clear()
+        self._tombstoned.clear()
+        self._todoer._id_index.invalidate()
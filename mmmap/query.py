@@ -0,0 +1,58 @@
+"""This module provides the mmmap to-do query engine."""
+# mmmap/query.py
+
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+Item = Tuple[int, Dict[str, Any]]
+
+# define the sort keys of a query. Ties are broken by ID, so the order is always the same.
+SORT_KEYS: Dict[str, Callable[[Item], Any]] = {
+    "id": lambda item: item[0],
+    "priority": lambda item: (item[1]["Priority"], item[0]),
+    "description": lambda item: (item[1]["Description"].casefold(), item[0]),
+    "done": lambda item: (item[1]["Done"], item[0]),
+}
+
+# define Query as a NamedTuple subclass. Every field left as None doesn't restrict the result:
+# priority keeps the to-dos with that priority, done keeps the completed (True) or pending (False) ones,
+# match keeps the to-dos whose description contains the text, ignoring case,
+# sort orders the result by one of SORT_KEYS, and top keeps only the first to-dos of the result.
+class Query(NamedTuple):
+    priority: Optional[int] = None
+    done: Optional[bool] = None
+    match: Optional[str] = None
+    sort: Optional[str] = None
+    top: Optional[int] = None
+
+# defines matches(), which builds the predicate of a query. The checks that are needed
+# are decided once, so testing a to-do costs only the comparisons the query asks for.
+def matches(query: Query) -> Callable[[Item], bool]:
+    """Return a function that tells if an item satisfies the query filters."""
+    checks = []
+    if query.priority is not None:
+        checks.append(lambda todo: todo["Priority"] == query.priority)
+    if query.done is not None:
+        checks.append(lambda todo: bool(todo["Done"]) == query.done)
+    if query.match:
+        text = query.match.casefold()
+        checks.append(lambda todo: text in todo["Description"].casefold())
+    return lambda item: all(check(item[1]) for check in checks)
+
+# defines run_query(), which evaluates a query over a stream of (ID, to-do) items.
+# Filtering is lazy, so the items are tested as they're read from storage.
+# A sorted query with top uses a bounded heap, heapq.nsmallest(), so memory grows with top
+# rather than with the number of to-dos. Only a sorted query without top has to hold every match.
+def run_query(query: Query, items: Iterable[Item]) -> Iterator[Item]:
+    """Yield the items that satisfy the query, in the requested order."""
+    if query.sort is not None and query.sort not in SORT_KEYS:
+        raise ValueError(f"unknown sort key: {query.sort!r}")
+    if query.priority is not None or query.done is not None or query.match:
+        items = filter(matches(query), items)
+    if query.sort is None:
+        return itertools.islice(items, query.top)
+    key = SORT_KEYS[query.sort]
+    if query.top is not None:
+        return iter(heapq.nsmallest(query.top, items, key=key))
+    return iter(sorted(items, key=key))
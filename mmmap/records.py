@@ -0,0 +1,253 @@
+"""This module provides the mmmap fixed-width record storage engine."""
+# mmmap/records.py
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, JSON_ERROR, SUCCESS
+from mmmap.database import (
+    DEFAULT_CODEC,
+    Change,
+    DatabaseError,
+    DatabaseHandler,
+    DBResponse,
+    apply_changes,
+    atomic_write,
+    sync_files,
+)
+from mmmap.spans import span
+
+# define the layout of the record file. It starts with a fixed header holding a magic number,
+# the format version, the record size, the number of records and the generation of the string heap.
+# The header is followed by one fixed-width record per to-do.
+# Version 1 files have no generation and use the heap of generation 0. They're still read,
+# and the next rewrite turns them into version 2 files.
+HEADER = struct.Struct("<4sHHQQ")
+HEADER_V1 = struct.Struct("<4sHHQ")
+# define where the number of records sits in the header, the same place in both versions.
+COUNT = struct.Struct("<Q")
+COUNT_OFFSET = 8
+MAGIC = b"MMTD"
+VERSION = 2
+# Every record holds the offset and length of the description in the string heap,
+# the priority and the done flag, padded to 16 bytes.
+RECORD = struct.Struct("<QIBBxx")
+# defines the position of the done flag inside a record,
+# so completing a to-do is a one-byte write at HEADER.size + index * RECORD.size + DONE_OFFSET.
+DONE_OFFSET = 13
+# The descriptions live in a string heap next to the record file. Every rewrite writes a new heap, 
+# named after its generation, so "todo.todo" gets "todo.todo.1.heap", "todo.todo.2.heap" and so on, 
+# and generation 0 is the "todo.todo.heap" of version 1 files.
+HEAP_SUFFIX = ".heap"
+
+# defines RecordFormatError, raised when the file doesn't look like a record database.
+class RecordFormatError(Exception):
+    pass
+
+# defines RecordDatabaseHandler. It stores the to-do list in a compact binary file opened through mmap,
+# so completing a to-do flips a single byte and listing decodes one record at a time.
+class RecordDatabaseHandler(DatabaseHandler):
+    def __init__(
+        self,
+        db_path: Path,
+        cache: bool = False,
+        codec: str = DEFAULT_CODEC,
+        streaming: bool = False,
+    ) -> None:
+        super().__init__(db_path, cache, codec, streaming)
+
+    def init_database(self) -> int:
+        """Create an empty to-do database."""
+        return self.write_todos([]).error
+
+    # defines ._heap_path(), the path of the string heap of a generation.
+    def _heap_path(self, generation: int) -> Path:
+        name = self._db_path.name
+        if generation:
+            name += f".{generation}"
+        return self._db_path.with_name(name + HEAP_SUFFIX)
+
+    # defines ._header(), which validates the header of a record file of the given size
+    # and returns the size of the header, the number of records and the generation of the heap.
+    @staticmethod
+    def _header(header: Any, file_size: int) -> Tuple[int, int, int]:
+        if file_size < HEADER_V1.size:
+            raise RecordFormatError("truncated header")
+        magic, version, record_size, count = HEADER_V1.unpack_from(header, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise RecordFormatError("unsupported record file")
+        if version == 1:
+            header_size, generation = HEADER_V1.size, 0
+        elif version == VERSION and file_size >= HEADER.size:
+            header_size, generation = HEADER.size, HEADER.unpack_from(header, 0)[4]
+        else:
+            raise RecordFormatError("unsupported record file")
+        if file_size < header_size + count * RECORD.size:
+            raise RecordFormatError("truncated records")
+        return header_size, count, generation
+
+    # defines ._generation(), which returns the generation of the heap of the current record file, 
+    # or 0 if there's no valid record file yet.
+    def _generation(self) -> int:
+        try:
+            with self._db_path.open("rb") as db:
+                return self._header(db.read(HEADER.size), db.seek(0, 2))[2]
+        except (OSError, RecordFormatError):
+            return 0
+
+    # defines ._iter_records(), a generator that decodes the records one at a time
+    # straight out of the memory-mapped files.
+    def _iter_records(self) -> Iterator[Dict[str, Any]]:
+        with self._db_path.open("rb") as db, mmap.mmap(
+            db.fileno(), 0, access=mmap.ACCESS_READ
+        ) as records:
+            header_size, count, generation = self._header(records, len(records))
+            with self._heap_path(generation).open("rb") as heap:
+                heap_size = heap.seek(0, 2)
+                # mmap can't map an empty file, so an empty heap is read as plain bytes.
+                strings = (
+                    mmap.mmap(heap.fileno(), 0, access=mmap.ACCESS_READ)
+                    if heap_size
+                    else b""
+                )
+                try:
+                    for position in range(
+                        header_size, header_size + count * RECORD.size, RECORD.size
+                    ):
+                        offset, length, priority, done = RECORD.unpack_from(
+                            records, position
+                        )
+                        if offset + length > heap_size:
+                            raise RecordFormatError("description out of bounds")
+                        yield {
+                            "Description": strings[offset:offset + length].decode(),
+                            "Priority": priority,
+                            "Done": bool(done),
+                        }
+                finally:
+                    if heap_size:
+                        strings.close()
+
+    def iter_todos(self) -> Iterator[Dict[str, Any]]:
+        try:
+            yield from self._iter_records()
+        except (RecordFormatError, UnicodeDecodeError, ValueError):
+            raise DatabaseError(JSON_ERROR)
+        except OSError:
+            raise DatabaseError(DB_READ_ERROR)
+
+    def read_todos(self) -> DBResponse:
+        try:
+            with span("read"):
+                return DBResponse(list(self.iter_todos()), SUCCESS)
+        except DatabaseError as error:
+            return DBResponse([], error.error)
+
+    # defines .write_todos(), which rewrites both the record file and the string heap.
+    # This is also how the heap gets rid of descriptions left behind by removed to-dos.
+    def write_todos(self, todo_list: List[Dict[str, Any]]) -> DBResponse:
+        return DBResponse(todo_list, self.write_todos_iter(todo_list).error)
+
+    # defines .write_todos_iter(), which writes the records one at a time and stores their count 
+    # in the header at the end. The descriptions go to the heap of the next generation, 
+    # and both files are written with atomic_write(), so the to-dos can be read from the files 
+    # that are being replaced. The new heap is in place before the record file that names it, 
+    # so replacing the record file commits the whole write, and only then is the old heap removed. 
+    # If the process dies halfway, the old record file still names the old heap.
+    def write_todos_iter(self, todos: Iterable[Dict[str, Any]]) -> DBResponse:
+        old_generation = self._generation()
+        generation = old_generation + 1
+        try:
+            with span("write"), atomic_write(self._db_path, "wb") as db, atomic_write(
+                self._heap_path(generation), "wb"
+            ) as heap:
+                db.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0, generation))
+                offset = 0
+                count = 0
+                for todo in todos:
+                    description = todo["Description"].encode()
+                    heap.write(description)
+                    db.write(self._pack(todo, offset, len(description)))
+                    offset += len(description)
+                    count += 1
+                db.seek(0)
+                db.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, generation))
+        except OSError:
+            return DBResponse([], DB_WRITE_ERROR)
+        except DatabaseError as error:
+            return DBResponse([], error.error)
+        try:
+            self._heap_path(old_generation).unlink()
+        except OSError:
+            pass
+        return DBResponse([], SUCCESS)
+
+    def sync(self) -> int:
+        """Flush the record file and the string heap to stable storage."""
+        return sync_files(self._db_path, self._heap_path(self._generation()))
+
+    @staticmethod
+    def _pack(todo: Dict[str, Any], offset: int, length: int) -> bytes:
+        return RECORD.pack(offset, length, todo["Priority"], int(todo["Done"]))
+
+    # defines .commit(), which patches the record file in place instead of rewriting it.
+    def commit(
+        self,
+        changes: List[Change],
+        todo_list: Optional[List[Dict[str, Any]]] = None,
+    ) -> DBResponse:
+        if todo_list is not None:
+            with span("mutate"):
+                apply_changes(todo_list, changes)
+        try:
+            with span("write"):
+                for change in changes:
+                    if change.op == "clear":
+                        write = self.write_todos([])
+                        if write.error:
+                            return DBResponse(todo_list or [], write.error)
+                    elif change.op == "add":
+                        self._append(change.todo)
+                    else:
+                        self._patch(change)
+        except (RecordFormatError, IndexError, ValueError, OSError):
+            return DBResponse(todo_list or [], DB_WRITE_ERROR)
+        return DBResponse(todo_list or [], SUCCESS)
+
+    # defines ._append(). The description goes to the end of the heap,
+    # the new record goes right after the last valid record,
+    # and only then is the count in the header bumped, so a crash in between leaves the old list intact.
+    def _append(self, todo: Dict[str, Any]) -> None:
+        description = todo["Description"].encode()
+        with self._db_path.open("r+b") as db:
+            header = db.read(HEADER.size)
+            header_size, count, generation = self._header(header, db.seek(0, 2))
+            with self._heap_path(generation).open("ab") as heap:
+                offset = heap.tell()
+                heap.write(description)
+            db.seek(header_size + count * RECORD.size)
+            db.write(self._pack(todo, offset, len(description)))
+            db.seek(COUNT_OFFSET)
+            db.write(COUNT.pack(count + 1))
+
+    # defines ._patch(), which applies "done" and "remove" through mmap.
+    # Completing writes one byte. Removing moves the following records down by one slot
+    # without decoding them, and then shrinks the file.
+    def _patch(self, change: Change) -> None:
+        with self._db_path.open("r+b") as db:
+            with mmap.mmap(db.fileno(), 0) as records:
+                header_size, count, _ = self._header(records, len(records))
+                if not 0 <= change.index < count:
+                    raise IndexError(change.index)
+                position = header_size + change.index * RECORD.size
+                if change.op == "done":
+                    records[position + DONE_OFFSET] = 1
+                    return
+                if change.op != "remove":
+                    raise ValueError(f"unknown change: {change.op!r}")
+                end = header_size + count * RECORD.size
+                records.move(position, position + RECORD.size, end - position - RECORD.size)
+                COUNT.pack_into(records, COUNT_OFFSET, count - 1)
+            db.truncate(end - RECORD.size)
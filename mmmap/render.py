@@ -0,0 +1,129 @@
+"""This module provides the mmmap to-do list renderers."""
+# mmmap/render.py
+
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import typer
+
+from mmmap.todo import chunks
+
+# define the output formats of the list command. "table" is the human-readable table,
+# and the others stream one record per to-do for other tools to read.
+FORMATS = ("table", "json", "jsonl", "csv", "tsv")
+# define how many rows are formatted and written at a time.
+# Building large chunks keeps the number of writes, and of ANSI style codes, low.
+CHUNK_ROWS = 4096
+# define the columns of the table format and the fields of the other formats.
+COLUMNS = ("ID.  ", "| Priority  ", "| Done  ", "| Description  ")
+FIELDS = ("ID", "Description", "Priority", "Done")
+# define the extra column and field of to-dos gathered from several lists, 
+# which carry the name of their list under the "List" key.
+LIST_COLUMN = "| List        "
+LIST_FIELD = "List"
+
+Item = Tuple[int, Dict[str, Any]]
+
+# defines _record(), the dictionary written for a to-do by the machine-readable formats.
+def _record(todo_id: int, todo: Dict[str, Any], with_list: bool = False) -> Dict[str, Any]:
+    record = {"ID": todo_id}
+    if with_list:
+        record["List"] = todo["List"]
+    record.update(
+        Description=todo["Description"], Priority=todo["Priority"], Done=todo["Done"]
+    )
+    return record
+
+# define the formatters. Each one turns a chunk of (ID, to-do) items into a single string. 
+# The CSV and TSV rows end with a plain line feed, which is what most Unix tools expect.
+def _table_rows(items: List[Item], with_list: bool = False) -> str:
+    return "".join([
+        f"{str(todo_id).ljust(len(COLUMNS[0]))}"
+        f"{('| ' + todo['List']).ljust(len(LIST_COLUMN)) if with_list else ''}"
+        f"{('| (' + str(todo['Priority']) + ')').ljust(len(COLUMNS[1]))}"
+        f"{('| ' + str(todo['Done'])).ljust(len(COLUMNS[2]))}"
+        f"| {todo['Description']}\n"
+        for todo_id, todo in items
+    ])
+
+
+def _jsonl_rows(items: List[Item], with_list: bool = False) -> str:
+    return "".join(json.dumps(_record(*item, with_list)) + "\n" for item in items)
+
+
+def _delimited_header(dialect: str, with_list: bool = False) -> str:
+    buffer = io.StringIO()
+    fields = (FIELDS[0], LIST_FIELD, *FIELDS[1:]) if with_list else FIELDS
+    csv.writer(buffer, dialect, lineterminator="\n").writerow(fields)
+    return buffer.getvalue()
+
+
+def _delimited_rows(dialect: str, with_list: bool = False) -> Callable[[List[Item]], str]:
+    def rows(items: List[Item]) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, dialect, lineterminator="\n")
+        if with_list:
+            writer.writerows(
+                (todo_id, todo["List"], todo["Description"], todo["Priority"], todo["Done"])
+                for todo_id, todo in items
+            )
+        else:
+            writer.writerows(
+                (todo_id, todo["Description"], todo["Priority"], todo["Done"])
+                for todo_id, todo in items
+            )
+        return buffer.getvalue()
+
+    return rows
+
+# defines render(). It streams the items to write() in the given format, one chunk at a time,
+# so memory stays bounded by the chunk size whatever the length of the list.
+# With color=True, the table gets the usual blue styling, applied once per chunk instead of once per row.
+# With with_list=True, every format gets a List column with the "List" key of the to-dos.
+def render(
+    items: Iterable[Item],
+    fmt: str,
+    write: Callable[[str], Any],
+    color: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+    with_list: bool = False,
+) -> None:
+    """Write the to-do items in the given output format."""
+
+    def style(text: str, bold: bool = False) -> str:
+        if not color:
+            return text
+        return typer.style(text, fg=typer.colors.BLUE, bold=bold)
+
+    if fmt == "table":
+        columns = (COLUMNS[0], LIST_COLUMN, *COLUMNS[1:]) if with_list else COLUMNS
+        headers = "".join(columns)
+        write(style("\nto-do list:\n\n", bold=True))
+        write(style(headers + "\n", bold=True) + style("-" * len(headers) + "\n"))
+        for chunk in chunks(items, chunk_rows):
+            write(style(_table_rows(chunk, with_list)))
+        write(style("-" * len(headers) + "\n") + "\n")
+    elif fmt == "json":
+        # writes a single JSON array with one object per line, adding the separators between chunks.
+        separator = "\n"
+        write("[")
+        for chunk in chunks(items, chunk_rows):
+            write(
+                separator
+                + ",\n".join(json.dumps(_record(*item, with_list)) for item in chunk)
+            )
+            separator = ",\n"
+        write("\n]\n")
+    elif fmt == "jsonl":
+        for chunk in chunks(items, chunk_rows):
+            write(_jsonl_rows(chunk, with_list))
+    elif fmt in ("csv", "tsv"):
+        dialect = "excel" if fmt == "csv" else "excel-tab"
+        write(_delimited_header(dialect, with_list))
+        rows = _delimited_rows(dialect, with_list)
+        for chunk in chunks(items, chunk_rows):
+            write(rows(chunk))
+    else:
+        raise ValueError(f"unknown output format: {fmt!r}")
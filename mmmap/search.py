@@ -0,0 +1,244 @@
+"""This module provides the mmmap full-text search index."""
+# mmmap/search.py
+
+import os
+import re
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, SUCCESS
+from mmmap.database import DatabaseError
+from mmmap.todo import chunks
+
+# define SEARCH_SUFFIX. The search index lives next to the database file,
+# so "todo.json" gets a "todo.json.search" companion.
+SEARCH_SUFFIX = ".search"
+
+# define the schema of the search index, an SQLite database. postings is the inverted index:
+# one row per token and to-do ID, clustered by token, so finding the to-dos that hold a token,
+# or any token with a given prefix, is a B-tree range scan. todos keeps a copy of every indexed to-do,
+# so search results are shown without reading the to-do database at all.
+# meta holds the dirty flag, which is set while the to-do database changes ahead of the index.
+SCHEMA = """
+CREATE TABLE meta (dirty INTEGER NOT NULL);
+CREATE TABLE todos (
+    id INTEGER PRIMARY KEY,
+    Description TEXT NOT NULL,
+    Priority INTEGER NOT NULL,
+    Done INTEGER NOT NULL
+);
+CREATE TABLE postings (
+    token TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (token, id)
+) WITHOUT ROWID;
+INSERT INTO meta VALUES (0);
+"""
+
+_TOKEN = re.compile(r"\w+")
+
+Item = Tuple[int, Dict[str, Any]]
+
+# defines tokenize(), which splits a text into its distinct words, ignoring case and punctuation.
+def tokenize(text: str) -> List[str]:
+    """Return the search tokens of a text."""
+    return sorted(set(_TOKEN.findall(text.casefold())))
+
+# defines parse_terms(), which turns the words of a search into (token, prefix) terms.
+# A word ending in "*" matches every token that starts with it, so "mil*" finds "milk" and "mile".
+def parse_terms(words: Iterable[str]) -> List[Tuple[str, bool]]:
+    """Return the search terms of the given words."""
+    terms = []
+    for word in " ".join(words).split():
+        tokens = _TOKEN.findall(word.casefold())
+        if not tokens:
+            continue
+        terms += [(token, False) for token in tokens[:-1]]
+        terms.append((tokens[-1], word.endswith("*")))
+    return terms
+
+# defines SearchIndex, the inverted index of the to-do descriptions. Todoer keeps it up to date
+# while it holds the exclusive database lock: .begin() marks the index dirty before a commit,
+# and .update() applies the same changes to the index and marks it clean again.
+# If the process dies in between, or the index can't be read, it stays dirty
+# and the next search rebuilds it from the to-do database.
+#
+# SQLite is imported on first use, so commands that don't search don't pay for it.
+# The index runs with synchronous=OFF, since losing it only costs a rebuild.
+class SearchIndex:
+    def __init__(self, db_path: Path) -> None:
+        self._path = db_path.with_name(db_path.name + SEARCH_SUFFIX)
+
+    def exists(self) -> bool:
+        """Return True if the index file exists."""
+        return self._path.exists()
+
+    def _connect(self, path: Optional[Path] = None, create: bool = False) -> Any:
+        import sqlite3
+        from urllib.parse import quote
+
+        mode = "rwc" if create else "rw"
+        uri = f"file:{quote(str((path or self._path).resolve()))}?mode={mode}"
+        db = sqlite3.connect(uri, uri=True)
+        db.execute("PRAGMA synchronous = OFF")
+        return db
+
+    # defines ._dirty(), which returns the dirty flag, or None if the index is missing or unreadable.
+    @staticmethod
+    def _dirty(db: Any) -> Optional[bool]:
+        row = db.execute("SELECT dirty FROM meta").fetchone()
+        return None if row is None else bool(row[0])
+
+    def ready(self) -> bool:
+        """Return True if the index is up to date with the to-do database."""
+        import sqlite3
+
+        if not self.exists():
+            return False
+        try:
+            with closing(self._connect()) as db:
+                return self._dirty(db) is False
+        except sqlite3.Error:
+            return False
+
+    # defines .begin(). It returns True if the index was up to date, and marks it dirty,
+    # so the caller can follow its commit with .update(). A missing index stays missing:
+    # it's only built by the first search.
+    def begin(self) -> bool:
+        """Mark the index dirty ahead of a commit to the to-do database."""
+        import sqlite3
+
+        if not self.exists():
+            return False
+        try:
+            with closing(self._connect()) as db:
+                with db:
+                    if self._dirty(db) is not False:
+                        return False
+                    db.execute("UPDATE meta SET dirty = 1")
+        except sqlite3.Error:
+            return False
+        return True
+
+    # defines .update(), which indexes the added to-dos, marks the completed ones as done,
+    # and drops the removed ones, all in a single transaction that also clears the dirty flag.
+    def update(
+        self,
+        added: Iterable[Item] = (),
+        done: Iterable[int] = (),
+        removed: Iterable[int] = (),
+    ) -> int:
+        """Apply committed changes to the index and mark it clean."""
+        import sqlite3
+
+        try:
+            with closing(self._connect()) as db:
+                with db:
+                    _insert(db, added)
+                    db.executemany(
+                        "UPDATE todos SET Done = 1 WHERE id = ?", ((i,) for i in done)
+                    )
+                    for todo_id in removed:
+                        row = db.execute(
+                            "SELECT Description FROM todos WHERE id = ?", (todo_id,)
+                        ).fetchone()
+                        if row is None:
+                            continue
+                        db.executemany(
+                            "DELETE FROM postings WHERE token = ? AND id = ?",
+                            ((token, todo_id) for token in tokenize(row[0])),
+                        )
+                        db.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
+                    db.execute("UPDATE meta SET dirty = 0")
+        except sqlite3.Error:
+            return DB_WRITE_ERROR
+        return SUCCESS
+
+    # defines .rebuild(), which indexes every item into a new file and then replaces the old index,
+    # so a search never sees a half-built index. The caller holds the exclusive database lock.
+    # If reading the items raises DatabaseError, its error code is returned.
+    def rebuild(self, items: Iterable[Item]) -> int:
+        """Build the index from scratch."""
+        import sqlite3
+
+        tmp_path = self._path.with_name(self._path.name + ".tmp")
+        try:
+            tmp_path.unlink(missing_ok=True)
+            with closing(self._connect(tmp_path, create=True)) as db:
+                with db:
+                    db.executescript(SCHEMA)
+                    # collects the postings in an unordered staging table first and then copies them 
+                    # in key order, which builds the B-tree sequentially instead of at random.
+                    db.execute("CREATE TEMP TABLE staging (token TEXT, id INTEGER)")
+                    _insert(db, items, "staging")
+                    db.execute(
+                        "INSERT OR IGNORE INTO postings "
+                        "SELECT token, id FROM staging ORDER BY token, id"
+                    )
+            os.replace(tmp_path, self._path)
+        except (OSError, sqlite3.Error, DatabaseError) as error:
+            tmp_path.unlink(missing_ok=True)
+            return getattr(error, "error", DB_WRITE_ERROR)
+        return SUCCESS
+
+    # defines .search(), which returns the indexed to-dos, in ID order, that hold every term,
+    # or any of them with any_term=True. Every term is a lookup or a range scan of postings,
+    # and SQLite intersects or unites the resulting sets of IDs. Read errors raise DatabaseError.
+    def search(
+        self,
+        terms: List[Tuple[str, bool]],
+        any_term: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Item]:
+        """Return the to-dos that match the search terms."""
+        import sqlite3
+
+        if not terms:
+            return []
+        selects = []
+        params: List[Any] = []
+        for token, prefix in terms:
+            if prefix:
+                selects.append("SELECT id FROM postings WHERE token >= ? AND token < ?")
+                params += [token, token[:-1] + chr(ord(token[-1]) + 1)]
+            else:
+                selects.append("SELECT id FROM postings WHERE token = ?")
+                params.append(token)
+        ids = (" UNION " if any_term else " INTERSECT ").join(selects)
+        sql = (
+            "SELECT id, Description, Priority, Done FROM todos "
+            f"WHERE id IN ({ids}) ORDER BY id LIMIT ?"
+        )
+        params.append(-1 if limit is None else limit)
+        try:
+            with closing(self._connect()) as db:
+                rows = db.execute(sql, params).fetchall()
+        except sqlite3.Error:
+            raise DatabaseError(DB_READ_ERROR)
+        return [
+            (todo_id, {"Description": desc, "Priority": priority, "Done": bool(done)})
+            for todo_id, desc, priority, done in rows
+        ]
+
+# define INSERT_ROWS, how many to-dos are inserted with each batch of statements.
+INSERT_ROWS = 10000
+
+# defines _insert(), which adds items to the todos table and their tokens to postings, a batch at a time.
+def _insert(db: Any, items: Iterable[Item], postings: str = "postings") -> None:
+    for chunk in chunks(items, INSERT_ROWS):
+        db.executemany(
+            "INSERT OR REPLACE INTO todos VALUES (?, ?, ?, ?)",
+            [
+                (todo_id, todo["Description"], todo["Priority"], int(todo["Done"]))
+                for todo_id, todo in chunk
+            ],
+        )
+        db.executemany(
+            f"INSERT OR IGNORE INTO {postings} VALUES (?, ?)",
+            [
+                (token, todo_id)
+                for todo_id, todo in chunk
+                for token in tokenize(todo["Description"])
+            ],
+        )
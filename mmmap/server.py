@@ -0,0 +1,267 @@
+"""This module provides the mmmap daemon."""
+# mmmap/server.py
+
+import asyncio
+import json
+import os
+import signal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from mmmap import DB_READ_ERROR, SUCCESS
+from mmmap.client import encode_message, is_running
+from mmmap.database import (
+    DEFAULT_CODEC,
+    DEFAULT_DURABILITY,
+    Change,
+    DatabaseError,
+    DatabaseHandler,
+    DBResponse,
+    apply_changes,
+)
+from mmmap.durability import SyncPolicy
+from mmmap.mmmap import Todoer
+from mmmap.query import Query
+
+# define the Todoer methods the daemon answers. Anything else is rejected.
+# The WRITE_OPS among them are refused while the pending changes can't be flushed.
+OPS = (
+    "add_many",
+    "get_todos",
+    "set_done_many",
+    "remove_many",
+    "remove_all",
+    "compact",
+    "iter_todo_items",
+    "query",
+    "search",
+    "archive",
+    "iter_archived_items",
+)
+WRITE_OPS = ("add_many", "set_done_many", "remove_many", "remove_all", "compact", "archive")
+
+# defines BufferedDatabaseHandler. It wraps the handler of the real storage engine and keeps
+# the to-do list in memory: reads never touch the disk after the first one,
+# and commits only change the list in memory and mark it dirty until .flush() writes it out.
+class BufferedDatabaseHandler(DatabaseHandler):
+    def __init__(self, handler: DatabaseHandler) -> None:
+        super().__init__(handler._db_path)
+        self._handler = handler
+        self._todo_list: Optional[List[Dict[str, Any]]] = None
+        self.dirty = False
+
+    def init_database(self) -> int:
+        self._todo_list = None
+        return self._handler.init_database()
+
+    # The list in memory is handed out as is. Todoer passes it back to .commit(),
+    # which is where it gets changed.
+    def read_todos(self) -> DBResponse:
+        if self._todo_list is None:
+            read = self._handler.read_todos()
+            if read.error:
+                return read
+            self._todo_list = read.todo_list
+        return DBResponse(self._todo_list, SUCCESS)
+
+    def iter_todos(self) -> Iterator[Dict[str, Any]]:
+        read = self.read_todos()
+        if read.error:
+            raise DatabaseError(read.error)
+        yield from read.todo_list
+
+    def write_todos(self, todo_list: List[Dict[str, Any]]) -> DBResponse:
+        self._todo_list = todo_list
+        self.dirty = True
+        return DBResponse(todo_list, SUCCESS)
+
+    def commit(
+        self,
+        changes: List[Change],
+        todo_list: Optional[List[Dict[str, Any]]] = None,
+    ) -> DBResponse:
+        read = self.read_todos()
+        if read.error:
+            return read
+        apply_changes(read.todo_list, changes)
+        if todo_list is not None and todo_list is not read.todo_list:
+            apply_changes(todo_list, changes)
+        self.dirty = True
+        return read
+
+    # defines .sync(), which flushes the pending changes before it makes them durable.
+    def sync(self) -> int:
+        write = self.flush()
+        if write.error:
+            return write.error
+        return self._handler.sync()
+
+    def compact(self) -> DBResponse:
+        write = self.flush()
+        if write.error:
+            return write
+        return self._handler.compact()
+
+    # defines .pending(), which returns a snapshot of the list in memory if it changed since it was 
+    # last taken, or None. The snapshot copies the list but not the to-dos, which are never changed 
+    # in place, so .write() can write it from another thread while requests go on changing the list.
+    def pending(self) -> Optional[List[Dict[str, Any]]]:
+        """Return a snapshot of the pending changes, if any."""
+        if not self.dirty or self._todo_list is None:
+            return None
+        self.dirty = False
+        return list(self._todo_list)
+
+    # defines .write(), which writes a snapshot through the real handler. If that fails, 
+    # the list is marked dirty again, so the next flush retries.
+    def write(self, todo_list: List[Dict[str, Any]]) -> DBResponse:
+        """Write a snapshot taken by .pending() to the database."""
+        write = self._handler.write_todos(todo_list)
+        if write.error:
+            self.dirty = True
+        return write
+
+    # defines .flush(), which writes the list in memory through the real handler if it changed.
+    def flush(self) -> DBResponse:
+        """Write pending changes to the database."""
+        todo_list = self.pending()
+        if todo_list is None:
+            return DBResponse(self._todo_list or [], SUCCESS)
+        return self.write(todo_list)
+
+# defines TodoServer, which answers requests from RemoteTodoer clients with a single Todoer.
+# The Todoer keeps the database in memory through its parse cache, or through a BufferedDatabaseHandler
+# when a flush interval is set, so it never uses the large-database mode, whatever the database size.
+# Requests are handled one at a time on the event loop, so mutations from different clients never interleave. 
+# Periodic flushes write in a worker thread instead, so requests keep being answered meanwhile. 
+# The error of the last flush is kept in flush_error, and until a flush succeeds, the writes are refused 
+# with that error, so clients don't get changes acknowledged that may never reach the disk.
+class TodoServer:
+    def __init__(
+        self,
+        db_path: Path,
+        backend: str,
+        flush_interval: float = 0.0,
+        durability: str = DEFAULT_DURABILITY,
+        codec: str = DEFAULT_CODEC,
+    ) -> None:
+        self.todoer = Todoer(
+            db_path,
+            backend,
+            cache=True,
+            durability=durability,
+            codec=codec,
+            streaming=False,
+        )
+        self.flush_interval = flush_interval
+        self.flush_error = SUCCESS
+        self._buffer: Optional[BufferedDatabaseHandler] = None
+        self._sync_policy = self.todoer._sync_policy
+        if flush_interval > 0:
+            self._buffer = BufferedDatabaseHandler(self.todoer._db_handler)
+            self.todoer._db_handler = self._buffer
+            # the durability level applies to the flushes, so the commits in memory aren't synced.
+            self.todoer._sync_policy = SyncPolicy(db_path, "none")
+
+    # defines .handle(), which runs a single request and returns the response message.
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a single request against the Todoer."""
+        op = request.get("op")
+        if op not in OPS:
+            return {"result": None, "error": DB_READ_ERROR}
+        if op in WRITE_OPS and self.flush_error:
+            return {"result": 0 if op == "archive" else [], "error": self.flush_error}
+        method = getattr(self.todoer, op)
+        if op in ("iter_todo_items", "query", "search", "iter_archived_items"):
+            args = request.get("args", [])
+            if op == "query":
+                args = [Query(*args)]
+            try:
+                return {"result": list(method(*args)), "error": SUCCESS}
+            except (DatabaseError, TypeError, ValueError) as error:
+                return {"result": [], "error": getattr(error, "error", DB_READ_ERROR)}
+        result, error = method(*request.get("args", []))
+        return {"result": result, "error": error}
+
+    async def _serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, TypeError):
+                    response = {"result": None, "error": DB_READ_ERROR}
+                writer.write(encode_message(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def flush(self) -> int:
+        """Write pending changes to the database."""
+        if self._buffer is None:
+            return SUCCESS
+        todo_list = self._buffer.pending()
+        if todo_list is None:
+            return SUCCESS
+        return self._write(todo_list)
+
+    # defines ._write(), which writes a snapshot of the pending changes and records the outcome in flush_error.
+    def _write(self, todo_list: List[Dict[str, Any]]) -> int:
+        error = self._buffer.write(todo_list).error
+        if not error:
+            # makes the flushed changes durable as the durability level asks.
+            handler, id_index = self._buffer._handler, self.todoer._id_index
+            error = self._sync_policy.committed(lambda: handler.sync() or id_index.sync())
+        self.flush_error = error
+        return error
+
+    # defines ._flush_periodically(), which runs every flush in the default executor, 
+    # so the file I/O doesn't block the event loop.
+    async def _flush_periodically(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            todo_list = self._buffer.pending()
+            if todo_list is not None:
+                await loop.run_in_executor(None, self._write, todo_list)
+
+    # defines .serve(), which listens on socket_path until the task is cancelled,
+    # and flushes pending changes on the way out.
+    async def serve(self, socket_path: Path) -> None:
+        """Answer requests on a Unix domain socket."""
+        server = await asyncio.start_unix_server(self._serve_client, path=str(socket_path))
+        os.chmod(socket_path, 0o600)
+        # stops serving cleanly on SIGTERM, the same way as on Ctrl+C. 
+        # Signal handlers can only be installed from the main thread.
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, asyncio.current_task().cancel
+            )
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+        flusher = None
+        if self._buffer is not None:
+            flusher = asyncio.ensure_future(self._flush_periodically())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+            self.flush()
+            socket_path.unlink(missing_ok=True)
+
+# defines claim_socket(). It returns False if another daemon already answers on socket_path.
+# A socket file left behind by a daemon that died is removed.
+def claim_socket(socket_path: Path) -> bool:
+    """Make socket_path available for a new daemon."""
+    if is_running(socket_path):
+        return False
+    socket_path.unlink(missing_ok=True)
+    return True
@@ -0,0 +1,121 @@
+"""This module provides the mmmap queries across named lists."""
+# mmmap/shards.py
+
+import configparser
+import functools
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from mmmap import config
+from mmmap.database import DEFAULT_BACKEND, DEFAULT_CODEC
+from mmmap.query import SORT_KEYS, Query
+
+Item = Tuple[int, Dict[str, Any]]
+
+# define MAX_THREADS, the size limit of the thread pools that query and search the shards, 
+# and INLINE_SHARDS, the number of shards up to which a query runs in this thread without a pool.
+MAX_THREADS = 8
+INLINE_SHARDS = 2
+
+# define Shard as a NamedTuple subclass, the database of one list as registered in config.ini.
+class Shard(NamedTuple):
+    name: str
+    db_path: Path
+    backend: str
+    codec: str
+
+# defines get_shards(), which returns the default list and then every named list, by name.
+# Lists that aren't registered, like the default list before "mmmap init" runs,
+# and lists whose database doesn't exist are left out.
+def get_shards(config_file: Path) -> List[Shard]:
+    """Return the shard of every list registered in a config file."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_file)
+    names = [config.DEFAULT_LIST] + config.get_list_names(config_file)
+    shards = []
+    for name in names:
+        if not config_parser.has_section(config.list_section(name)):
+            continue
+        section = config_parser[config.list_section(name)]
+        shard = Shard(
+            name,
+            Path(section["database"]),
+            section.get("backend", DEFAULT_BACKEND),
+            section.get("codec", DEFAULT_CODEC),
+        )
+        if shard.db_path.exists():
+            shards.append(shard)
+    return shards
+
+def _todoer(shard: Shard) -> Any:
+    from mmmap.mmmap import Todoer
+
+    return Todoer(shard.db_path, shard.backend, codec=shard.codec)
+
+# define _query_shard() and _search_shard(), which query the database of one list.
+# _query_shard() is lazy, so to-dos that are queried in this process stream out one at a time.
+def _query_shard(query: Query, shard: Shard) -> Iterator[Item]:
+    return _todoer(shard).query(query)
+
+def _collect_shard(query: Query, shard: Shard) -> List[Item]:
+    return list(_query_shard(query, shard))
+
+def _search_shard(
+    words: List[str], any_term: bool, limit: Optional[int], shard: Shard
+) -> List[Item]:
+    return _todoer(shard).search(words, any_term, limit)
+
+# defines _map(), which runs func over the shards in a thread pool of up to `workers` threads 
+# and yields the result of every shard, in shard order, as soon as it's ready, 
+# so the first lists can be rendered while the others are still being read.
+def _map(
+    func: Callable[[Shard], List[Item]], shards: List[Shard], workers: int
+) -> Iterator[List[Item]]:
+    if workers < 2 or len(shards) < 2:
+        yield from map(func, shards)
+        return
+    with ThreadPoolExecutor(min(len(shards), workers)) as pool:
+        yield from pool.map(func, shards)
+
+# defines _tagged(), which adds the name of its list to every to-do of a shard, as the "List" key.
+def _tagged(shard: Shard, items: Iterable[Item]) -> Iterator[Item]:
+    for todo_id, todo in items:
+        yield todo_id, {**todo, "List": shard.name}
+
+# defines query_shards(). Up to INLINE_SHARDS lists are queried one after another in this process, 
+# so the to-dos stream straight from storage to the caller. More lists are queried by a thread pool 
+# of up to `threads` threads, MAX_THREADS by default, which overlaps their reads, and every list 
+# is handed over as soon as it's done. Every shard runs the whole query, so only the matching to-dos, 
+# or the best `top` of them, are kept. The results come in list order, or, for a sorted query, 
+# merged in sort order, and are cut to `top` again across the lists. Read errors raise database.DatabaseError.
+def query_shards(
+    shards: List[Shard], query: Query, threads: Optional[int] = None
+) -> Iterator[Item]:
+    """Yield the ID and to-do of every to-do of every shard that satisfies the query."""
+    if query.sort is not None and query.sort not in SORT_KEYS:
+        raise ValueError(f"unknown sort key: {query.sort!r}")
+    if len(shards) <= INLINE_SHARDS:
+        results: Iterable[Iterable[Item]] = (_query_shard(query, shard) for shard in shards)
+    else:
+        results = _map(
+            functools.partial(_collect_shard, query), shards, threads or MAX_THREADS
+        )
+    tagged = (_tagged(shard, items) for shard, items in zip(shards, results))
+    if query.sort is None:
+        return itertools.islice(itertools.chain.from_iterable(tagged), query.top)
+    # every shard is already sorted, so merging them keeps the sort order.
+    return itertools.islice(heapq.merge(*tagged, key=SORT_KEYS[query.sort]), query.top)
+
+# defines search_shards(). Every shard answers from its own SQLite search index,
+# which releases the GIL while it works, so a thread pool is enough.
+# The results come in list order, and limit applies to all of them together.
+def search_shards(
+    shards: List[Shard], words: List[str], any_term: bool = False, limit: Optional[int] = None
+) -> Iterator[Item]:
+    """Yield the ID and to-do of every to-do of every shard that matches the search."""
+    results = _map(functools.partial(_search_shard, words, any_term, limit), shards, MAX_THREADS)
+    tagged = (_tagged(shard, items) for shard, items in zip(shards, results))
+    return itertools.islice(itertools.chain.from_iterable(tagged), limit)
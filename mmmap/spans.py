@@ -0,0 +1,126 @@
+"""This module provides the mmmap timing spans."""
+# mmmap/spans.py
+
+import _thread
+import contextlib
+import os
+import time
+from typing import Any, Callable, ContextManager, Dict, List, NamedTuple
+
+# define Span as a NamedTuple subclass, a timed phase of a command. The name field is one of the phases
+# below, start and end are time.perf_counter_ns() readings, and thread is the ID of the thread that ran it.
+#
+# - "config": finding and reading config.ini and setting up the Todoer.
+# - "lock": waiting for the database lock.
+# - "read" and "decode": reading the database file and decoding the whole to-do list.
+# - "mutate": applying adds, completions and removals to the list in memory.
+# - "encode" and "write": encoding the to-do list and writing it, or the commit records, to the file.
+# - "index": loading and updating the ID index and the search index.
+# - "search": looking words up in the search index.
+# - "sync": flushing the database to stable storage.
+# - "render": formatting and printing to-dos. Streaming commands like `mmmap list`
+#   read and decode the to-dos while they're rendered, so that time is part of this phase.
+class Span(NamedTuple):
+    name: str
+    start: int
+    end: int
+    thread: int
+
+Hook = Callable[[Span], None]
+
+_hooks: List[Hook] = []
+
+# defines add_hook() and remove_hook(). A hook is called with every Span once it ends,
+# in the thread that ran it. Programs that embed Todoer use them to feed their own tracing.
+def add_hook(hook: Hook) -> None:
+    """Call hook with every span from now on."""
+    _hooks.append(hook)
+
+def remove_hook(hook: Hook) -> None:
+    """Stop calling hook."""
+    _hooks.remove(hook)
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        finished = Span(self.name, self.start, time.perf_counter_ns(), _thread.get_ident())
+        for hook in list(_hooks):
+            hook(finished)
+
+_UNTIMED = contextlib.nullcontext()
+
+# defines span(), the context manager that times a phase. Without hooks it returns a shared
+# do-nothing context manager, so the instrumented code only pays for a function call.
+def span(name: str) -> ContextManager[None]:
+    """Time the phase run inside the with block."""
+    return _Timer(name) if _hooks else _UNTIMED
+
+# defines Recorder, a hook that keeps every span. Use it as a context manager,
+# which adds it as a hook on entry and removes it on exit.
+class Recorder:
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.start = time.perf_counter_ns()
+        self.end = self.start
+
+    def __call__(self, finished: Span) -> None:
+        self.spans.append(finished)
+
+    def __enter__(self) -> "Recorder":
+        self.start = time.perf_counter_ns()
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        remove_hook(self)
+        self.end = time.perf_counter_ns()
+
+    # defines .breakdown(), which returns the number of spans and their self time in milliseconds
+    # for every phase, in the order the phases first ran. The self time of a span leaves out
+    # the spans nested in it, so a write doesn't count the encoding done inside it twice.
+    def breakdown(self) -> Dict[str, List[float]]:
+        """Return the calls and self milliseconds of every phase."""
+        phases: Dict[str, List[float]] = {}
+        stack: List[Span] = []
+        for finished in sorted(self.spans, key=lambda s: (s.thread, s.start, -s.end)):
+            while stack and (
+                stack[-1].thread != finished.thread or stack[-1].end <= finished.start
+            ):
+                stack.pop()
+            duration = (finished.end - finished.start) / 1e6
+            if stack:
+                phases[stack[-1].name][1] -= duration
+            phase = phases.setdefault(finished.name, [0, 0.0])
+            phase[0] += 1
+            phase[1] += duration
+            stack.append(finished)
+        return phases
+
+    # defines .chrome_trace(), which returns the spans as Chrome trace events, the JSON format
+    # read by chrome://tracing and Perfetto. Every span is a complete ("X") event,
+    # with times in microseconds since the recorder started.
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Return the spans in the Chrome trace event format."""
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": finished.name,
+                    "cat": "mmmap",
+                    "ph": "X",
+                    "ts": (finished.start - self.start) / 1000,
+                    "dur": (finished.end - finished.start) / 1000,
+                    "pid": pid,
+                    "tid": finished.thread,
+                }
+                for finished in self.spans
+            ],
+            "displayTimeUnit": "ms",
+        }
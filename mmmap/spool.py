@@ -0,0 +1,95 @@
+"""This module provides the mmmap group commit spool."""
+# mmmap/spool.py
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from mmmap import DB_WRITE_ERROR
+from mmmap.database import DEFAULT_DURABILITY, atomic_write
+
+# define SPOOL_SUFFIX. The spool is a directory next to the database file,
+# so "todo.json" gets a "todo.json.spool" companion.
+SPOOL_SUFFIX = ".spool"
+# define how old, in seconds, a result or a claimed request has to be before it's considered abandoned.
+STALE_AFTER = 600
+
+# defines Spool, the queue of mutations waiting for a group commit. Every request is a file:
+#
+# - "<name>.req" holds a mutation queued by a process waiting for the database lock, 
+#   along with the durability level that process asks for.
+# - "<name>.work" is a request claimed by the leader, the process that holds the lock
+#   and applies every queued request with a single commit.
+# - "<name>.res" holds the result the leader wrote back once the batch was durable.
+#
+# Names start with a timestamp, so sorting them gives the order the requests were queued in.
+class Spool:
+    def __init__(self, db_path: Path) -> None:
+        self._dir = db_path.with_name(db_path.name + SPOOL_SUFFIX)
+
+    def _path(self, name: str, suffix: str) -> Path:
+        return self._dir / (name + suffix)
+
+    # defines .submit(), which queues a request and returns its name.
+    # The request is written with atomic_write(), so a leader never reads half of it.
+    def submit(self, op: str, args: Any, durability: str = DEFAULT_DURABILITY) -> str:
+        """Queue a mutation for the next group commit."""
+        self._dir.mkdir(exist_ok=True)
+        name = f"{time.time_ns():020d}-{os.getpid()}-{os.urandom(4).hex()}"
+        with atomic_write(self._path(name, ".req")) as request:
+            json.dump({"op": op, "args": args, "durability": durability}, request)
+        return name
+
+    # defines .claim(), which the leader calls while it holds the database lock.
+    # It returns the name, op, arguments and durability level of the queued requests in order, 
+    # and marks them as claimed. Leftovers from processes that died are swept along the way.
+    def claim(self) -> List[Tuple[str, str, Any, str]]:
+        """Take every queued request for a group commit."""
+        batch = []
+        now = time.time()
+        for path in sorted(self._dir.iterdir()):
+            try:
+                if path.suffix != ".req":
+                    if now - path.stat().st_mtime > STALE_AFTER:
+                        path.unlink()
+                    continue
+                request: Dict[str, Any] = json.loads(path.read_text())
+                path.rename(path.with_suffix(".work"))
+            except (OSError, ValueError):
+                continue
+            batch.append((
+                path.stem,
+                request["op"],
+                request["args"],
+                request.get("durability", DEFAULT_DURABILITY),
+            ))
+        return batch
+
+    def finish(self, name: str, result: Tuple[Any, int]) -> None:
+        """Hand the result of a claimed request back to its process."""
+        try:
+            with atomic_write(self._path(name, ".res")) as response:
+                json.dump(result, response)
+            self._path(name, ".work").unlink()
+        except OSError:
+            pass
+
+    # defines .result(), which returns the result of a request, or None if it's still queued.
+    # A request that was claimed but never finished belonged to a leader that died
+    # before or during its commit, so it reports DB_WRITE_ERROR: it may or may not have been applied.
+    def result(self, name: str) -> Optional[Tuple[Any, int]]:
+        """Return the result of a request and forget it."""
+        path = self._path(name, ".res")
+        try:
+            todos, error = json.loads(path.read_text())
+            path.unlink()
+        except FileNotFoundError:
+            if self._path(name, ".req").exists():
+                return None
+            self._path(name, ".work").unlink(missing_ok=True)
+            return [], DB_WRITE_ERROR
+        except (OSError, ValueError):
+            return [], DB_WRITE_ERROR
+        return todos, error
@@ -0,0 +1,192 @@
+"""This module provides the mmmap SQLite storage engine."""
+# mmmap/sqlite.py
+
+import sqlite3
+from contextlib import closing
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+from mmmap import DB_READ_ERROR, DB_WRITE_ERROR, JSON_ERROR, SUCCESS
+from mmmap.database import (
+    Change, DatabaseError, DatabaseHandler, DBResponse, apply_changes
+)
+from mmmap.spans import span
+from mmmap.todo import chunks
+
+# define the schema of the SQLite database. Every to-do is a row whose id is its slot plus one, 
+# so the rows are numbered 1 to N in list order and a change finds its row through the primary key. 
+# The Priority and Done columns are indexed so filtering on them doesn't scan the table. 
+# SCHEMA_VERSION goes in the user_version of the file. Files from before version 1 numbered their rows 
+# with AUTOINCREMENT, which leaves gaps, so they're renumbered by their first commit.
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Description TEXT NOT NULL,
+    Priority INTEGER NOT NULL,
+    Done INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS todos_priority ON todos (Priority);
+CREATE INDEX IF NOT EXISTS todos_done ON todos (Done);
+PRAGMA user_version = 1;
+"""
+
+# define the statements used to apply changes. "add" numbers the new row after the last one, 
+# and "done" and "remove" turn the zero-based slot into the row id. "remove" shifts the following rows 
+# down through negative ids, since the primary key must stay unique at every step. Todoer never sends it, 
+# as it removes to-dos with tombstones in the ID index.
+_INSERT = (
+    "INSERT INTO todos (id, Description, Priority, Done) "
+    "VALUES ((SELECT IFNULL(MAX(id), 0) + 1 FROM todos), ?, ?, ?)"
+)
+_INSERT_AT = "INSERT INTO todos (id, Description, Priority, Done) VALUES (?, ?, ?, ?)"
+_SQL = {
+    "done": ["UPDATE todos SET Done = 1 WHERE id = :slot + 1"],
+    "remove": [
+        "DELETE FROM todos WHERE id = :slot + 1",
+        "UPDATE todos SET id = 1 - id WHERE id > :slot + 1",
+        "UPDATE todos SET id = -id WHERE id < 0",
+    ],
+}
+_SET_VERSION = f"PRAGMA user_version = {SCHEMA_VERSION}"
+# define the statements of .write_todos_iter(), which stages the new rows in a temporary table, 
+# STAGE_ROWS rows at a time.
+STAGE_ROWS = 4096
+_STAGE = "CREATE TEMP TABLE staged (Description TEXT, Priority INTEGER, Done INTEGER)"
+_INSERT_STAGED = "INSERT INTO staged VALUES (?, ?, ?)"
+_STAGE_TABLE = "INSERT INTO staged SELECT Description, Priority, Done FROM todos ORDER BY id"
+_COPY_STAGED = (
+    "INSERT INTO todos (id, Description, Priority, Done) "
+    "SELECT rowid, Description, Priority, Done FROM staged ORDER BY rowid"
+)
+
+
+def _row(todo: Dict[str, Any]) -> tuple:
+    return (todo["Description"], todo["Priority"], int(todo["Done"]))
+
+# defines _renumber(), which numbers the rows of a file from before SCHEMA_VERSION 1 from 1 to N, 
+# going through the same temporary table as .write_todos_iter().
+def _renumber(db: sqlite3.Connection) -> None:
+    db.execute(_STAGE)
+    with db:
+        db.execute(_STAGE_TABLE)
+        db.execute("DELETE FROM todos")
+        db.execute(_COPY_STAGED)
+        db.execute(_SET_VERSION)
+
+# defines SQLiteDatabaseHandler. It honors the same DBResponse contract as DatabaseHandler,
+# but .commit() touches only the affected rows instead of rewriting the whole database.
+class SQLiteDatabaseHandler(DatabaseHandler):
+    def _connect(self, create: bool = False) -> sqlite3.Connection:
+        # opens the database read-write without creating it,
+        # so a missing file is reported as an error instead of silently becoming an empty database.
+        mode = "rwc" if create else "rw"
+        uri = f"file:{quote(str(self._db_path.resolve()))}?mode={mode}"
+        return sqlite3.connect(uri, uri=True)
+
+    def init_database(self) -> int:
+        """Create an empty to-do database."""
+        try:
+            with closing(self._connect(create=True)) as db:
+                with db:
+                    db.executescript(SCHEMA)
+                    db.execute("DELETE FROM todos")
+            return SUCCESS
+        except sqlite3.Error:
+            return DB_WRITE_ERROR
+
+    # defines .iter_todos(), which walks an SQLite cursor so rows are fetched as they're consumed.
+    def iter_todos(self) -> Iterator[Dict[str, Any]]:
+        try:
+            with closing(self._connect()) as db:
+                for desc, priority, done in db.execute(
+                    "SELECT Description, Priority, Done FROM todos ORDER BY id"
+                ):
+                    yield {"Description": desc, "Priority": priority, "Done": bool(done)}
+        except sqlite3.DatabaseError as error:
+            # a file that isn't an SQLite database gets the same code as malformed JSON.
+            if isinstance(error, sqlite3.OperationalError):
+                raise DatabaseError(DB_READ_ERROR)
+            raise DatabaseError(JSON_ERROR)
+
+    def read_todos(self) -> DBResponse:
+        try:
+            with span("read"):
+                return DBResponse(list(self.iter_todos()), SUCCESS)
+        except DatabaseError as error:
+            return DBResponse([], error.error)
+
+    def write_todos(self, todo_list: List[Dict[str, Any]]) -> DBResponse:
+        try:
+            with span("write"), closing(self._connect()) as db:
+                with db:
+                    db.execute("DELETE FROM todos")
+                    db.executemany(
+                        _INSERT_AT,
+                        ((slot + 1, *_row(todo)) for slot, todo in enumerate(todo_list)),
+                    )
+                    db.execute(_SET_VERSION)
+        except sqlite3.Error:
+            return DBResponse(todo_list, DB_WRITE_ERROR)
+        return DBResponse(todo_list, SUCCESS)
+
+    # defines .write_todos_iter(). The to-dos usually come from this very table, and a transaction 
+    # that rewrites it can't commit while they're still being read. So they're first inserted, a batch 
+    # at a time, into a temporary table, which lives apart from the database and doesn't lock it, 
+    # and then the table is replaced from the temporary one inside a single transaction.
+    def write_todos_iter(self, todos: Iterable[Dict[str, Any]]) -> DBResponse:
+        try:
+            with span("write"), closing(self._connect()) as db:
+                db.execute(_STAGE)
+                with db:
+                    for batch in chunks(todos, STAGE_ROWS):
+                        db.executemany(_INSERT_STAGED, map(_row, batch))
+                with db:
+                    db.execute("DELETE FROM todos")
+                    db.execute(_COPY_STAGED)
+                    db.execute(_SET_VERSION)
+        except DatabaseError as error:
+            return DBResponse([], error.error)
+        except sqlite3.Error:
+            return DBResponse([], DB_WRITE_ERROR)
+        return DBResponse([], SUCCESS)
+
+    # defines .commit(), which runs the SQL statements of every change inside a single transaction.
+    def commit(
+        self,
+        changes: List[Change],
+        todo_list: Optional[List[Dict[str, Any]]] = None,
+    ) -> DBResponse:
+        if todo_list is not None:
+            with span("mutate"):
+                apply_changes(todo_list, changes)
+        try:
+            with span("write"), closing(self._connect()) as db:
+                if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                    _renumber(db)
+                with db:
+                    for change in changes:
+                        if change.op == "add":
+                            db.execute(_INSERT, _row(change.todo))
+                        elif change.op == "clear":
+                            db.execute("DELETE FROM todos")
+                        else:
+                            for sql in _SQL[change.op]:
+                                db.execute(sql, {"slot": change.index})
+        except sqlite3.Error:
+            return DBResponse(todo_list or [], DB_WRITE_ERROR)
+        return DBResponse(todo_list or [], SUCCESS)
+
+    # defines .sync(). SQLite already flushes every transaction to stable storage when it commits.
+    def sync(self) -> int:
+        """Flush the database to stable storage."""
+        return SUCCESS
+
+    # defines .compact(), which reclaims the space left by deleted rows.
+    def compact(self) -> DBResponse:
+        try:
+            with closing(self._connect()) as db:
+                db.execute("VACUUM")
+        except sqlite3.Error:
+            return DBResponse([], DB_WRITE_ERROR)
+        return DBResponse([], SUCCESS)
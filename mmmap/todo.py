@@ -0,0 +1,146 @@
+"""This module provides the compact in-memory mmmap to-do types."""
+# mmmap/todo.py
+
+import itertools
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+# define description_text(), which joins the words of a description 
+# and adds a period (".") to the end if the user doesn’t add it.
+def description_text(description: Iterable[str]) -> str:
+    """Return the text of a description given as words."""
+    text = " ".join(description)
+    if not text.endswith("."):
+        text += "."
+    return text
+
+# define new_todo(), which returns the dictionary of a to-do that's about to be added, 
+# the form the database handlers store.
+def new_todo(description: str, priority: int = 2) -> Dict[str, Any]:
+    """Return a new, pending to-do."""
+    return {"Description": description_text([description]), "Priority": priority, "Done": False}
+
+# define chunks(), which groups any items into lists of up to size items, 
+# for the code that writes or inserts a long stream of to-dos in batches.
+def chunks(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield the items in lists of up to size items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# define Todo, a record type for a single to-do. Declaring __slots__ means instances don't carry
+# a per-instance __dict__, and the "Description", "Priority" and "Done" keys
+# aren't repeated for every to-do as they are in the dictionaries stored in the database.
+class Todo:
+    __slots__ = ("description", "priority", "done")
+
+    def __init__(self, description: str, priority: int = 2, done: bool = False) -> None:
+        self.description = description
+        self.priority = priority
+        self.done = done
+
+    # defines .from_dict() and .as_dict(), which convert from and to the dictionary view
+    # used by the database handlers and by earlier versions of the Todoer API.
+    @classmethod
+    def from_dict(cls, todo: Dict[str, Any]) -> "Todo":
+        """Build a Todo from its dictionary view."""
+        return cls(todo["Description"], todo["Priority"], todo["Done"])
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the dictionary view of the to-do."""
+        return {
+            "Description": self.description,
+            "Priority": self.priority,
+            "Done": self.done,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Todo):
+            return NotImplemented
+        return (self.description, self.priority, self.done) == (
+            other.description, other.priority, other.done
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Todo(description={self.description!r}, "
+            f"priority={self.priority!r}, done={self.done!r})"
+        )
+
+# define TodoTable, a columnar to-do list. Priorities live in an array of unsigned bytes,
+# done flags in a bytearray and descriptions in a plain list,
+# so each to-do costs a couple of bytes plus a pointer to its description
+# instead of a whole dictionary.
+class TodoTable:
+    def __init__(self, todos: Iterable[Todo] = ()) -> None:
+        self._descriptions: List[str] = []
+        self._priorities = array("B")
+        self._done = bytearray()
+        for todo in todos:
+            self.append(todo)
+
+    # defines .from_dicts(), which builds a table from any iterable of to-do dictionaries.
+    # Passing a generator such as DatabaseHandler.iter_todos() keeps only one dictionary alive at a time.
+    @classmethod
+    def from_dicts(cls, todos: Iterable[Dict[str, Any]]) -> "TodoTable":
+        """Build a table from to-do dictionaries."""
+        table = cls()
+        for todo in todos:
+            table._descriptions.append(todo["Description"])
+            table._priorities.append(todo["Priority"])
+            table._done.append(bool(todo["Done"]))
+        return table
+
+    def append(self, todo: Todo) -> None:
+        """Append a to-do to the table."""
+        self._descriptions.append(todo.description)
+        self._priorities.append(todo.priority)
+        self._done.append(bool(todo.done))
+
+    def set_done(self, index: int) -> Todo:
+        """Set the to-do at index as done and return it."""
+        self._done[index] = True
+        return self[index]
+
+    def pop(self, index: int = -1) -> Todo:
+        """Remove the to-do at index and return it."""
+        todo = self[index]
+        del self._descriptions[index]
+        del self._priorities[index]
+        del self._done[index]
+        return todo
+
+    def clear(self) -> None:
+        """Remove all to-dos from the table."""
+        self.__init__()
+
+    def __len__(self) -> int:
+        return len(self._descriptions)
+
+    def __getitem__(self, index: int) -> Todo:
+        return Todo(
+            self._descriptions[index],
+            self._priorities[index],
+            bool(self._done[index]),
+        )
+
+    def __iter__(self) -> Iterator[Todo]:
+        for row in zip(self._descriptions, self._priorities, self._done):
+            yield Todo(row[0], row[1], bool(row[2]))
+
+    # defines .iter_dicts() and .as_dicts(), the dictionary view kept for backwards compatibility.
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Yield the dictionary view of every to-do."""
+        for description, priority, done in zip(
+            self._descriptions, self._priorities, self._done
+        ):
+            yield {"Description": description, "Priority": priority, "Done": bool(done)}
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        """Return the to-do list as dictionaries."""
+        return list(self.iter_dicts())
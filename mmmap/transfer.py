@@ -0,0 +1,242 @@
+"""This module provides the mmmap import and export formats."""
+# mmmap/transfer.py
+
+import collections
+import csv
+import io
+import json
+import os
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from mmmap.todo import chunks, description_text
+
+# define the formats of "mmmap import" and "mmmap export". "csv" and "jsonl" hold every field,
+# in the layout of "mmmap list --format", so an export imports back as it was.
+# "txt" holds one description per line.
+FORMATS = ("csv", "jsonl", "txt")
+SUFFIXES = {".csv": "csv", ".jsonl": "jsonl", ".txt": "txt"}
+
+# define CHUNK_SIZE, how many bytes of the input are parsed at a time, and PARALLEL_SIZE,
+# the input size from which the chunks are parsed by a process pool.
+CHUNK_SIZE = 4 * 1024 * 1024
+PARALLEL_SIZE = 64 * 1024 * 1024
+
+_TRUE = {"true", "1", "yes", "y", "x", "done"}
+_FALSE = {"false", "0", "no", "n", "", "pending"}
+
+Item = Tuple[int, Dict[str, Any]]
+
+# defines RecordError, raised for a record that isn't a valid to-do. line is its line in the input.
+class RecordError(ValueError):
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(line, message)
+        self.line = line
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.message}"
+
+# defines guess_format(), which picks the format from the file extension, or returns None.
+def guess_format(path: Path) -> Optional[str]:
+    """Return the import format of a file name."""
+    return SUFFIXES.get(path.suffix.lower())
+
+# defines _todo(), which validates the fields of a record and builds its to-do dictionary.
+# Descriptions go through description_text(), so they get a final period like the ones added with "mmmap add".
+def _todo(description: Any, priority: Any, done: Any, line: int) -> Dict[str, Any]:
+    if not isinstance(description, str) or not description.strip():
+        raise RecordError(line, "missing description")
+    description = description_text([description.strip()])
+    try:
+        priority = int(priority)
+    except (TypeError, ValueError):
+        raise RecordError(line, f"invalid priority {priority!r}")
+    if priority not in (1, 2, 3):
+        raise RecordError(line, "priority must be 1, 2 or 3")
+    if isinstance(done, str):
+        flag = done.strip().lower()
+        if flag not in _TRUE and flag not in _FALSE:
+            raise RecordError(line, f"invalid done flag {done!r}")
+        done = flag in _TRUE
+    elif done not in (True, False):
+        raise RecordError(line, f"invalid done flag {done!r}")
+    return {"Description": description, "Priority": priority, "Done": bool(done)}
+
+# define the chunk parsers. Each one turns a chunk of whole lines into to-do dictionaries.
+# first_line is the line number of the first line of the chunk, for the error messages,
+# and priority is the priority of records that don't have one.
+def _parse_txt(text: str, first_line: int, priority: int) -> List[Dict[str, Any]]:
+    return [
+        _todo(line, priority, False, number)
+        for number, line in enumerate(text.splitlines(), first_line)
+        if line.strip()
+    ]
+
+
+def _parse_jsonl(text: str, first_line: int, priority: int) -> List[Dict[str, Any]]:
+    todos = []
+    for number, line in enumerate(text.splitlines(), first_line):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise RecordError(number, "invalid JSON")
+        if not isinstance(record, dict):
+            raise RecordError(number, "not a JSON object")
+        todos.append(
+            _todo(
+                record.get("Description"),
+                record.get("Priority", priority),
+                record.get("Done", False),
+                number,
+            )
+        )
+    return todos
+
+# parses CSV rows with the columns found in the header, matched without regard to case.
+# Quoted fields may span lines, so the line numbers come from the reader.
+def _parse_csv(
+    text: str, first_line: int, priority: int, header: List[str]
+) -> List[Dict[str, Any]]:
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    description = columns["description"]
+    priority_at = columns.get("priority")
+    done_at = columns.get("done")
+    todos = []
+    reader = csv.reader(io.StringIO(text))
+    try:
+        for row in reader:
+            number = first_line + reader.line_num - 1
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise RecordError(number, f"expected {len(header)} fields, got {len(row)}")
+            todos.append(
+                _todo(
+                    row[description],
+                    priority if priority_at is None or not row[priority_at] else row[priority_at],
+                    False if done_at is None else row[done_at],
+                    number,
+                )
+            )
+    except csv.Error as error:
+        raise RecordError(first_line + reader.line_num - 1, str(error))
+    return todos
+
+# defines parse_chunk(), which decodes a chunk of the input and parses it. It's a module-level function,
+# so a process pool can pickle it.
+def parse_chunk(
+    fmt: str, data: bytes, first_line: int, priority: int, header: Optional[List[str]]
+) -> List[Dict[str, Any]]:
+    """Parse a chunk of whole lines of an import file."""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise RecordError(first_line, "not UTF-8 text")
+    if fmt == "csv":
+        return _parse_csv(text, first_line, priority, header or [])
+    if fmt == "jsonl":
+        return _parse_jsonl(text, first_line, priority)
+    return _parse_txt(text, first_line, priority)
+
+# defines _cut(), which returns where a chunk ends: after its last line feed, or for CSV,
+# after its last line feed outside quotes, since quoted fields may hold line feeds.
+def _cut(fmt: str, data: bytes) -> int:
+    end = data.rfind(b"\n")
+    if fmt == "csv":
+        while end != -1 and data.count(b'"', 0, end) % 2:
+            end = data.rfind(b"\n", 0, end)
+    return end + 1
+
+# defines _iter_chunks(), which reads the file in blocks of chunk_size bytes and yields chunks
+# of whole lines, each with the number of its first line.
+def _iter_chunks(
+    file: IO[bytes], fmt: str, chunk_size: int, first_line: int
+) -> Iterator[Tuple[bytes, int]]:
+    rest = b""
+    while True:
+        block = file.read(chunk_size)
+        if not block:
+            break
+        data = rest + block
+        end = _cut(fmt, data)
+        if not end:
+            # no line ends in this block yet, so it keeps growing until one does.
+            rest = data
+            continue
+        yield data[:end], first_line
+        first_line += data.count(b"\n", 0, end)
+        rest = data[end:]
+    if rest:
+        yield rest, first_line
+
+# defines _read_header(), which reads the header of a CSV file, the line that names its columns.
+def _read_header(file: IO[bytes]) -> List[str]:
+    line = file.readline().decode("utf-8-sig", errors="replace")
+    header = next(csv.reader([line]), [])
+    if "description" not in (name.strip().lower() for name in header):
+        raise RecordError(1, "the CSV header has no Description column")
+    return header
+
+# defines iter_import(). It yields the to-dos of an import file while it reads the file a chunk at a time,
+# so memory stays bounded by a few chunks whatever the size of the file. Files of at least PARALLEL_SIZE
+# bytes are parsed by a process pool of up to `processes` workers, the number of CPUs by default,
+# with at most two chunks per worker in flight. The to-dos keep the order of the file either way.
+# An invalid record raises RecordError, and the to-dos after it are never yielded.
+def iter_import(
+    path: Path,
+    fmt: str,
+    priority: int = 2,
+    processes: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the validated to-dos of an import file."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown import format: {fmt!r}")
+    with path.open("rb") as file:
+        header = None
+        first_line = 1
+        if fmt == "csv":
+            header = _read_header(file)
+            first_line = 2
+        elif file.read(3) != b"\xef\xbb\xbf":
+            # skips the byte order mark some editors write at the start of UTF-8 files.
+            file.seek(0)
+        blocks = _iter_chunks(file, fmt, chunk_size, first_line)
+        workers = processes or os.cpu_count() or 1
+        if workers < 2 or _size(path) < PARALLEL_SIZE:
+            for data, line in blocks:
+                yield from parse_chunk(fmt, data, line, priority, header)
+            return
+        from concurrent.futures import Future, ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers) as pool:
+            pending: Deque["Future[List[Dict[str, Any]]]"] = collections.deque()
+            for data, line in blocks:
+                pending.append(pool.submit(parse_chunk, fmt, data, line, priority, header))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+# defines export_items(), which writes (ID, to-do) items in an export format. CSV and JSON Lines
+# go through render.render(), so they match "mmmap list --format". Text keeps the descriptions only.
+def export_items(items: Iterable[Item], fmt: str, write: Callable[[str], Any]) -> None:
+    """Write the to-do items in an export format."""
+    from mmmap import render
+
+    if fmt == "txt":
+        for chunk in chunks(items, render.CHUNK_ROWS):
+            write("".join(todo["Description"] + "\n" for _, todo in chunk))
+    elif fmt in FORMATS:
+        render.render(items, fmt, write)
+    else:
+        raise ValueError(f"unknown export format: {fmt!r}")
@@ -1,11 +1,23 @@
 # tests/test_mmmap.py
+import asyncio
+import contextlib
 import json
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
 import pytest
+import typer
 # imports CliRunner from typer.testing.
 from typer.testing import CliRunner
 
 # imports a few required objects from your mmmap package.
-from mmmap import DB_READ_ERROR, SUCCESS, __app_name__, __version__, cli, mmmap
+from mmmap import (
+    DB_READ_ERROR, DB_WRITE_ERROR, ID_ERROR, SUCCESS, __app_name__, __version__, cli, config,
+    database, mmmap, render, shards, spans, transfer,
+)
 
 # creates a CLI runner by instantiating CliRunner.
 runner = CliRunner()
@@ -22,6 +34,24 @@ def test_version():
     # which is available through result.stdout.
     assert f"{__app_name__} v{__version__}\n" in result.stdout
 
+# checks that python -m mmmap --version answers without importing the CLI or Typer.
+def test_version_fast_path():
+    script = (
+        "import sys; from mmmap import __main__; "
+        "sys.argv = ['mmmap', '--version']; __main__.main(); "
+        "print(sorted({'typer', 'mmmap.cli'} & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    assert result.stdout == f"{__app_name__} v{__version__}\n[]\n"
+    # the config paths are only worked out, with Typer, when they're used.
+    script = "import sys; from mmmap import config; print('typer' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    assert result.stdout == "False\n"
+
     
 # Typer’s CliRunner is a subclass of Click’s CliRunner. 
 # Therefore, its .invoke() method returns a Result object, 
@@ -36,6 +66,156 @@ def test_version():
 
 
 
+# The fixture cli_db() points the config of the CLI at a temporary directory, with the daemon socket there too, 
+# so no running daemon answers, and runs "mmmap init" to create an empty database. It returns the database path.
+@pytest.fixture
+def cli_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CONFIG_DIR_PATH", tmp_path / "config")
+    monkeypatch.setattr(config, "CONFIG_FILE_PATH", tmp_path / "config" / "config.ini")
+    monkeypatch.setattr(config, "SOCKET_PATH", tmp_path / "config" / "mmmap.sock")
+    db_path = tmp_path / "todo.json"
+    result = runner.invoke(cli.app, ["init", "--db-path", str(db_path)])
+    assert result.exit_code == 0
+    return db_path
+
+# checks the bulk commands: "add --from-file -" reads standard input, 
+# and "complete" and "remove" take IDs and inclusive ranges, which may overlap.
+def test_cli_bulk(cli_db):
+    lines = "Get some milk\n\nClean the house\nWash the car\nWalk the dog\n"
+    result = runner.invoke(cli.app, ["add", "--from-file", "-"], input=lines)
+    assert result.exit_code == 0
+    assert "4 to-dos were added with priority: 2" in result.stdout
+    result = runner.invoke(cli.app, ["complete", "1-2", "2", "1"])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        'to-do # 1 "Get some milk." completed!',
+        'to-do # 2 "Clean the house." completed!',
+    ]
+    for bad in ("10-3", "0", "two"):
+        result = runner.invoke(cli.app, ["complete", bad])
+        assert result.exit_code == 2 and f'"{bad}"' in result.output
+    result = runner.invoke(cli.app, ["complete", "5"])
+    assert result.exit_code == 1 and "failed" in result.stdout
+    result = runner.invoke(cli.app, ["remove", "--force", "2-3", "3"])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        "to-do # 2: 'Clean the house.' was removed",
+        "to-do # 3: 'Wash the car.' was removed",
+    ]
+    result = runner.invoke(cli.app, ["remove", "--force", "2"])
+    assert result.exit_code == 1 and "failed" in result.stdout
+    result = runner.invoke(cli.app, ["remove", "1", "4"], input="n\n")
+    assert result.exit_code == 0 and "Delete 2 to-dos?" in result.stdout
+    assert "Operation canceled" in result.stdout
+    assert [todo_id for todo_id, _ in mmmap.Todoer(cli_db).iter_todo_items()] == [1, 4]
+
+
+# checks "list --format" with --limit and --offset, which cut a page out of the list, 
+# and that the machine-readable formats still write an empty document for an empty page.
+def test_cli_list(cli_db):
+    lines = 'Get some milk\nClean the house, "now"\nWash the car\nWalk the dog\n'
+    runner.invoke(cli.app, ["add", "--from-file", "-"], input=lines)
+    runner.invoke(cli.app, ["complete", "2"])
+    result = runner.invoke(cli.app, ["list", "--format", "jsonl", "--offset", "1", "--limit", "2"])
+    assert result.exit_code == 0
+    assert [json.loads(line) for line in result.stdout.splitlines()] == [
+        {"ID": 2, "Description": 'Clean the house, "now".', "Priority": 2, "Done": True},
+        {"ID": 3, "Description": "Wash the car.", "Priority": 2, "Done": False},
+    ]
+    result = runner.invoke(cli.app, ["list", "--format", "csv", "--limit", "2"])
+    assert result.stdout.splitlines() == [
+        "ID,Description,Priority,Done",
+        "1,Get some milk.,2,False",
+        '2,"Clean the house, ""now"".",2,True',
+    ]
+    result = runner.invoke(cli.app, ["list", "--format", "json", "--offset", "3"])
+    assert [todo["ID"] for todo in json.loads(result.stdout)] == [4]
+    result = runner.invoke(cli.app, ["list", "--limit", "1"])
+    assert "| Get some milk." in result.stdout and "Wash the car." not in result.stdout
+    result = runner.invoke(cli.app, ["list", "--format", "tsv", "--offset", "9"])
+    assert result.exit_code == 0 and result.stdout == "ID\tDescription\tPriority\tDone\n"
+    result = runner.invoke(cli.app, ["list", "--offset", "9"])
+    assert result.stdout == "There are no tasks in the to-do list yet\n"
+    result = runner.invoke(cli.app, ["list", "--format", "xml"])
+    assert result.exit_code == 1 and 'Unknown output format "xml"' in result.stdout
+
+
+# checks that "convert" rewrites the database with another codec, keeping the to-dos and their IDs, 
+# and records the codec in config.ini.
+def test_cli_convert(cli_db):
+    from mmmap import codec
+
+    lines = "Get some milk\nWash the car\nWalk the dog\n"
+    runner.invoke(cli.app, ["add", "--from-file", "-"], input=lines)
+    runner.invoke(cli.app, ["remove", "--force", "2"])
+    result = runner.invoke(cli.app, ["convert", "--codec", "binary"])
+    assert result.exit_code == 0 and "The to-do database is now binary" in result.stdout
+    assert cli_db.read_bytes().startswith(codec.MAGIC)
+    assert database.get_database_codec(config.CONFIG_FILE_PATH) == "binary"
+    result = runner.invoke(cli.app, ["list", "--format", "jsonl"])
+    assert [json.loads(line)["ID"] for line in result.stdout.splitlines()] == [1, 3]
+    result = runner.invoke(cli.app, ["convert", "--codec", "json-compact"])
+    assert result.exit_code == 0
+    # the removed to-do stays in the file as a tombstone until compaction.
+    assert len(json.loads(cli_db.read_text())) == 3
+    result = runner.invoke(cli.app, ["list", "--format", "csv"])
+    assert result.stdout.splitlines()[1:] == ["1,Get some milk.,2,False", "3,Walk the dog.,2,False"]
+    result = runner.invoke(cli.app, ["convert", "--codec", "yaml"])
+    assert result.exit_code == 1 and 'Unknown codec "yaml"' in result.stdout
+
+
+# checks that "archive" moves the completed to-dos out of the list and "list --archived" shows them, 
+# and that --older-than and --compression are validated.
+def test_cli_archive(cli_db):
+    lines = "Get some milk\nWash the car\nWalk the dog\n"
+    runner.invoke(cli.app, ["add", "--from-file", "-"], input=lines)
+    runner.invoke(cli.app, ["complete", "2"])
+    result = runner.invoke(cli.app, ["archive", "--older-than", "1d"])
+    assert result.exit_code == 0 and "There are no completed to-dos to archive" in result.stdout
+    result = runner.invoke(cli.app, ["archive", "--compression", "lzma"])
+    assert result.exit_code == 0 and "1 completed to-do(s) moved to the archive" in result.stdout
+    result = runner.invoke(cli.app, ["list", "--format", "jsonl"])
+    assert [json.loads(line)["ID"] for line in result.stdout.splitlines()] == [1, 3]
+    result = runner.invoke(cli.app, ["list", "--archived", "--format", "jsonl"])
+    assert [json.loads(line)["Description"] for line in result.stdout.splitlines()] == [
+        "Wash the car."
+    ]
+    result = runner.invoke(cli.app, ["archive", "--older-than", "soon"])
+    assert result.exit_code == 1 and 'Invalid age "soon"' in result.stdout
+    result = runner.invoke(cli.app, ["archive", "--compression", "zip"])
+    assert result.exit_code == 1 and 'Unknown compression "zip"' in result.stdout
+
+
+# checks that "export" writes a file that "import" reads back, and that an invalid record 
+# stops the import before anything is added, naming its line.
+def test_cli_import_export(cli_db):
+    lines = 'Get some milk\nClean the house, "now"\n'
+    runner.invoke(cli.app, ["add", "--from-file", "-"], input=lines)
+    runner.invoke(cli.app, ["complete", "2"])
+    export_file = cli_db.with_name("export.csv")
+    result = runner.invoke(cli.app, ["export", "-o", str(export_file)])
+    assert result.exit_code == 0
+    result = runner.invoke(cli.app, ["export", "--format", "txt"])
+    assert result.stdout == 'Get some milk.\nClean the house, "now".\n'
+    result = runner.invoke(cli.app, ["import", str(export_file)])
+    assert result.exit_code == 0 and f"Imported 2 to-do(s) from {export_file}" in result.stdout
+    result = runner.invoke(cli.app, ["export", "--format", "jsonl"])
+    assert [json.loads(line) for line in result.stdout.splitlines()][2:] == [
+        {"ID": 3, "Description": "Get some milk.", "Priority": 2, "Done": False},
+        {"ID": 4, "Description": 'Clean the house, "now".', "Priority": 2, "Done": True},
+    ]
+    bad_file = cli_db.with_name("bad.jsonl")
+    bad_file.write_text('{"Description": "Walk the dog"}\n{"Description": ""}\n')
+    result = runner.invoke(cli.app, ["import", str(bad_file)])
+    assert result.exit_code == 1
+    assert "Importing to-dos failed at line 2: missing description" in result.stdout
+    assert len(list(mmmap.Todoer(cli_db).iter_todo_items())) == 4
+    result = runner.invoke(cli.app, ["import", str(bad_file), "--format", "xml"])
+    assert result.exit_code == 1 and 'Unknown input format "xml"' in result.stdout
+    result = runner.invoke(cli.app, ["export", "--format", "xml"])
+    assert result.exit_code == 1 and 'Unknown output format "xml"' in result.stdout
+
+
 # To test .add(), you must create a Todoer instance with a proper JSON file as the target database. 
 # To provide that file, you’ll use a pytest fixture.
 # The fixture, mock_json_file(), creates and returns a temporary JSON file, db_file, 
@@ -50,6 +230,35 @@ def mock_json_file(tmp_path):
         json.dump(todo, db, indent=4)
     return db_file
 
+# The fixture crash_on_replace() returns a function that makes atomic_write() die with SystemExit 
+# right before a new file replaces the given one, as if the process was killed halfway through the write. 
+# monkeypatch.undo() lets the writes through again.
+@pytest.fixture
+def crash_on_replace(monkeypatch):
+    replace = database.os.replace
+
+    def arm(db_file):
+        def crash_before_replace(src, dst):
+            if dst == db_file:
+                raise SystemExit
+            replace(src, dst)
+
+        monkeypatch.setattr(database.os, "replace", crash_before_replace)
+
+    return arm
+
+# The fixture make_todoer() returns a factory of Todoer instances over a copy of the mock database 
+# in another storage engine or codec, so every engine is tested from the same to-do list. 
+# The copy is named after its backend, or name if given, next to the mock database.
+@pytest.fixture
+def make_todoer(mock_json_file):
+    def make(backend, name=None, codec=database.DEFAULT_CODEC, **options):
+        db_file = mock_json_file.with_name(name or f"todo.{backend}")
+        assert database.migrate_database(mock_json_file, "json", db_file, backend, codec) == SUCCESS
+        return mmmap.Todoer(db_file, backend, codec=codec, **options)
+
+    return make
+
 # These two dictionaries (test_data1 and test_data2) provide data to test Todoer.add(). 
 test_data1 = {
     # The first two keys represent the data you’ll use as arguments to .add(), 
@@ -77,7 +286,7 @@ test_data2 = {
 # It makes a single test function behave like several test functions that run different test cases.
 # The @pytest.mark.parametrize() decorator marks test_add() for parametrization. 
 # When pytest runs this test, it calls test_add() two times. 
-# Each call uses one of the parameter sets from lines 91 to 95 and lines 96 to 100.
+# Each call uses one of the two pytest.param() sets below, built from test_data1 and test_data2.
 @pytest.mark.parametrize(
     # This string holds descriptive names for the two required parameters 
     # and also a descriptive return value name. Note that test_add() has those same parameters. 
@@ -105,4 +314,684 @@ def test_add(mock_json_file, description, priority, expected):
     read = todoer._db_handler.read_todos()
     # asserts that the length of the to-do list is 2. Why 2? 
     # Because mock_json_file() returns a list with one to-do, and now you’re adding a second one.
-    assert len(read.todo_list) == 2
\ No newline at end of file
+    assert len(read.todo_list) == 2
+
+# Adding to a corrupt database must fail and leave the file as it was, 
+# even once the ID index exists and adds skip reading the list up front.
+def test_add_corrupt_database(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    assert todoer.add(["Clean the house"]).error == SUCCESS
+    corrupt = mock_json_file.read_text()[:-5]
+    mock_json_file.write_text(corrupt)
+    assert todoer.add(["Wash the car"]).error == database.JSON_ERROR
+    assert mock_json_file.read_text() == corrupt
+
+
+# The journal storage engine keeps the JSON file as a checkpoint and appends mutations to a journal. 
+# This test adds, completes and removes to-dos, checks that the checkpoint is untouched 
+# until .compact() folds the journal into it.
+def test_journal_backend(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file, backend="journal")
+    checkpoint = mock_json_file.read_text()
+    assert todoer.add(["Clean", "the", "house"], 1).error == SUCCESS
+    assert todoer.add(["Wash the car"]).error == SUCCESS
+    assert todoer.set_done(2).error == SUCCESS
+    assert todoer.remove(1).todo["Description"] == "Get some milk."
+    assert mock_json_file.read_text() == checkpoint
+    expected = [
+        {"Description": "Clean the house.", "Priority": 1, "Done": True},
+        {"Description": "Wash the car.", "Priority": 2, "Done": False},
+    ]
+    assert todoer.get_todo_list() == expected
+    assert todoer.compact().error == SUCCESS
+    assert json.loads(mock_json_file.read_text()) == expected
+    assert todoer._db_handler.read_journal() == []
+
+
+# A checkpoint replaces the database before it empties the journal. If the process dies in between, 
+# the journal must not be replayed again over the database that already holds it, 
+# and if it dies before the database is replaced, the journal must still count.
+def test_journal_checkpoint_crash(mock_json_file, monkeypatch, crash_on_replace):
+    from mmmap import journal
+
+    expected = ["Get some milk.", "Clean the house.", "Wash the car."]
+    todoer = mmmap.Todoer(mock_json_file, backend="journal")
+    todoer.add_many(["Clean the house", "Wash the car"])
+    crash_on_replace(mock_json_file)
+    with pytest.raises(SystemExit):
+        todoer.compact()
+    monkeypatch.undo()
+    todoer = mmmap.Todoer(mock_json_file, backend="journal")
+    assert [todo["Description"] for todo in todoer.get_todo_list()] == expected
+    monkeypatch.setattr(journal.JournalDatabaseHandler, "_finish_checkpoint", lambda self: SUCCESS)
+    assert todoer.compact().error == SUCCESS
+    monkeypatch.undo()
+    assert len(json.loads(mock_json_file.read_text())) == 3
+    assert len(mock_json_file.with_name("todo.json.journal").read_text().splitlines()) == 2
+    todoer = mmmap.Todoer(mock_json_file, backend="journal")
+    assert [todo["Description"] for todo in todoer.get_todo_list()] == expected
+    assert todoer.add(["Walk the dog"]).error == SUCCESS
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [1, 2, 3, 4]
+    assert len(todoer._db_handler.read_journal()) == 1
+
+# The SQLite storage engine must honor the same contract as the JSON one. 
+# This test migrates the mock JSON database into SQLite and runs the usual operations against it.
+def test_sqlite_backend(make_todoer, monkeypatch):
+    from mmmap import sqlite
+
+    todoer = make_todoer("sqlite")
+    assert todoer.add(["Clean", "the", "house"], 1) == (test_data1["todo"], SUCCESS)
+    assert todoer.set_done(2).todo["Done"] is True
+    assert todoer.remove(1).todo["Description"] == "Get some milk."
+    assert todoer.get_todo_list() == [
+        {"Description": "Clean the house.", "Priority": 1, "Done": True},
+    ]
+    assert todoer.set_done(5).error == ID_ERROR
+    # an import streams the rows it reads from the table back into it, in batches.
+    monkeypatch.setattr(sqlite, "STAGE_ROWS", 2)
+    more = [{"Description": f"Task {n}.", "Priority": 2, "Done": False} for n in range(3)]
+    assert todoer.import_todos(iter(more)) == (3, SUCCESS)
+    assert [todo["Description"] for todo in todoer.get_todo_list()] == [
+        "Clean the house.", "Task 0.", "Task 1.", "Task 2."
+    ]
+    # the row ids are the slots plus one, and a file numbered with gaps is renumbered by its first commit.
+    with contextlib.closing(sqlite3.connect(todoer._db_path)) as db, db:
+        db.execute("UPDATE todos SET id = id * 10")
+        db.execute("PRAGMA user_version = 0")
+    todo_id = next(
+        todo_id for todo_id, todo in todoer.iter_todo_items() if todo["Description"] == "Task 1."
+    )
+    assert todoer.set_done(todo_id).todo["Description"] == "Task 1."
+    handler = todoer._db_handler
+    assert handler.commit([database.Change("remove", 0)]).error == SUCCESS
+    with contextlib.closing(sqlite3.connect(todoer._db_path)) as db:
+        rows = db.execute("SELECT id, Description, Done FROM todos ORDER BY id").fetchall()
+    assert [row[0] for row in rows] == list(range(1, len(rows) + 1))
+    assert ("Task 1.", 1) in [row[1:] for row in rows]
+
+
+# The record storage engine patches a binary file in place. 
+# This test checks that completing a to-do is a single byte flip in the record file.
+def test_records_backend(make_todoer, monkeypatch):
+    from mmmap import records
+
+    todoer = make_todoer("records")
+    db_file = todoer._db_path
+    assert todoer.add(["Clean", "the", "house"], 1) == (test_data1["todo"], SUCCESS)
+    before = db_file.read_bytes()
+    assert todoer.set_done(2).todo["Done"] is True
+    after = db_file.read_bytes()
+    flipped = records.HEADER.size + records.RECORD.size + records.DONE_OFFSET
+    assert [i for i in range(len(after)) if before[i] != after[i]] == [flipped]
+    assert todoer.remove(1).todo["Description"] == "Get some milk."
+    assert todoer.get_todo_list() == [
+        {"Description": "Clean the house.", "Priority": 1, "Done": True},
+    ]
+    assert todoer.remove(1).error == ID_ERROR
+    # a "clear" that can't rewrite the file stops the commit.
+    handler = todoer._db_handler
+    before = handler.read_todos().todo_list
+    clear = [database.Change("clear"), database.Change("add", todo=test_data1["todo"])]
+    with monkeypatch.context() as patch:
+        patch.setattr(handler, "write_todos", lambda todo_list: database.DBResponse([], DB_WRITE_ERROR))
+        assert handler.commit(clear).error == DB_WRITE_ERROR
+    assert handler.read_todos().todo_list == before
+
+
+# A rewrite puts the descriptions in a new heap that only the new record file names, 
+# so if the process dies before the record file is replaced, the old files still read back as they were.
+def test_records_rewrite_crash(make_todoer, monkeypatch, crash_on_replace):
+    todoer = make_todoer("records")
+    db_file = todoer._db_path
+    todoer.add_many(["Clean the house", "Wash the car"])
+    todoer.remove(2)
+    expected = todoer.get_todo_list()
+    crash_on_replace(db_file)
+    with pytest.raises(SystemExit):
+        todoer.compact()
+    monkeypatch.undo()
+    assert mmmap.Todoer(db_file, backend="records").get_todo_list() == expected
+    assert todoer.compact().error == SUCCESS
+    assert todoer.get_todo_list() == expected
+    assert len(list(db_file.parent.glob("*.heap"))) == 1
+
+# iter_json_array() must decode the same list as json.load(), 
+# even when elements and numbers are split across chunk boundaries.
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_iter_json_array(tmp_path, chunk_size):
+    from mmmap import database
+
+    todo_list = [
+        {"Description": f"Task {i} [x], {{y}}.", "Priority": 12345 * i, "Done": i % 2 == 0}
+        for i in range(50)
+    ]
+    db_file = tmp_path / "todo.json"
+    db_file.write_text(json.dumps(todo_list, indent=4))
+    with db_file.open() as db:
+        assert list(database.iter_json_array(db, chunk_size)) == todo_list
+    db_file.write_text(" [ 1 ,2, 345 ] ")
+    with db_file.open() as db:
+        assert list(database.iter_json_array(db, chunk_size)) == [1, 2, 345]
+    db_file.write_text('[{"Description": "x"} {')
+    with pytest.raises(database.DatabaseError):
+        list(database.DatabaseHandler(db_file).iter_todos())
+
+
+# TodoTable stores to-dos column by column but must keep the dictionary view intact.
+def test_todo_table(mock_json_file):
+    from mmmap.todo import Todo
+
+    todoer = mmmap.Todoer(mock_json_file)
+    todoer.add(test_data1["description"], test_data1["priority"])
+    table = todoer.get_todo_table()
+    assert table.as_dicts() == todoer.get_todo_list()
+    assert table.set_done(1) == Todo("Clean the house.", 1, True)
+    assert table.pop(0).description == "Get some milk."
+    assert list(table) == [Todo("Clean the house.", 1, True)]
+    assert len(table) == 1
+
+
+# Bulk operations apply every ID in a single read-modify-write. 
+# Removing IDs 1 and 3 must remove the first and third to-dos, even though popping 1 shifts the rest.
+def test_bulk_operations(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    todos, error = todoer.add_many(["Clean the house", "Wash the car", "Walk the dog."], 1)
+    assert error == SUCCESS and len(todos) == 3
+    assert [t["Description"] for t in todoer.set_done_many([2, 4, 2]).todos] == [
+        "Clean the house.", "Walk the dog."
+    ]
+    assert todoer.set_done_many([1, 5]).error == ID_ERROR
+    removed = todoer.remove_many([3, 1])
+    assert [t["Description"] for t in removed.todos] == ["Get some milk.", "Wash the car."]
+    assert todoer.get_todo_list() == [
+        {"Description": "Clean the house.", "Priority": 1, "Done": True},
+        {"Description": "Walk the dog.", "Priority": 1, "Done": True},
+    ]
+
+
+def test_parse_ids():
+    assert cli._parse_ids(["3", "7", "5-8"]) == [3, 5, 6, 7, 8]
+    with pytest.raises(typer.BadParameter):
+        cli._parse_ids(["8-5"])
+
+
+# Removing a to-do must not change the IDs of the others, and IDs are never reused. 
+# Compaction drops the tombstones without renumbering anything.
+def test_stable_ids(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    todoer.add_many(["Clean the house", "Wash the car"])
+    assert todoer.remove(1).todo["Description"] == "Get some milk."
+    assert todoer.remove(1).error == ID_ERROR
+    assert todoer.set_done(3).todo["Description"] == "Wash the car."
+    todoer.add(["Walk the dog"])
+    assert todoer.compact().error == SUCCESS
+    assert len(json.loads(mock_json_file.read_text())) == 3
+    items = [(todo_id, todo["Description"]) for todo_id, todo in todoer.iter_todo_items()]
+    assert items == [(2, "Clean the house."), (3, "Wash the car."), (4, "Walk the dog.")]
+    assert todoer.remove_all().error == SUCCESS
+    todoer.add(["Buy bread"])
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [5]
+
+
+# A crash between the rewrite of the database and the rewrite of the ID index by compaction
+# leaves the intent file behind, and the next load installs the compacted index or drops it.
+def test_compact_crash(mock_json_file, monkeypatch, crash_on_replace):
+    from mmmap import ids
+
+    todoer = mmmap.Todoer(mock_json_file)
+    todoer.add_many(["Clean the house", "Wash the car"])
+    assert todoer.remove(2).error == SUCCESS
+    intent_file = mock_json_file.with_name("todo.json.ids.compact")
+    # the database is rewritten, the index isn't.
+    monkeypatch.setattr(ids.IDIndex, "checkpoint", lambda self: sys.exit(1))
+    with pytest.raises(SystemExit):
+        todoer.compact()
+    monkeypatch.undo()
+    assert len(json.loads(mock_json_file.read_text())) == 2
+    assert intent_file.exists()
+    todoer = mmmap.Todoer(mock_json_file)
+    items = [(todo_id, todo["Description"]) for todo_id, todo in todoer.iter_todo_items()]
+    assert items == [(1, "Get some milk."), (3, "Wash the car.")]
+    assert not intent_file.exists()
+    # the database isn't rewritten either.
+    assert todoer.remove(1).error == SUCCESS
+    crash_on_replace(mock_json_file)
+    with pytest.raises(SystemExit):
+        todoer.compact()
+    monkeypatch.undo()
+    assert intent_file.exists()
+    todoer = mmmap.Todoer(mock_json_file)
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [3]
+    assert not intent_file.exists()
+    assert todoer.compact().error == SUCCESS
+    assert todoer.add(["Walk the dog"]).error == SUCCESS
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [3, 4]
+
+
+# With cache=True, repeated reads of an unchanged file are served from memory without copying the to-dos, 
+# the handler's own writes refresh the cache, and a write by someone else invalidates it.
+def test_parse_cache(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file, cache=True)
+    assert len(todoer.get_todo_list()) == 1
+    assert todoer.cache_info() == (0, 1)
+    # a hit shares the cached to-dos instead of copying them, and completing one replaces it.
+    before = todoer.get_todo_list()
+    assert todoer.get_todo_list()[0] is before[0]
+    assert todoer.cache_info() == (2, 1)
+    todoer.set_done(1)
+    assert todoer.get_todo_list()[0]["Done"] is True
+    assert before[0]["Done"] is False
+    assert todoer.cache_info() == (4, 1)
+    mock_json_file.write_text("[]")
+    assert todoer.get_todo_list() == []
+    assert todoer.cache_info() == (4, 2)
+
+
+# The daemon answers RemoteTodoer calls over a Unix domain socket. With a flush interval, 
+# changes stay in memory until the daemon flushes them, at the latest when it stops.
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+def test_daemon(mock_json_file):
+    from mmmap import client, server
+
+    socket_path = mock_json_file.with_name("mmmap.sock")
+    todo_server = server.TodoServer(mock_json_file, "json", flush_interval=60)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(todo_server.serve(socket_path))
+
+    def run():
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(task)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        for _ in range(100):
+            sock = client.connect(socket_path)
+            if sock is not None:
+                break
+            time.sleep(0.01)
+        todoer = client.RemoteTodoer(sock)
+        assert todoer.add(["Clean", "the", "house"], 1) == (test_data1["todo"], SUCCESS)
+        assert todoer.set_done(2).todo["Done"] is True
+        assert todoer.remove(1).todo["Description"] == "Get some milk."
+        assert todoer.remove(1).error == ID_ERROR
+        assert list(todoer.iter_todo_items()) == [(2, {**test_data1["todo"], "Done": True})]
+        assert len(json.loads(mock_json_file.read_text())) == 1
+        todoer.close()
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+        loop.close()
+    assert len(json.loads(mock_json_file.read_text())) == 2
+    assert not socket_path.exists()
+
+
+# Periodic flushes run in a worker thread. A failed flush is kept, and writes are refused 
+# with its error until a flush succeeds.
+def test_daemon_flush_error(mock_json_file, monkeypatch):
+    from mmmap import server
+    from mmmap.database import DBResponse
+
+    todo_server = server.TodoServer(mock_json_file, "json", flush_interval=0.01)
+    add = {"op": "add_many", "args": [["Clean the house"], 1]}
+    assert todo_server.handle(add)["error"] == SUCCESS
+    handler = todo_server._buffer._handler
+    monkeypatch.setattr(
+        handler, "write_todos", lambda todo_list: DBResponse(todo_list, DB_WRITE_ERROR)
+    )
+    assert todo_server.flush() == DB_WRITE_ERROR
+    assert todo_server.handle(add) == {"result": [], "error": DB_WRITE_ERROR}
+    assert todo_server.handle({"op": "get_todos", "args": [[2]]})["error"] == SUCCESS
+    monkeypatch.undo()
+    with contextlib.suppress(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(todo_server._flush_periodically(), 0.1))
+    assert todo_server.flush_error == SUCCESS
+    assert len(json.loads(mock_json_file.read_text())) == 2
+    # syncing the buffer flushes it first.
+    assert todo_server.handle(add)["error"] == SUCCESS
+    assert todo_server._buffer.sync() == SUCCESS
+    assert not todo_server._buffer.dirty
+    assert len(json.loads(mock_json_file.read_text())) == 3
+
+
+# checks that writers using their own Todoer, and so their own lock file descriptor, don't lose adds.
+@pytest.mark.parametrize("backend", ["json", "records"])
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_concurrent_writers(tmp_path, backend, group_commit):
+    db_file = tmp_path / "todo.db"
+    database.init_database(db_file, backend)
+
+    def add_todos(number):
+        todoer = mmmap.Todoer(db_file, backend, group_commit=group_commit)
+        for i in range(10):
+            assert todoer.add([f"Writer {number} to-do #{i}"]).error == SUCCESS
+
+    threads = [threading.Thread(target=add_todos, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    items = list(mmmap.Todoer(db_file, backend).iter_todo_items())
+    assert sorted(todo_id for todo_id, _ in items) == list(range(1, 41))
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+# checks that a group commit leader applies the requests queued by other processes in order, 
+# with a single commit flushed at the strongest durability level of the batch, 
+# and hands every one its own result.
+def test_group_commit(mock_json_file, monkeypatch):
+    from mmmap.spool import Spool
+
+    spool = Spool(mock_json_file)
+    queued = [
+        spool.submit("add", [{"Description": "Queued.", "Priority": 3, "Done": False}]),
+        spool.submit("done", [1, 7], "full"),
+        spool.submit("done", [1]),
+    ]
+    todoer = mmmap.Todoer(mock_json_file, group_commit=True)
+    syncs = []
+    monkeypatch.setattr(todoer, "_sync", lambda: syncs.append(1) or SUCCESS)
+    todo, error = todoer.add(["Lead the batch"])
+    assert error == SUCCESS and todo["Description"] == "Lead the batch."
+    queued_todo = {"Description": "Queued.", "Priority": 3, "Done": False}
+    assert spool.result(queued[0]) == ([queued_todo], SUCCESS)
+    assert spool.result(queued[1]) == ([], ID_ERROR)
+    assert spool.result(queued[2])[1] == SUCCESS
+    assert syncs == [1]
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [1, 2, 3]
+    assert [todo["Done"] for todo in todoer.get_todo_list()] == [True, False, False]
+    assert not list(mock_json_file.with_name("todo.json.spool").iterdir())
+
+
+# checks when each durability level flushes commits to stable storage.
+def test_sync_policy(tmp_path):
+    from mmmap.durability import SyncPolicy
+
+    syncs = []
+
+    def sync():
+        syncs.append(True)
+        return SUCCESS
+
+    db_file = tmp_path / "todo.json"
+    assert SyncPolicy(db_file, "none").committed(sync) == SUCCESS and not syncs
+    assert SyncPolicy(db_file, "full").committed(sync) == SUCCESS and len(syncs) == 1
+    syncs.clear()
+    lazy = SyncPolicy(db_file, "lazy", interval_ms=60_000, writes=3)
+    for _ in range(7):
+        assert lazy.committed(sync) == SUCCESS
+    # flushes the first commit after the quiet period, and then every third one.
+    assert len(syncs) == 3
+    assert SyncPolicy(db_file, "lazy", interval_ms=60_000, writes=3)._load()[1] == 0
+    # accepts "batch", the former name of "lazy".
+    assert SyncPolicy(db_file, "batch").level == "lazy"
+
+# checks that every output format of the list command streams the same to-dos, across chunk boundaries.
+def test_render_formats():
+    from mmmap import render
+
+    items = [
+        (1, {"Description": 'Buy "milk", eggs.', "Priority": 1, "Done": False}),
+        (4, {"Description": "Walk the dog.", "Priority": 2, "Done": True}),
+        (5, {"Description": "Read.", "Priority": 3, "Done": False}),
+    ]
+    records = [dict(ID=todo_id, **todo) for todo_id, todo in items]
+
+    def rendered(fmt, todo_items=items):
+        chunks = []
+        render.render(iter(todo_items), fmt, chunks.append, chunk_rows=2)
+        return "".join(chunks)
+
+    assert json.loads(rendered("json")) == records
+    assert [json.loads(line) for line in rendered("jsonl").splitlines()] == records
+    assert rendered("csv").splitlines()[:2] == [
+        "ID,Description,Priority,Done", '1,"Buy ""milk"", eggs.",1,False'
+    ]
+    assert rendered("tsv").splitlines()[2] == "4\tWalk the dog.\t2\tTrue"
+    assert "4    | (2)       | True  | Walk the dog.\n" in rendered("table")
+    assert "\x1b[" not in rendered("table")
+    assert json.loads(rendered("json", [])) == []
+
+def test_query(mock_json_file):
+    from mmmap.query import Query, run_query
+
+    items = [
+        (1, {"Description": "Buy milk.", "Priority": 2, "Done": False}),
+        (2, {"Description": "Walk the dog.", "Priority": 1, "Done": True}),
+        (3, {"Description": "Buy MILK and eggs.", "Priority": 1, "Done": False}),
+        (4, {"Description": "Read.", "Priority": 3, "Done": False}),
+    ]
+
+    def ids(**fields):
+        return [todo_id for todo_id, _ in run_query(Query(**fields), iter(items))]
+
+    assert ids() == [1, 2, 3, 4]
+    assert ids(priority=1) == [2, 3]
+    assert ids(done=False, match="milk") == [1, 3]
+    assert ids(sort="priority") == [2, 3, 1, 4]
+    assert ids(sort="priority", top=3) == [2, 3, 1]
+    assert ids(sort="description", top=1) == [3]
+    assert ids(done=True, top=5) == [2]
+    with pytest.raises(ValueError):
+        ids(sort="colour")
+    todoer = mmmap.Todoer(mock_json_file)
+    assert list(todoer.query(Query(match="MILK"))) == [
+        (1, {"Description": "Get some milk.", "Priority": 2, "Done": False})
+    ]
+
+# The search index is built by the first search and then kept up to date by every commit, 
+# so it must answer like a freshly built one.
+def test_search(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    todoer.add_many(["Buy milk at the store", "Milk the cow", "Store the boxes"])
+
+    def search(*words, any_term=False):
+        return [(todo_id, todo["Done"]) for todo_id, todo in todoer.search(words, any_term)]
+
+    assert search("milk store") == [(2, False)]
+    assert len(search("MILK", "store", any_term=True)) == 4
+    todoer.set_done(3)
+    todoer.remove(2)
+    todoer.add(["Stored", "wine"])
+    incremental = [search("milk"), search("stor*"), search("the", "wine", any_term=True)]
+    assert incremental == [
+        [(1, False), (3, True)],
+        [(4, False), (5, False)],
+        [(3, True), (4, False), (5, False)],
+    ]
+    (mock_json_file.parent / "todo.json.search").unlink()
+    assert [search("milk"), search("stor*"), search("the", "wine", any_term=True)] == incremental
+    assert search("?!") == []
+
+
+# Every codec must round-trip the to-do list, and reads must detect the codec that wrote the file.
+@pytest.mark.parametrize("codec", database.CODECS)
+def test_codecs(tmp_path, codec):
+    todo_list = [
+        {"Description": "Buy milk ☕.", "Priority": 1, "Done": False},
+        {"Description": "", "Priority": 3, "Done": True},
+    ]
+    db_file = tmp_path / "todo.json"
+    writer = database.DatabaseHandler(db_file, codec=codec)
+    assert writer.write_todos(todo_list).error == SUCCESS
+    handler = database.DatabaseHandler(db_file)
+    assert handler.read_todos() == (todo_list, SUCCESS)
+    assert list(handler.iter_todos()) == todo_list
+    db_file.write_bytes(db_file.read_bytes()[:-1])
+    assert handler.read_todos().error == database.JSON_ERROR
+
+
+# A transaction commits every mutation at once, can complete the to-dos it added, 
+# and writes nothing if its with block raises.
+def test_transaction(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    with todoer.transaction() as tx:
+        assert tx.add(["Wash", "the", "car"]).todo["Description"] == "Wash the car."
+        tx.add_many(["Walk the dog", "Read"], priority=1)
+        assert tx.set_done_many([1, 3]).todos[1]["Description"] == "Walk the dog."
+        assert tx.remove(2).error == SUCCESS
+        assert tx.remove(2).error == ID_ERROR
+    assert tx.error == SUCCESS
+    assert [(todo_id, todo["Done"]) for todo_id, todo in todoer.iter_todo_items()] == [
+        (1, True), (3, True), (4, False)
+    ]
+    with pytest.raises(KeyError):
+        with todoer.transaction() as tx:
+            tx.add(["Forget", "this"])
+            tx.remove(1)
+            raise KeyError
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [1, 3, 4]
+    assert todoer.add(["Remember", "this"]).error == SUCCESS
+    assert todoer.get_todos([5]).todos[0]["Description"] == "Remember this."
+
+# The large-database mode never loads the whole list, so it must give the same results, 
+# and leave the same database behind, as the regular mode on every storage engine.
+@pytest.mark.parametrize("backend", database.BACKENDS)
+def test_streaming(make_todoer, backend):
+    results = []
+    for streaming in (False, True):
+        todoer = make_todoer(
+            backend, f"{streaming}.{backend}", codec="json-compact", streaming=streaming
+        )
+        todoer.add_many(["Wash the car", "Walk the dog"])
+        with todoer.transaction() as tx:
+            done = tx.set_done_many([1, 3])
+            tx.add(["Read"])
+            removed = tx.remove_many([2, 4])
+        results.append((done, removed, todoer.set_done(1), todoer.compact()))
+        results.append((list(todoer.iter_todo_items()), todoer.set_done(9)))
+    assert results[0] == results[2]
+    assert results[1] == results[3]
+    assert results[0][1].todos[1] == {"Description": "Read.", "Priority": 2, "Done": False}
+    assert [todo_id for todo_id, _ in results[1][0]] == [1, 3]
+
+# Archiving moves the completed to-dos, old enough, out of the database into compressed segments 
+# that stream back in ID order, and every to-do keeps its ID.
+def test_archive(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    todoer.add_many(["Clean the house", "Wash the car", "Walk the dog"])
+    todoer.set_done_many([1, 3])
+    assert todoer.archive(older_than=3600) == (0, SUCCESS)
+    assert todoer.archive(compression="lzma") == (2, SUCCESS)
+    todoer.set_done(4)
+    todoer._completions.rewrite({4: time.time() - 7200})
+    assert todoer.archive(older_than=3600) == (1, SUCCESS)
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == [2]
+    assert len(json.loads(mock_json_file.read_text())) == 1
+    archived = list(todoer.iter_archived_items())
+    assert [(todo_id, todo["Done"]) for todo_id, todo in archived] == [
+        (1, True), (3, True), (4, True)
+    ]
+    assert archived[1][1]["Description"] == "Wash the car."
+    segment = mock_json_file.with_name("todo.json.archive") / "000002.zlib"
+    segment.write_bytes(segment.read_bytes()[:-4])
+    with pytest.raises(database.DatabaseError):
+        list(todoer.iter_archived_items())
+
+# A Recorder sees the phases of every operation, with nested spans left out of the self time, 
+# and --profile=FILE reaches the trace option of the CLI.
+def test_spans(mock_json_file):
+    todoer = mmmap.Todoer(mock_json_file)
+    with spans.Recorder() as recorder:
+        todoer.set_done(1)
+    phases = recorder.breakdown()
+    assert {"lock", "read", "decode", "mutate", "encode", "write"} <= set(phases)
+    assert all(ms >= 0 for _, ms in phases.values())
+    events = recorder.chrome_trace()["traceEvents"]
+    assert len(events) == len(recorder.spans)
+    assert {event["ph"] for event in events} == {"X"}
+    todoer.get_todo_list()
+    assert len(recorder.spans) == len(events)
+    assert cli.expand_profile_option(["--profile=trace.json", "list", "--profile=x"]) == [
+        "--profile-trace", "trace.json", "list", "--profile=x"
+    ]
+
+# Named lists get a config.ini section and a shard file each, and the queries across lists 
+# merge the results of every shard, run inline or by a thread pool.
+def test_shards(tmp_path, monkeypatch):
+    from mmmap.query import Query
+
+    monkeypatch.setattr(config, "CONFIG_DIR_PATH", tmp_path / "config")
+    monkeypatch.setattr(config, "CONFIG_FILE_PATH", tmp_path / "config" / "config.ini")
+    db_path = tmp_path / "todo.json"
+    infra_path = config.shard_path(db_path, "infra")
+    for list_name, path in (("infra", infra_path), (None, db_path)):
+        assert config.init_app(str(path), list_name=list_name) == SUCCESS
+        database.init_database(path)
+        if list_name == "infra":
+            # the default list isn't registered yet, so it's left out and the CLI asks for "mmmap init".
+            assert [shard.name for shard in shards.get_shards(config.CONFIG_FILE_PATH)] == ["infra"]
+            result = runner.invoke(cli.app, ["list"])
+            assert result.exit_code == 1 and 'run "mmmap init"' in result.stdout
+    assert config.get_list_names(config.CONFIG_FILE_PATH) == ["infra"]
+    mmmap.Todoer(db_path).add_many(["Buy milk", "Call mom"], priority=3)
+    mmmap.Todoer(infra_path).add_many(["Rotate the milk certs", "Patch servers"], priority=1)
+    all_shards = shards.get_shards(config.CONFIG_FILE_PATH)
+    assert [shard.name for shard in all_shards] == ["default", "infra"]
+    # two lists are queried inline, and more lists by a thread pool, with the same merged order.
+    items = list(shards.query_shards(all_shards, Query(sort="priority")))
+    assert [(todo["List"], todo_id) for todo_id, todo in items] == [
+        ("infra", 1), ("infra", 2), ("default", 1), ("default", 2)
+    ]
+    monkeypatch.setattr(shards, "INLINE_SHARDS", 0)
+    assert list(shards.query_shards(all_shards, Query(sort="priority"), threads=2)) == items
+    assert [todo_id for todo_id, _ in shards.query_shards(all_shards, Query(top=3))] == [1, 2, 1]
+    found = list(shards.search_shards(all_shards, ["milk"]))
+    assert [(todo["List"], todo["Description"]) for _, todo in found] == [
+        ("default", "Buy milk."), ("infra", "Rotate the milk certs.")
+    ]
+
+# AsyncTodoer coalesces concurrent mutations into batches and concurrent reads into one read, 
+# while every caller still gets its own result.
+def test_async_todoer(mock_json_file, monkeypatch):
+    from mmmap.aio import AsyncTodoer
+
+    commits = []
+    commit = AsyncTodoer._commit
+    monkeypatch.setattr(
+        AsyncTodoer, "_commit", lambda self, batch: commits.append(batch) or commit(self, batch)
+    )
+
+    async def run():
+        async with AsyncTodoer(mock_json_file) as todoer:
+            added = await asyncio.gather(*(todoer.add([f"Task {i}"]) for i in range(20)))
+            assert [todo["Description"] for todo, _ in added] == [f"Task {i}." for i in range(20)]
+            assert len(commits) < 20
+            done, missing = await asyncio.gather(todoer.set_done(2), todoer.remove(99))
+            assert done == ({"Description": "Task 0.", "Priority": 2, "Done": True}, SUCCESS)
+            assert missing.error == ID_ERROR
+            first, second = await asyncio.gather(todoer.get_todo_list(), todoer.get_todo_list())
+            assert first == second and len(first) == 21
+            assert await todoer.remove_all() == ({}, SUCCESS)
+            assert await todoer.get_todo_list() == []
+
+    asyncio.run(run())
+
+# An export imports back as it was, quoted line feeds and all except in text, whether the chunks are parsed
+# in this process or by a process pool, and an invalid record imports nothing.
+@pytest.mark.parametrize("fmt", ["csv", "jsonl", "txt"])
+def test_import_export(mock_json_file, tmp_path, monkeypatch, fmt):
+    todoer = mmmap.Todoer(mock_json_file)
+    first = "Line one" if fmt == "txt" else "Line one\nline two"
+    todoer.add_many([first, 'Say "hi", twice'], 3)
+    todoer.set_done(2)
+    export_file = tmp_path / f"todos.{fmt}"
+    with export_file.open("w", newline="") as file:
+        transfer.export_items(todoer.iter_todo_items(), fmt, file.write)
+    monkeypatch.setattr(transfer, "PARALLEL_SIZE", 0)
+    todos = list(transfer.iter_import(export_file, fmt, processes=2, chunk_size=16))
+    assert todos == list(transfer.iter_import(export_file, fmt, processes=1, chunk_size=16))
+    if fmt == "txt":
+        expected = [todo["Description"] for todo in todoer.get_todo_list()]
+        assert [todo["Description"] for todo in todos] == expected
+    else:
+        assert todos == todoer.get_todo_list()
+    assert todoer.import_todos(iter(todos)) == (len(todos), SUCCESS)
+    assert [todo_id for todo_id, _ in todoer.iter_todo_items()] == list(range(1, 7))
+    assert todoer.search(["twice"])[-1][0] == 6
+    bad_file = tmp_path / "bad.csv"
+    bad_file.write_text("Description,Priority\nFine,1\nWrong,7\n")
+    with pytest.raises(transfer.RecordError) as error:
+        todoer.import_todos(transfer.iter_import(bad_file, "csv"))
+    assert error.value.line == 3
+    assert len(todoer.get_todo_list()) == 6